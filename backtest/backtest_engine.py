@@ -5,7 +5,106 @@ from typing import List, Dict, Optional, Union
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from numba import njit
 from ..strategies.option_strategy_base import OptionStrategyBase
+from ..utils.metrics_utils import drawdown_series
+from ..pricing.volatility import ImpliedVolatility
+
+# 市场数据列，缺失的列以NaN补齐
+MARKET_COLUMNS = [
+    'timestamp', 'symbol', 'type', 'price', 'volume',
+    'strike', 'expiry', 'implied_volatility',
+    'delta', 'gamma', 'vega', 'theta', 'rho'
+]
+GREEK_COLUMNS = ['delta', 'gamma', 'vega', 'theta', 'rho']
+
+# 合约类型编码：0-股票，1-看涨，2-看跌，-1-未知
+INSTRUMENT_TYPES = np.array(['stock', 'call', 'put'], dtype=object)
+
+# 交易记录结构
+TRADE_DTYPE = np.dtype([
+    ('timestamp', 'datetime64[ns]'),
+    ('symbol', 'U64'),
+    ('symbol_id', 'i4'),
+    ('quantity', 'f8'),
+    ('price', 'f8'),
+    ('transaction_cost', 'f8'),
+    ('realized_pnl', 'f8')
+])
+
+@njit(cache=True)
+def _run_core(
+    bar_starts, row_ids, row_prices,
+    order_start, order_ids, order_targets, order_prices,
+    n_symbols, initial_capital, transaction_cost,
+    equity_out, bar_trade_end, trade_bar, trade_ids, trade_qty, trade_price, trade_cost,
+    trade_pnl
+):
+    """逐bar撮合目标持仓指令并计算权益
+    
+    row_ids/row_prices为排序后每行行情的合约编号和价格，bar_starts为每个bar的起始行；
+    equity_out[:, 0]为组合市值，equity_out[:, 1]为现金；
+    成交写入trade_*数组，已实现盈亏按持仓均价计算，
+    bar_trade_end[i]为第i个bar结束时的成交数。
+    
+    Returns:
+        (成交笔数, 期末持仓数量)
+    """
+    pos_qty = np.zeros(n_symbols)
+    avg_cost = np.zeros(n_symbols)
+    last_price = np.zeros(n_symbols)
+    cash = initial_capital
+    n_trades = 0
+    
+    for bar in range(equity_out.shape[0]):
+        # 1. 更新报价
+        for k in range(bar_starts[bar], bar_starts[bar + 1]):
+            sid = row_ids[k]
+            price = row_prices[k]
+            if sid >= 0 and price == price:
+                last_price[sid] = price
+            
+        # 2. 按目标持仓成交
+        for k in range(order_start[bar], order_start[bar + 1]):
+            sid = order_ids[k]
+            price = order_prices[k]
+            last_price[sid] = price
+            qty = order_targets[k] - pos_qty[sid]
+            if qty != 0.0:
+                value = qty * price
+                cost = abs(value) * transaction_cost
+                cash -= value + cost
+                
+                # 已实现盈亏：反向成交部分按持仓均价结算
+                pos = pos_qty[sid]
+                pnl = 0.0
+                if pos * qty < 0.0:
+                    closed = min(abs(qty), abs(pos))
+                    direction = 1.0 if pos > 0.0 else -1.0
+                    pnl = closed * direction * (price - avg_cost[sid])
+                    if abs(qty) > abs(pos):
+                        avg_cost[sid] = price
+                else:
+                    avg_cost[sid] = (pos * avg_cost[sid] + qty * price) / (pos + qty)
+                pos_qty[sid] = pos + qty
+                
+                trade_bar[n_trades] = bar
+                trade_ids[n_trades] = sid
+                trade_qty[n_trades] = qty
+                trade_price[n_trades] = price
+                trade_cost[n_trades] = cost
+                trade_pnl[n_trades] = pnl
+                n_trades += 1
+        bar_trade_end[bar] = n_trades
+        
+        # 3. 更新持仓市值
+        market_value = 0.0
+        for j in range(n_symbols):
+            market_value += pos_qty[j] * last_price[j]
+        equity_out[bar, 0] = cash + market_value
+        equity_out[bar, 1] = cash
+        
+    return n_trades, pos_qty
 
 class BacktestEngine:
     """回测引擎"""
@@ -16,7 +115,8 @@ class BacktestEngine:
         start_date: datetime,
         end_date: datetime,
         initial_capital: float = 1000000,
-        transaction_cost: float = 0.0001
+        transaction_cost: float = 0.0001,
+        risk_free_rate: float = 0.03
     ):
         """
         Args:
@@ -25,117 +125,352 @@ class BacktestEngine:
             end_date: 回测结束日期
             initial_capital: 初始资金
             transaction_cost: 交易成本率
+            risk_free_rate: 无风险利率，用于补算缺失的隐含波动率
         """
         self.strategy = strategy
         self.start_date = start_date
         self.end_date = end_date
+        # 日期边界预先转换为datetime64[ns]，直接与时间戳数组比较
+        self.start_ts = np.datetime64(start_date, 'ns')
+        self.end_ts = np.datetime64(end_date, 'ns')
         self.initial_capital = initial_capital
         self.transaction_cost = transaction_cost
+        self.risk_free_rate = risk_free_rate
         
         # 回测结果
-        self.equity_curve = []
-        self.positions_history = []
-        self.trades_history = []
         self.metrics = {}
         
+        # 权益曲线：_equity[:, 0]为组合市值，_equity[:, 1]为现金
+        self._equity = np.empty((0, 2), dtype=np.float64)
+        self._equity_ts = np.empty(0, dtype='datetime64[ns]')
+        self._drawdown = np.empty(0, dtype=np.float64)
+        
+        # 预分配的交易记录及写入位置
+        self._trades = np.empty(0, dtype=TRADE_DTYPE)
+        self._trade_i = 0
+        
+        # 持仓只记录变动：每个bar结束时的交易写入位置
+        self._symbols = []
+        self._bar_times = []
+        self._bar_trade_end = np.empty(0, dtype=np.int64)
+        
+    @property
+    def equity_curve(self) -> pd.DataFrame:
+        """权益曲线"""
+        return pd.DataFrame({
+            'timestamp': self._equity_ts,
+            'portfolio_value': self._equity[:, 0],
+            'cash': self._equity[:, 1]
+        })
+        
+    @property
+    def trades_history(self) -> pd.DataFrame:
+        """交易记录"""
+        return pd.DataFrame(self._trades[:self._trade_i])
+        
+    @property
+    def positions_history(self) -> List[Dict]:
+        """持仓历史，由交易记录按bar回放重建"""
+        history = []
+        qty = np.zeros(len(self._symbols), dtype=np.float64)
+        start = 0
+        for timestamp, end in zip(self._bar_times, self._bar_trade_end.tolist()):
+            trades = self._trades[start:end]
+            np.add.at(qty, trades['symbol_id'], trades['quantity'])
+            history.append({
+                'timestamp': timestamp,
+                'positions': dict(zip(self._symbols, qty.tolist()))
+            })
+            start = end
+        return history
+        
+    def positions_at(self, bar: int) -> Dict[str, float]:
+        """重建第bar个时间点结束时的持仓"""
+        trades = self._trades[:self._bar_trade_end[bar]]
+        qty = np.bincount(
+            trades['symbol_id'], weights=trades['quantity'], minlength=len(self._symbols)
+        )
+        return dict(zip(self._symbols, qty.tolist()))
+        
     def load_market_data(self, data_loader) -> pd.DataFrame:
         """加载市场数据"""
         return data_loader.load_data(self.start_date, self.end_date)
         
-    def calculate_transaction_cost(self, trade_value: float) -> float:
-        """计算交易成本"""
-        return abs(trade_value) * self.transaction_cost
+    def calculate_transaction_cost(
+        self,
+        trade_value: Union[float, np.ndarray]
+    ) -> Union[float, np.ndarray]:
+        """计算交易成本，支持按数组批量计算"""
+        return np.abs(trade_value) * self.transaction_cost
         
     def run_backtest(self, market_data: pd.DataFrame):
-        """运行回测"""
-        # 初始化
-        current_capital = self.initial_capital
-        current_positions = {}
+        """运行回测
+        
+        先逐bar驱动策略生成目标持仓指令，
+        再由JIT编译的撮合内核一次性完成资金、持仓和权益计算
+        """
+        # 预处理为按时间排序的列数组，合约编号在预处理中一次性分配
+        columns, bar_starts = self._prepare_columns(market_data)
+        n_bars = len(columns['bar_time'])
+        
+        # 各bar的目标持仓指令，按bar顺序拼接，order_start为每个bar的起始位置
+        order_ids, order_targets, order_prices = [], [], []
+        order_start = np.zeros(n_bars + 1, dtype=np.int64)
         
         # 按时间顺序遍历数据
-        for timestamp, data in market_data.groupby('timestamp'):
+        for i, timestamp in enumerate(columns['bar_time']):
             # 1. 更新市场数据
-            market_snapshot = self._prepare_market_snapshot(data)
+            market_snapshot = self._prepare_market_snapshot(
+                columns, timestamp, bar_starts[i], bar_starts[i + 1]
+            )
             self.strategy.on_market_data(market_snapshot)
             
             # 2. 生成交易信号
             signals = self.strategy.generate_signals(market_snapshot)
             
-            # 3. 执行交易
+            # 3. 转换为目标持仓指令
             for signal in signals:
-                trades = self._execute_signal(signal, current_positions, current_capital)
-                for trade in trades:
-                    # 更新资金
-                    trade_value = trade['quantity'] * trade['price']
-                    transaction_cost = self.calculate_transaction_cost(trade_value)
-                    current_capital -= (trade_value + transaction_cost)
-                    
-                    # 更新持仓
-                    symbol = trade['symbol']
-                    if symbol not in current_positions:
-                        current_positions[symbol] = 0
-                    current_positions[symbol] += trade['quantity']
-                    
-                    # 记录交易
-                    trade['timestamp'] = timestamp
-                    trade['transaction_cost'] = transaction_cost
-                    self.trades_history.append(trade)
+                self._execute_signal(signal, order_ids, order_targets, order_prices)
+                
+            order_start[i + 1] = len(order_ids)
             
-            # 4. 更新持仓市值
-            portfolio_value = current_capital
-            for symbol, quantity in current_positions.items():
-                if quantity != 0:
-                    current_price = market_snapshot['prices'][symbol]['price']
-                    portfolio_value += quantity * current_price
+        # 4. 撮合交易并记录权益曲线
+        n_orders = len(order_ids)
+        equity = np.empty((n_bars, 2), dtype=np.float64)
+        bar_trade_end = np.empty(n_bars, dtype=np.int64)
+        trade_bar = np.empty(n_orders, dtype=np.int64)
+        trade_ids = np.empty(n_orders, dtype=np.int64)
+        trade_qty = np.empty(n_orders, dtype=np.float64)
+        trade_price = np.empty(n_orders, dtype=np.float64)
+        trade_cost = np.empty(n_orders, dtype=np.float64)
+        trade_pnl = np.empty(n_orders, dtype=np.float64)
+        
+        n_trades, self._pos_qty = _run_core(
+            bar_starts,
+            columns['instrument_id'],
+            columns['price'],
+            order_start,
+            np.asarray(order_ids, dtype=np.int64),
+            np.asarray(order_targets, dtype=np.float64),
+            np.asarray(order_prices, dtype=np.float64),
+            len(self._symbols),
+            float(self.initial_capital),
+            float(self.transaction_cost),
+            equity,
+            bar_trade_end,
+            trade_bar,
+            trade_ids,
+            trade_qty,
+            trade_price,
+            trade_cost,
+            trade_pnl
+        )
+        
+        # 5. 整理结果
+        self._bar_times = columns['bar_time']
+        self._bar_trade_end = bar_trade_end
+        self._equity = equity
+        self._equity_ts = columns['bar_ts']
+        
+        trades = np.empty(n_trades, dtype=TRADE_DTYPE)
+        trades['timestamp'] = columns['bar_ts'][trade_bar[:n_trades]]
+        trades['symbol'] = [self._symbols[i] for i in trade_ids[:n_trades].tolist()]
+        trades['symbol_id'] = trade_ids[:n_trades]
+        trades['quantity'] = trade_qty[:n_trades]
+        trades['price'] = trade_price[:n_trades]
+        trades['transaction_cost'] = trade_cost[:n_trades]
+        trades['realized_pnl'] = trade_pnl[:n_trades]
+        self._trades = trades
+        self._trade_i = n_trades
+        
+        # 计算回测指标
+        self._calculate_metrics()
+        
+    def _prepare_columns(self, market_data: pd.DataFrame):
+        """将市场数据按时间排序并拆分为列数组
+        
+        Returns:
+            (columns, bar_starts)，bar_starts[i]:bar_starts[i+1] 为第i个时间点的行区间
+        """
+        data = market_data.reindex(columns=MARKET_COLUMNS)
+        ts = data['timestamp'].to_numpy(dtype='datetime64[ns]')
+        data = data[(ts >= self.start_ts) & (ts <= self.end_ts)]
+        data = data.sort_values('timestamp', kind='mergesort')
+        
+        type_code = pd.Categorical(data['type'], categories=INSTRUMENT_TYPES).codes
+        
+        columns = {
+            'timestamp': data['timestamp'].to_numpy(),
+            'symbol': data['symbol'].to_numpy(),
+            'type_code': type_code,
+            'price': data['price'].to_numpy(dtype=np.float64),
+            'volume': data['volume'].to_numpy(),
+            'strike': data['strike'].to_numpy(),
+            'expiry': data['expiry'].to_numpy(dtype=object),
+            'implied_volatility': self._fill_implied_volatility(data, type_code),
+            'greeks': data[GREEK_COLUMNS].to_numpy(dtype=np.float64)
+        }
+        columns['instrument_id'], self._symbols = self._assign_instrument_ids(
+            data, columns['type_code']
+        )
+        
+        # 数据已按时间排序，相邻时间戳变化处即为每个时间点的起始位置
+        ts = columns['timestamp']
+        if len(ts) > 0:
+            starts = np.flatnonzero(np.r_[True, ts[1:] != ts[:-1]])
+        else:
+            starts = np.empty(0, dtype=np.int64)
+        bar_starts = np.append(starts, len(ts))
+        columns['bar_ts'] = columns['timestamp'][starts].astype('datetime64[ns]')
+        columns['bar_time'] = data['timestamp'].iloc[starts].tolist()
+        
+        return columns, bar_starts
+        
+    def _fill_implied_volatility(self, data: pd.DataFrame, type_code: np.ndarray) -> np.ndarray:
+        """补算缺失的期权隐含波动率
+        
+        对整段数据中缺失隐含波动率的期权一次性向量化反推，标的价格取同一时间点同一symbol的股票行
+        """
+        iv = data['implied_volatility'].to_numpy(dtype=np.float64, copy=True)
+        missing = (type_code > 0) & np.isnan(iv)
+        if not missing.any():
+            return iv
             
-            # 5. 记录权益曲线
-            self.equity_curve.append({
-                'timestamp': timestamp,
-                'portfolio_value': portfolio_value,
-                'cash': current_capital
-            })
+        rows = data.loc[missing, ['timestamp', 'symbol', 'type', 'strike', 'expiry', 'price']]
+        stock_prices = data.loc[type_code == 0, ['timestamp', 'symbol', 'price']].drop_duplicates(
+            ['timestamp', 'symbol'], keep='last'
+        ).rename(columns={'price': 'spot'})
+        spot = rows[['timestamp', 'symbol']].merge(
+            stock_prices, on=['timestamp', 'symbol'], how='left'
+        )['spot'].to_numpy(dtype=np.float64)
+        tau = (
+            pd.to_datetime(rows['expiry']) - pd.to_datetime(rows['timestamp'])
+        ).dt.total_seconds().to_numpy() / (365 * 24 * 3600)
+        
+        iv[missing] = ImpliedVolatility.approximate(
+            price=rows['price'].to_numpy(dtype=np.float64),
+            spot=spot,
+            strike=rows['strike'].to_numpy(dtype=np.float64),
+            tau=tau,
+            r=self.risk_free_rate,
+            is_call=(rows['type'] == 'call').to_numpy()
+        )
+        return iv
+        
+    @staticmethod
+    def _assign_instrument_ids(data: pd.DataFrame, type_code: np.ndarray):
+        """为每行行情分配稠密整数合约编号
+        
+        期权按(类型, 行权价, 到期日)打包为uint64键后整体factorize，
+        标的按symbol编号并排在期权之后；合约名称只在每个合约首次出现时生成一次。
+        
+        Returns:
+            (每行合约编号，未知类型为-1, 按编号排列的合约名称)
+        """
+        ids = np.full(len(data), -1, dtype=np.int64)
+        names = []
+        
+        # 期权：type_code<<48 | 行权价(分)<<24 | 到期日序号
+        opt_idx = np.flatnonzero(type_code > 0)
+        if len(opt_idx) > 0:
+            strike = data['strike'].to_numpy(dtype=np.float64)[opt_idx]
+            expiry = data['expiry'].to_numpy()[opt_idx]
+            expiry_day = pd.to_datetime(expiry).values.astype('datetime64[D]').astype(np.int64)
+            packed = (
+                (type_code[opt_idx].astype(np.uint64) << np.uint64(48)) |
+                (np.rint(strike * 100).astype(np.uint64) << np.uint64(24)) |
+                expiry_day.astype(np.uint64)
+            )
+            codes, _ = pd.factorize(packed)
+            ids[opt_idx] = codes
             
-            # 6. 记录持仓
-            self.positions_history.append({
-                'timestamp': timestamp,
-                'positions': current_positions.copy()
-            })
+            _, first = np.unique(codes, return_index=True)
+            names.extend(
+                f"{opt_type}_{k}_{e}" for opt_type, k, e in zip(
+                    INSTRUMENT_TYPES[type_code[opt_idx][first]].tolist(),
+                    strike[first].tolist(),
+                    expiry[first].tolist()
+                )
+            )
             
-        # 计算回测指标
-        self._calculate_metrics()
+        # 标的
+        stock_idx = np.flatnonzero(type_code == 0)
+        if len(stock_idx) > 0:
+            codes, symbols = pd.factorize(data['symbol'].to_numpy()[stock_idx])
+            ids[stock_idx] = codes + len(names)
+            names.extend(symbols.tolist())
+            
+        return ids, names
+        
+    def _prepare_market_snapshot(
+        self,
+        columns: Dict[str, np.ndarray],
+        timestamp,
+        start: int,
+        end: int
+    ) -> Dict:
+        """准备市场数据快照
         
-    def _prepare_market_snapshot(self, data: pd.DataFrame) -> Dict:
-        """准备市场数据快照"""
+        Args:
+            columns: _prepare_columns生成的列数组
+            timestamp: 当前时间点
+            start: 当前时间点的起始行
+            end: 当前时间点的结束行(不含)
+        """
         snapshot = {
-            'timestamp': data['timestamp'].iloc[0],
+            'timestamp': timestamp,
             'prices': {},
             'options': {}
         }
         
+        codes = columns['type_code'][start:end]
+        symbols = columns['symbol'][start:end]
+        prices = columns['price'][start:end]
+        
         # 整理标的价格数据
-        for _, row in data[data['type'] == 'stock'].iterrows():
-            snapshot['prices'][row['symbol']] = {
-                'price': row['price'],
-                'volume': row['volume']
+        stock = codes == 0
+        instrument_ids = columns['instrument_id'][start:end]
+        for symbol, instrument_id, price, volume in zip(
+            symbols[stock].tolist(),
+            instrument_ids[stock].tolist(),
+            prices[stock].tolist(),
+            columns['volume'][start:end][stock].tolist()
+        ):
+            snapshot['prices'][symbol] = {
+                'instrument_id': instrument_id,
+                'price': price,
+                'volume': volume
             }
             
         # 整理期权数据
-        for _, row in data[data['type'].isin(['call', 'put'])].iterrows():
-            if row['symbol'] not in snapshot['options']:
-                snapshot['options'][row['symbol']] = {
-                    'implied_volatility': row['implied_volatility'],
+        option = codes > 0
+        for symbol, instrument_id, opt_type, strike, expiry, price, iv, greeks in zip(
+            symbols[option].tolist(),
+            instrument_ids[option].tolist(),
+            INSTRUMENT_TYPES[codes[option]].tolist(),
+            columns['strike'][start:end][option].tolist(),
+            columns['expiry'][start:end][option].tolist(),
+            prices[option].tolist(),
+            columns['implied_volatility'][start:end][option].tolist(),
+            columns['greeks'][start:end][option].tolist()
+        ):
+            if symbol not in snapshot['options']:
+                snapshot['options'][symbol] = {
+                    'implied_volatility': iv,
                     'options': []
                 }
-            snapshot['options'][row['symbol']]['options'].append({
-                'type': row['type'],
-                'strike': row['strike'],
-                'expiry': row['expiry'],
-                'price': row['price'],
-                'delta': row['delta'],
-                'gamma': row['gamma'],
-                'vega': row['vega'],
-                'theta': row['theta'],
-                'rho': row['rho']
+            delta, gamma, vega, theta, rho = greeks
+            snapshot['options'][symbol]['options'].append({
+                'instrument_id': instrument_id,
+                'type': opt_type,
+                'strike': strike,
+                'expiry': expiry,
+                'price': price,
+                'delta': delta,
+                'gamma': gamma,
+                'vega': vega,
+                'theta': theta,
+                'rho': rho
             })
             
         return snapshot
@@ -143,62 +478,53 @@ class BacktestEngine:
     def _execute_signal(
         self,
         signal: Dict,
-        current_positions: Dict,
-        current_capital: float
-    ) -> List[Dict]:
-        """执行交易信号"""
-        trades = []
-        
-        if signal['type'] == 'volatility':
-            options = signal['options']
-            # 计算目标持仓
-            position_sizes, _ = self.strategy.build_delta_neutral_portfolio(options)
+        order_ids: List[int],
+        order_targets: List[float],
+        order_prices: List[float]
+    ):
+        """将交易信号转换为目标持仓指令，追加到指令列表"""
+        if signal['type'] != 'volatility':
+            return
             
-            # 生成交易指令
-            for size, option in zip(position_sizes, options):
-                symbol = f"{option['type']}_{option['strike']}_{option['expiry']}"
-                current_size = current_positions.get(symbol, 0)
-                trade_size = size - current_size
-                
-                if trade_size != 0:
-                    trades.append({
-                        'symbol': symbol,
-                        'quantity': trade_size,
-                        'price': option['price'],
-                        'type': option['type'],
-                        'strike': option['strike'],
-                        'expiry': option['expiry']
-                    })
-                    
-        return trades
+        options = signal['options']
+        # 计算目标持仓
+        position_sizes, _ = self.strategy.build_delta_neutral_portfolio(options)
         
+        # 生成交易指令，实际交易数量由撮合内核按当前持仓计算
+        for size, option in zip(position_sizes, options):
+            order_ids.append(option['instrument_id'])
+            order_targets.append(size)
+            order_prices.append(option['price'])
+            
     def _calculate_metrics(self):
         """计算回测指标"""
-        # 转换权益曲线为DataFrame
-        equity_df = pd.DataFrame(self.equity_curve)
-        returns = equity_df['portfolio_value'].pct_change()
+        pv = self._equity[:, 0]
+        returns = np.diff(pv) / pv[:-1]
         
         # 1. 收益指标
-        total_return = (equity_df['portfolio_value'].iloc[-1] - self.initial_capital) / self.initial_capital
-        annual_return = total_return * (252 / len(returns))
-        sharpe_ratio = np.sqrt(252) * returns.mean() / returns.std()
-        
-        # 2. 风险指标
-        max_drawdown = 0
-        peak = equity_df['portfolio_value'].iloc[0]
-        for value in equity_df['portfolio_value']:
-            if value > peak:
-                peak = value
-            drawdown = (peak - value) / peak
-            max_drawdown = max(max_drawdown, drawdown)
+        total_return = (pv[-1] - self.initial_capital) / self.initial_capital
+        # 按几何复利年化
+        annual_return = (
+            (1 + total_return) ** (252 / len(returns)) - 1 if len(returns) > 0 else 0.0
+        )
+        sharpe_ratio = (
+            np.sqrt(252) * returns.mean() / returns.std(ddof=1)
+            if len(returns) > 1 else np.nan
+        )
+        
+        # 2. 风险指标，回撤序列缓存供绘图使用
+        self._drawdown = np.empty_like(pv)
+        mdd = drawdown_series(pv, self._drawdown)
             
-        # 3. 交易指标
-        trades_df = pd.DataFrame(self.trades_history)
-        if not trades_df.empty:
-            win_trades = trades_df[trades_df['realized_pnl'] > 0]
-            win_rate = len(win_trades) / len(trades_df)
-            profit_factor = abs(win_trades['realized_pnl'].sum() / 
-                              trades_df[trades_df['realized_pnl'] < 0]['realized_pnl'].sum())
+        # 3. 交易指标，只统计产生已实现盈亏的平仓交易
+        trades = self._trades[:self._trade_i]
+        pnl = trades['realized_pnl']
+        closed = pnl[pnl != 0]
+        if closed.size > 0:
+            win = closed > 0
+            win_rate = win.mean()
+            gross_loss = -closed[~win].sum()
+            profit_factor = closed[win].sum() / gross_loss if gross_loss > 0 else np.inf
         else:
             win_rate = 0
             profit_factor = 0
@@ -207,11 +533,11 @@ class BacktestEngine:
             'total_return': total_return,
             'annual_return': annual_return,
             'sharpe_ratio': sharpe_ratio,
-            'max_drawdown': max_drawdown,
+            'max_drawdown': mdd,
             'win_rate': win_rate,
             'profit_factor': profit_factor,
-            'total_trades': len(trades_df),
-            'transaction_costs': trades_df['transaction_cost'].sum()
+            'total_trades': len(trades),
+            'transaction_costs': trades['transaction_cost'].sum()
         }
         
     def plot_results(self):
@@ -219,9 +545,8 @@ class BacktestEngine:
         import matplotlib.pyplot as plt
         
         # 1. 绘制权益曲线
-        equity_df = pd.DataFrame(self.equity_curve)
         plt.figure(figsize=(12, 6))
-        plt.plot(equity_df['timestamp'], equity_df['portfolio_value'])
+        plt.plot(self._equity_ts, self._equity[:, 0])
         plt.title('Equity Curve')
         plt.xlabel('Time')
         plt.ylabel('Portfolio Value')
@@ -229,12 +554,8 @@ class BacktestEngine:
         plt.show()
         
         # 2. 绘制回撤
-        equity = equity_df['portfolio_value']
-        peak = equity.expanding(min_periods=1).max()
-        drawdown = (peak - equity) / peak
-        
         plt.figure(figsize=(12, 6))
-        plt.plot(equity_df['timestamp'], drawdown)
+        plt.plot(self._equity_ts, self._drawdown)
         plt.title('Drawdown')
         plt.xlabel('Time')
         plt.ylabel('Drawdown')
@@ -8,12 +8,70 @@ import numpy as np
 from datetime import datetime, timedelta
 import matplotlib.pyplot as plt
 from pathlib import Path
+from scipy.stats import norm
+from joblib import Parallel, delayed
 
 from .option_strategy import (
     BaseOptionStrategy,
     VolatilityStrategy,
-    OptionData
+    OptionData,
+    UnderlyingData,
+    rolling_zscore,
+    volatility_signals
 )
+from ..pricing.volatility import ImpliedVolatility
+from ..utils.metrics_utils import max_drawdown
+
+def _straddle_value(S: np.ndarray,
+                    K: float,
+                    tau: np.ndarray,
+                    sigma: np.ndarray,
+                    r: float) -> np.ndarray:
+    """Black-Scholes跨式组合价值，到期后取内在价值"""
+    live = tau > 0
+    t = np.where(live, tau, 1.0)
+    sqrt_t = np.sqrt(t)
+    d1 = (np.log(S / K) + (r + 0.5 * sigma**2) * t) / (sigma * sqrt_t)
+    d2 = d1 - sigma * sqrt_t
+    disc_k = K * np.exp(-r * t)
+    call = S * norm.cdf(d1) - disc_k * norm.cdf(d2)
+    put = call - S + disc_k
+    return np.where(live, call + put, np.abs(S - K))
+
+def _prepare_chain(group: pd.DataFrame,
+                   lookback: int,
+                   spot: Optional[pd.Series] = None,
+                   risk_free_rate: float = 0.03) -> pd.DataFrame:
+    """预处理单个到期日的期权链：按日期排序，补齐缺失的隐含波动率并计算各合约的Z分数"""
+    chain = group.sort_values('date', kind='mergesort')
+    
+    # 缺失的隐含波动率用闭式近似加一步Newton修正直接反推，不做逐行迭代求解
+    required = {'close', 'strike', 'expiry', 'is_call'}
+    if spot is not None and required <= set(chain.columns):
+        if 'impl_vol' not in chain.columns:
+            chain['impl_vol'] = np.nan
+        missing = chain['impl_vol'].isna().to_numpy()
+        if missing.any():
+            rows = chain.loc[missing]
+            chain.loc[missing, 'impl_vol'] = ImpliedVolatility.approximate(
+                price=rows['close'].to_numpy(),
+                spot=spot.reindex(rows['date']).to_numpy(),
+                strike=rows['strike'].to_numpy(),
+                tau=((rows['expiry'] - rows['date']).dt.days / 365.0).to_numpy(),
+                r=risk_free_rate,
+                is_call=rows['is_call'].to_numpy(dtype=bool),
+                newton_steps=1
+            )
+            
+    if 'impl_vol' in chain.columns:
+        keys = [col for col in ('strike', 'is_call') if col in chain.columns]
+        if keys:
+            chain['vol_z'] = chain.groupby(keys, sort=False)['impl_vol'].transform(
+                lambda v: rolling_zscore(v.to_numpy(), lookback)
+            )
+        else:
+            chain['vol_z'] = rolling_zscore(chain['impl_vol'].to_numpy(), lookback)
+    return chain.set_index('date')
 
 class BacktestRunner:
     """回测运行器"""
@@ -67,16 +125,33 @@ class BacktestRunner:
         self.cerebro.addanalyzer(bt.analyzers.TradeAnalyzer,
                                 _name='trades')
                                 
-    def load_data(self) -> None:
-        """加载数据"""
-        # 加载标的数据
-        underlying_df = pd.read_csv(
+    def _read_underlying(self) -> pd.DataFrame:
+        """读取标的数据"""
+        return pd.read_csv(
             self.data_dir / 'underlying.csv',
             parse_dates=['date'],
             index_col='date'
         )
         
-        data = bt.feeds.PandasData(
+    def load_data(self,
+                  lookback: int = 20,
+                  n_jobs: int = -1,
+                  risk_free_rate: float = 0.03) -> None:
+        """加载数据
+        
+        Args:
+            lookback: 波动率Z分数回看周期
+            n_jobs: 并行预处理期权链的进程数，-1为使用全部CPU
+            risk_free_rate: 反推缺失隐含波动率使用的无风险利率
+        """
+        # 加载标的数据，预计算波动率Z分数
+        underlying_df = self._read_underlying()
+        if 'impl_vol' in underlying_df.columns:
+            underlying_df['vol_z'] = rolling_zscore(
+                underlying_df['impl_vol'].to_numpy(), lookback
+            )
+        
+        data = UnderlyingData(
             dataname=underlying_df,
             fromdate=self.start_date,
             todate=self.end_date
@@ -89,10 +164,17 @@ class BacktestRunner:
             parse_dates=['date', 'expiry']
         )
         
-        # 按到期日分组添加期权数据
-        for expiry, group in options_df.groupby('expiry'):
+        # 各到期日期权链相互独立，并行预处理
+        spot = underlying_df['close'] if 'close' in underlying_df.columns else None
+        chains = Parallel(n_jobs=n_jobs, backend='loky')(
+            delayed(_prepare_chain)(group, lookback, spot, risk_free_rate)
+            for _, group in options_df.groupby('expiry')
+        )
+        
+        # backtrader注册数据源不是线程安全的，按到期日顺序串行添加
+        for chain in chains:
             opt_data = OptionData(
-                dataname=group.set_index('date'),
+                dataname=chain,
                 fromdate=self.start_date,
                 todate=self.end_date
             )
@@ -141,6 +223,111 @@ class BacktestRunner:
         
         return stats
         
+    def run_vectorized(self,
+                       vol_entry_z: float = 2.0,
+                       vol_exit_z: float = 0.0,
+                       lookback: int = 20,
+                       min_hold_days: int = 5,
+                       risk_free_rate: float = 0.03) -> Dict:
+        """向量化运行波动率策略，不经过Cerebro逐bar回调
+        
+        一次性计算全部日期的隐含波动率Z分数，由编译后的状态机一次扫描得到开平仓位置，
+        只在这些bar上调仓。
+        持仓为平值跨式组合(行权价取整到5，30天到期)，按当日隐含波动率用
+        Black-Scholes估值；持有到到期日的持仓在到期当日或之后的第一个bar按
+        |S - K|结算，不收手续费，之后空仓。同一时间只持有一组跨式，
+        不复现Cerebro路径逐bar叠加开仓的行为，见volatility_signals。
+        标的数据需包含close和impl_vol列。
+        
+        Args:
+            vol_entry_z: 波动率入场Z分数
+            vol_exit_z: 波动率出场Z分数
+            lookback: 回看周期
+            min_hold_days: 最小持有天数
+            risk_free_rate: 无风险利率
+            
+        Returns:
+            与run()字段相同的回测统计结果
+        """
+        df = self._read_underlying().loc[self.start_date:self.end_date]
+        dates = df.index.values
+        close = df['close'].to_numpy(dtype=np.float64)
+        impl_vol = df['impl_vol'].to_numpy(dtype=np.float64)
+        n = len(df)
+        
+        # 1. 隐含波动率Z分数
+        z = rolling_zscore(impl_vol, lookback)
+        
+        # 2. 开平仓信号：高波动做空跨式(-1)，低波动做多跨式(1)，回归或到期后平仓
+        expiries = dates + np.timedelta64(30, 'D')
+        expiry_idx = np.searchsorted(dates, expiries)
+        entries, sides, exits = volatility_signals(
+            z, vol_entry_z, vol_exit_z, min_hold_days, expiry_idx
+        )
+        # 最后一笔未平仓的持仓估值到区间末尾
+        ends = np.append(exits, n)
+        
+        # 3. 每段持仓整体估值，空仓区间权益等于现金
+        equity = np.empty(n)
+        cash = float(self.initial_cash)
+        trade_pnl = []
+        trade_len = []
+        flat_from = 0
+        
+        for start, end, side in zip(entries, ends, sides):
+            equity[flat_from:start] = cash
+            flat_from = end
+            
+            # 估值区间包含平仓bar
+            stop = min(end + 1, n)
+            strike = round(close[start] / 5) * 5
+            tau = (expiries[start] - dates[start:stop]) / np.timedelta64(365, 'D')
+            value = _straddle_value(
+                close[start:stop], strike, tau, impl_vol[start:stop], risk_free_rate
+            )
+            
+            open_cost = self.commission * value[0]
+            cash -= side * value[0] + open_cost
+            equity[start:end] = cash + side * value[:end - start]
+            
+            if end < n:
+                # 到期bar的tau<=0，价值即内在价值，按到期结算不收手续费
+                expired = end == expiry_idx[start]
+                close_cost = 0.0 if expired else self.commission * value[-1]
+                cash += side * value[-1] - close_cost
+                trade_pnl.append(side * (value[-1] - value[0]) - open_cost - close_cost)
+                trade_len.append(end - start)
+                
+        equity[flat_from:] = cash
+        
+        # 4. 统计结果
+        stats = {}
+        stats['initial_value'] = self.initial_cash
+        stats['final_value'] = equity[-1]
+        stats['total_return'] = (
+            stats['final_value'] / stats['initial_value'] - 1
+        )
+        
+        returns = np.diff(equity) / equity[:-1]
+        excess = returns - risk_free_rate / 252
+        stats['sharpe_ratio'] = (
+            np.sqrt(252) * excess.mean() / excess.std(ddof=1)
+            if len(excess) > 1 and excess.std(ddof=1) > 0 else None
+        )
+        
+        stats['max_drawdown'] = max_drawdown(equity) * 100
+        at_peak = np.flatnonzero(equity >= np.maximum.accumulate(equity))
+        stats['max_drawdown_len'] = int((np.diff(np.append(at_peak, n)) - 1).max())
+        
+        stats['total_trades'] = len(entries)
+        stats['win_rate'] = (
+            sum(pnl > 0 for pnl in trade_pnl) / stats['total_trades']
+            if stats['total_trades'] > 0 else 0
+        )
+        stats['avg_trade_length'] = np.mean(trade_len) if trade_len else 0
+        
+        return stats
+        
     def plot(self, filename: Optional[str] = None):
         """绘制回测结果
         
@@ -166,7 +353,8 @@ def run_volatility_strategy(
     lookback: int = 20,
     min_hold_days: int = 5,
     initial_cash: float = 1000000,
-    commission: float = 0.001
+    commission: float = 0.001,
+    vectorized: bool = False
 ) -> Dict:
     """运行波动率策略回测
     
@@ -180,6 +368,7 @@ def run_volatility_strategy(
         min_hold_days: 最小持有天数
         initial_cash: 初始资金
         commission: 手续费率
+        vectorized: 是否使用向量化路径，不经过Cerebro
         
     Returns:
         回测统计结果
@@ -194,6 +383,14 @@ def run_volatility_strategy(
         commission=commission
     )
     
+    if vectorized:
+        return runner.run_vectorized(
+            vol_entry_z=vol_entry_z,
+            vol_exit_z=vol_exit_z,
+            lookback=lookback,
+            min_hold_days=min_hold_days
+        )
+    
     # 设置策略参数
     runner.cerebro.addstrategy(
         VolatilityStrategy,
@@ -204,7 +401,7 @@ def run_volatility_strategy(
     )
     
     # 加载数据
-    runner.load_data()
+    runner.load_data(lookback=lookback)
     
     # 运行回测
     stats = runner.run()
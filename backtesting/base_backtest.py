@@ -11,6 +11,89 @@ from datetime import datetime, timedelta
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from ..utils.metrics_utils import max_drawdown
+
+class SymbolPanel:
+    """
+    Per-symbol history frames aligned to one date index, kept as a dict
+    
+    Stands in for pd.concat(data, axis=1): supports .loc[symbol, column],
+    .index and positional .iloc, which is all the backtests use, without
+    copying every history into a MultiIndex frame.
+    """
+    
+    def __init__(self, frames: Dict[str, pd.DataFrame], index: Optional[pd.Index] = None):
+        if index is None:
+            for frame in frames.values():
+                index = frame.index if index is None else index.union(frame.index)
+            index = index if index is not None else pd.DatetimeIndex([])
+        self._frames = {
+            symbol: frame if frame.index.equals(index) else frame.reindex(index)
+            for symbol, frame in frames.items()
+        }
+        self.index = index
+        self.loc = _PanelLoc(self._frames)
+        self.iloc = _PanelILoc(self)
+        
+    @property
+    def symbols(self) -> List[str]:
+        return list(self._frames)
+        
+    def __getitem__(self, symbol: str) -> pd.DataFrame:
+        return self._frames[symbol]
+        
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._frames
+        
+    def __len__(self) -> int:
+        return len(self.index)
+        
+class _PanelLoc:
+    """.loc[symbol, column] -> column Series, .loc[symbol] -> symbol frame"""
+    
+    def __init__(self, frames: Dict[str, pd.DataFrame]):
+        self._frames = frames
+        
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            symbol, column = key
+            return self._frames[symbol][column]
+        return self._frames[key]
+        
+class _PanelILoc:
+    """Positional access: an int gives one date's row view, anything else a sub-panel"""
+    
+    def __init__(self, panel: SymbolPanel):
+        self._panel = panel
+        
+    def __getitem__(self, key):
+        frames = self._panel._frames
+        if isinstance(key, (int, np.integer)):
+            return _PanelRow(frames, int(key), self._panel.index[key])
+        return SymbolPanel(
+            {symbol: frame.iloc[key] for symbol, frame in frames.items()},
+            self._panel.index[key]
+        )
+        
+class _PanelRow:
+    """One date of a SymbolPanel: .loc[symbol, column] -> scalar, [symbol] -> that symbol's row"""
+    
+    def __init__(self, frames: Dict[str, pd.DataFrame], pos: int, name: Any):
+        self._frames = frames
+        self._pos = pos
+        self.name = name
+        self.index = pd.Index(list(frames))
+        self.loc = self
+        
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            symbol, column = key
+            return self._frames[symbol][column].iat[self._pos]
+        return self._frames[key].iloc[self._pos]
+        
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._frames
+        
 class BaseBacktest(ABC):
     def __init__(self,
                  strategy: Any,
@@ -44,6 +127,18 @@ class BaseBacktest(ABC):
         """Fetch historical data for backtesting"""
         pass
         
+    def _build_close_matrix(self, histories: Dict[str, pd.DataFrame]) -> None:
+        """Align per-symbol close histories into a dates x symbols ndarray for O(1) lookups"""
+        dates = None
+        for hist in histories.values():
+            dates = hist.index if dates is None else dates.union(hist.index)
+        self.dates = pd.DatetimeIndex(dates if dates is not None else [])
+        self._date_pos = {date: i for i, date in enumerate(self.dates)}
+        self._sym_pos = {symbol: j for j, symbol in enumerate(histories)}
+        self.close = np.empty((len(self.dates), len(histories)), dtype=np.float64)
+        for j, hist in enumerate(histories.values()):
+            self.close[:, j] = hist["Close"].reindex(self.dates).to_numpy(dtype=np.float64)
+            
     @abstractmethod
     def execute_trades(self, date: datetime, signals: Dict[str, Any]) -> None:
         """Execute trades based on strategy signals"""
@@ -57,17 +152,32 @@ class BaseBacktest(ABC):
     def run_backtest(self) -> Dict[str, Any]:
         """Run backtest simulation"""
         data = self.fetch_data()
-        dates = data.index.unique()
         
-        for date in dates:
+        # Precompute integer row ranges per date instead of a .loc lookup per step
+        codes, dates = pd.factorize(data.index, sort=False)
+        if len(codes) > 1 and (np.diff(codes) < 0).any():
+            # Rows of a date are not contiguous: stable-sort them into first-seen order
+            order = np.argsort(codes, kind="stable")
+            data = data.iloc[order]
+            codes = codes[order]
+        offsets = np.r_[0, np.bincount(codes, minlength=len(dates)).cumsum()]
+        unique_rows = data.index.is_unique
+        
+        for i, date in enumerate(dates):
+            # Same shape as data.loc[date]: a Series for a single row, else a DataFrame
+            if unique_rows:
+                day_data = data.iloc[offsets[i]]
+            else:
+                day_data = data.iloc[offsets[i]:offsets[i + 1]]
+                
             # Get strategy signals
-            signals = self.strategy.on_data(data.loc[date])
+            signals = self.strategy.on_data(day_data)
             
             # Execute trades
             self.execute_trades(date, signals)
             
             # Calculate and record portfolio value
-            portfolio_value = self.calculate_portfolio_value(date, data.loc[date])
+            portfolio_value = self.calculate_portfolio_value(date, day_data)
             self.portfolio_value.append({
                 "date": date,
                 "value": portfolio_value
@@ -75,6 +185,10 @@ class BaseBacktest(ABC):
             
         return self.get_results()
         
+    def trades_frame(self) -> pd.DataFrame:
+        """Trade log as a DataFrame"""
+        return pd.DataFrame(self.trades)
+        
     def get_results(self) -> Dict[str, Any]:
         """Calculate backtest results and metrics"""
         portfolio_df = pd.DataFrame(self.portfolio_value)
@@ -87,15 +201,15 @@ class BaseBacktest(ABC):
         total_return = (portfolio_df["value"].iloc[-1] / self.initial_capital - 1) * 100
         annual_return = (1 + total_return/100) ** (252/len(returns)) - 1
         sharpe_ratio = np.sqrt(252) * returns.mean() / returns.std()
-        max_drawdown = (portfolio_df["value"] / portfolio_df["value"].cummax() - 1).min() * 100
+        mdd = -max_drawdown(portfolio_df["value"].to_numpy(dtype=np.float64)) * 100
         
         return {
             "portfolio_value": portfolio_df,
-            "trades": pd.DataFrame(self.trades),
+            "trades": self.trades_frame(),
             "total_return": total_return,
             "annual_return": annual_return * 100,
             "sharpe_ratio": sharpe_ratio,
-            "max_drawdown": max_drawdown,
+            "max_drawdown": mdd,
             "number_of_trades": len(self.trades)
         }
         
@@ -136,7 +250,7 @@ class BaseBacktest(ABC):
         
     def plot_trade_analysis(self):
         """Plot trade analysis"""
-        trades_df = pd.DataFrame(self.trades)
+        trades_df = self.trades_frame()
         if len(trades_df) == 0:
             print("No trades to analyze")
             return
@@ -3,14 +3,109 @@ Option Backtesting Module
 Implements option-specific backtesting functionality
 """
 
+import math
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Tuple, NamedTuple
+from collections import namedtuple
 from datetime import datetime
 import yfinance as yf
-from py_vollib.black_scholes import black_scholes as bs
-from py_vollib.black_scholes.greeks.analytical import delta, gamma, theta, vega
-from .base_backtest import BaseBacktest
+from numba import njit
+from .base_backtest import BaseBacktest, SymbolPanel
+
+class TradeKey(NamedTuple):
+    """Structured option position key, used instead of parsing a formatted trade id"""
+    symbol: str
+    strike: float
+    expiry_ord: int
+    option_type: str
+    
+    def __str__(self) -> str:
+        expiry = datetime.fromordinal(self.expiry_ord)
+        return f"{self.symbol}_{self.strike}_{expiry.strftime('%Y%m%d')}_{self.option_type}"
+
+# Fixed-schema trade record; "return" is a keyword, so the field is return_
+TradeRow = namedtuple("TradeRow", [
+    "date", "symbol", "trade_id", "action", "option_type", "strike", "expiry",
+    "price", "contracts", "value", "commission", "underlying_price", "return_",
+    "delta", "gamma", "theta", "vega"
+])
+
+_SQRT1_2 = 0.7071067811865476
+_INV_SQRT_2PI = 0.3989422804014327
+
+@njit(cache=True, fastmath=True)
+def _bs_price_and_greeks(is_call: bool,
+                         S: float,
+                         K: float,
+                         T: float,
+                         r: float,
+                         sigma: float) -> Tuple[float, float, float, float, float]:
+    """
+    Black-Scholes price and analytical greeks for a single contract
+    
+    Normal CDFs come from math.erfc and the whole kernel is JIT-compiled, so a
+    call costs a handful of native math functions. Greeks follow py_vollib
+    conventions: theta per calendar day, vega per 1% change in volatility.
+    
+    Returns:
+        (price, delta, gamma, theta, vega)
+    """
+    sqrt_t = math.sqrt(T)
+    sig_t = sigma * sqrt_t
+    d1 = (math.log(S / K) + (r + 0.5 * sigma * sigma) * T) / sig_t
+    d2 = d1 - sig_t
+    disc_k = K * math.exp(-r * T)
+    pdf_d1 = math.exp(-0.5 * d1 * d1) * _INV_SQRT_2PI
+    
+    if is_call:
+        cdf_d1 = 0.5 * math.erfc(-d1 * _SQRT1_2)
+        cdf_d2 = 0.5 * math.erfc(-d2 * _SQRT1_2)
+        price = S * cdf_d1 - disc_k * cdf_d2
+        delta = cdf_d1
+        carry = -r * disc_k * cdf_d2
+    else:
+        cdf_md1 = 0.5 * math.erfc(d1 * _SQRT1_2)
+        cdf_md2 = 0.5 * math.erfc(d2 * _SQRT1_2)
+        price = disc_k * cdf_md2 - S * cdf_md1
+        delta = -cdf_md1
+        carry = r * disc_k * cdf_md2
+        
+    gamma = pdf_d1 / (S * sig_t)
+    theta = (-S * pdf_d1 * sigma / (2 * sqrt_t) + carry) / 365.0
+    vega = S * pdf_d1 * sqrt_t * 0.01
+    return price, delta, gamma, theta, vega
+
+@njit(cache=True)
+def _bs_book(is_call: np.ndarray,
+             S: np.ndarray,
+             K: np.ndarray,
+             T: np.ndarray,
+             r: float,
+             sigma: np.ndarray) -> np.ndarray:
+    """
+    Price a whole book of contracts with _bs_price_and_greeks
+    
+    Contracts with missing or non-positive inputs (e.g. no volatility history
+    yet) are left as NaN. The check happens here, outside the fastmath kernel,
+    so NaN inputs never reach it.
+    
+    Returns:
+        (n, 5) array of (price, delta, gamma, theta, vega) per contract
+    """
+    out = np.full((S.size, 5), np.nan)
+    for i in range(S.size):
+        if S[i] > 0 and K[i] > 0 and T[i] > 0 and sigma[i] > 0:
+            price, delta, gamma, theta, vega = _bs_price_and_greeks(
+                is_call[i], S[i], K[i], T[i], r, sigma[i]
+            )
+            out[i, 0] = price
+            out[i, 1] = delta
+            out[i, 2] = gamma
+            out[i, 3] = theta
+            out[i, 4] = vega
+    return out
 
 class OptionBacktest(BaseBacktest):
     def __init__(self,
@@ -34,26 +129,48 @@ class OptionBacktest(BaseBacktest):
         super().__init__(strategy, start_date, end_date, initial_capital, commission)
         self.risk_free_rate = risk_free_rate
         self.greeks = {}  # Store greeks for each position
+        self.option_chains = {}  # Latest option chain per symbol
         
-    def fetch_data(self) -> pd.DataFrame:
+    def fetch_data(self) -> SymbolPanel:
         """Fetch option and underlying data"""
-        data = {}
+        histories = {}
+        symbols = list(self.strategy.symbols)
+        tickers = {symbol: yf.Ticker(symbol) for symbol in symbols}
         
-        # Fetch underlying data
-        for symbol in self.strategy.symbols:
-            # Underlying data
-            ticker = yf.Ticker(symbol)
-            hist = ticker.history(start=self.start_date, end=self.end_date)
-            data[symbol] = hist
+        # Downloads are network bound: overlap them in a small thread pool
+        with ThreadPoolExecutor(max_workers=max(1, min(10, len(symbols)))) as executor:
+            hist_futures = {
+                symbol: executor.submit(ticker.history, start=self.start_date,
+                                        end=self.end_date, timeout=10)
+                for symbol, ticker in tickers.items()
+            }
+            chain_futures = {
+                symbol: executor.submit(ticker.option_chain)
+                for symbol, ticker in tickers.items()
+            }
             
-            # Option chain data (if available)
-            try:
-                options = ticker.option_chain()
-                data[f"{symbol}_options"] = options
-            except:
-                print(f"No option data available for {symbol}")
+            for symbol in symbols:
+                # Underlying data
+                histories[symbol] = hist_futures[symbol].result()
+                
+                # Option chain data (if available)
+                try:
+                    self.option_chains[symbol] = chain_futures[symbol].result()
+                except:
+                    print(f"No option data available for {symbol}")
                 
-        return pd.concat(data, axis=1)
+        self._build_close_matrix(histories)
+        self._build_hist_vol()
+        return SymbolPanel(histories, self.dates)
+        
+    def _build_hist_vol(self) -> None:
+        """Precompute annualized historical volatility aligned with the close matrix"""
+        returns = pd.DataFrame(self.close).pct_change()
+        # Trailing one-year volatility, expanding window until 30 observations exist
+        vol = returns.rolling(252, min_periods=30).std().fillna(
+            returns.expanding(min_periods=2).std()
+        ) * np.sqrt(252)
+        self._hist_vol = vol.to_numpy(dtype=np.float64)
         
     def calculate_option_price(self,
                              underlying_price: float,
@@ -62,12 +179,9 @@ class OptionBacktest(BaseBacktest):
                              volatility: float,
                              option_type: str) -> float:
         """Calculate theoretical option price using Black-Scholes"""
-        try:
-            price = bs(option_type.lower(), underlying_price, strike_price,
-                      time_to_expiry, self.risk_free_rate, volatility)
-            return price
-        except:
-            return 0.0
+        return self.calculate_price_and_greeks(
+            underlying_price, strike_price, time_to_expiry, volatility, option_type
+        )[0]
             
     def calculate_greeks(self,
                         underlying_price: float,
@@ -76,19 +190,25 @@ class OptionBacktest(BaseBacktest):
                         volatility: float,
                         option_type: str) -> Dict[str, float]:
         """Calculate option Greeks"""
-        try:
-            return {
-                "delta": delta(option_type.lower(), underlying_price, strike_price,
-                             time_to_expiry, self.risk_free_rate, volatility),
-                "gamma": gamma(option_type.lower(), underlying_price, strike_price,
-                             time_to_expiry, self.risk_free_rate, volatility),
-                "theta": theta(option_type.lower(), underlying_price, strike_price,
-                             time_to_expiry, self.risk_free_rate, volatility),
-                "vega": vega(option_type.lower(), underlying_price, strike_price,
-                           time_to_expiry, self.risk_free_rate, volatility)
-            }
-        except:
-            return {"delta": 0.0, "gamma": 0.0, "theta": 0.0, "vega": 0.0}
+        return self.calculate_price_and_greeks(
+            underlying_price, strike_price, time_to_expiry, volatility, option_type
+        )[1]
+        
+    def calculate_price_and_greeks(self,
+                                   underlying_price: float,
+                                   strike_price: float,
+                                   time_to_expiry: float,
+                                   volatility: float,
+                                   option_type: str) -> Tuple[float, Dict[str, float]]:
+        """Calculate option price and Greeks from a single evaluation of d1, d2 and N(d)"""
+        if (time_to_expiry <= 0.0 or volatility <= 0.0
+                or underlying_price <= 0.0 or strike_price <= 0.0):
+            return 0.0, {"delta": 0.0, "gamma": 0.0, "theta": 0.0, "vega": 0.0}
+        price, delta, gamma, theta, vega = _bs_price_and_greeks(
+            option_type.lower().startswith("c"), underlying_price, strike_price,
+            time_to_expiry, self.risk_free_rate, volatility
+        )
+        return price, {"delta": delta, "gamma": gamma, "theta": theta, "vega": vega}
             
     def execute_trades(self, date: datetime, signals: Dict[str, Any]) -> None:
         """Execute option trades"""
@@ -108,16 +228,13 @@ class OptionBacktest(BaseBacktest):
                 volatility = option_data.get("volatility", 0.2)
                 
                 # Calculate time to expiry in years
-                tte = (expiry - date).days / 365.0
+                tte = (expiry.toordinal() - date.toordinal()) / 365.0
                 
                 # Get underlying price
-                underlying_price = signals["data"].loc[symbol, "Close"]
+                underlying_price = self.close[self._date_pos[date], self._sym_pos[symbol]]
                 
                 # Calculate option price and greeks
-                option_price = self.calculate_option_price(
-                    underlying_price, strike, tte, volatility, option_type
-                )
-                greeks = self.calculate_greeks(
+                option_price, greeks = self.calculate_price_and_greeks(
                     underlying_price, strike, tte, volatility, option_type
                 )
                 
@@ -130,23 +247,23 @@ class OptionBacktest(BaseBacktest):
                 self.current_capital -= commission_cost
                 
                 # Record trade
-                trade_id = f"{symbol}_{strike}_{expiry.strftime('%Y%m%d')}_{option_type}"
-                self.trades.append({
-                    "date": date,
-                    "symbol": symbol,
-                    "trade_id": trade_id,
-                    "action": "BUY" if signal > 0 else "SELL",
-                    "option_type": option_type,
-                    "strike": strike,
-                    "expiry": expiry,
-                    "price": option_price,
-                    "contracts": contracts,
-                    "value": position_value,
-                    "commission": commission_cost,
-                    "underlying_price": underlying_price,
-                    "return": 0,  # Will be updated later
+                trade_id = TradeKey(symbol, float(strike), expiry.toordinal(), option_type)
+                self.trades.append(TradeRow(
+                    date=date,
+                    symbol=symbol,
+                    trade_id=trade_id,
+                    action="BUY" if signal > 0 else "SELL",
+                    option_type=option_type,
+                    strike=strike,
+                    expiry=expiry,
+                    price=option_price,
+                    contracts=contracts,
+                    value=position_value,
+                    commission=commission_cost,
+                    underlying_price=underlying_price,
+                    return_=0,  # Will be updated later
                     **greeks  # Add greeks to trade record
-                })
+                ))
                 
                 # Update positions and greeks
                 if trade_id in self.positions:
@@ -160,50 +277,74 @@ class OptionBacktest(BaseBacktest):
         """Calculate current portfolio value including options"""
         portfolio_value = self.current_capital
         
-        # Add value of all positions
+        # Today's close and volatility rows, looked up once per date rather than per position
+        row = self._date_pos[date]
+        close_today = self.close[row]
+        vol_today = self._hist_vol[row]
+        date_ord = date.toordinal()
+        
+        # Collect all live positions so they can be priced in a single call
+        live_ids, live_contracts = [], []
+        is_call, cols, K, T = [], [], [], []
         for trade_id, contracts in self.positions.items():
             if contracts != 0:
-                # Parse trade_id
-                symbol, strike, expiry, option_type = trade_id.split("_")
-                strike = float(strike)
-                expiry = datetime.strptime(expiry, "%Y%m%d")
+                symbol, strike, expiry_ord, option_type = trade_id
                 
                 # Skip expired options
-                if date > expiry:
+                if date_ord > expiry_ord:
                     continue
                     
-                # Get current underlying price
-                underlying_price = data.loc[symbol, "Close"]
-                
-                # Calculate time to expiry
-                tte = (expiry - date).days / 365.0
+                live_ids.append(trade_id)
+                live_contracts.append(contracts)
+                is_call.append(option_type.lower()[0] == "c")
+                cols.append(self._sym_pos[symbol])
+                K.append(strike)
+                T.append((expiry_ord - date_ord) / 365.0)
                 
-                # Get implied volatility (using historical volatility as approximation)
-                volatility = data.loc[symbol, "Close"].pct_change().std() * np.sqrt(252)
-                
-                # Calculate current option price
-                option_price = self.calculate_option_price(
-                    underlying_price, strike, tte, volatility, option_type
-                )
-                
-                # Calculate position value
-                position_value = contracts * option_price * 100
-                portfolio_value += position_value
-                
-                # Update greeks
-                self.greeks[trade_id] = self.calculate_greeks(
-                    underlying_price, strike, tte, volatility, option_type
-                )
-                
-                # Update trade returns
-                if len(self.trades) > 0 and self.trades[-1]["trade_id"] == trade_id:
-                    last_trade = self.trades[-1]
-                    if last_trade["date"] != date:
-                        returns = ((option_price - last_trade["price"]) / last_trade["price"]) * 100
-                        self.trades[-1]["return"] = returns if last_trade["action"] == "BUY" else -returns
+        if not live_ids:
+            return portfolio_value
+            
+        # Underlying price and implied volatility (historical volatility as approximation)
+        S = close_today[cols]
+        sigma = vol_today[cols]
+        K, T = (np.asarray(x, dtype=np.float64) for x in (K, T))
+        
+        # Price and compute greeks for the whole book at once
+        book = np.nan_to_num(_bs_book(np.asarray(is_call, dtype=np.bool_), S, K, T, self.risk_free_rate, sigma))
+        prices = book[:, 0]
+        
+        # Calculate position value
+        portfolio_value += float(np.dot(live_contracts, prices)) * 100
+        
+        for i, trade_id in enumerate(live_ids):
+            option_price = prices[i]
+            
+            # Update greeks
+            _, delta, gamma, theta, vega = book[i].tolist()
+            self.greeks[trade_id] = {
+                "delta": delta,
+                "gamma": gamma,
+                "theta": theta,
+                "vega": vega
+            }
+            
+            # Update trade returns
+            if len(self.trades) > 0 and self.trades[-1].trade_id == trade_id:
+                last_trade = self.trades[-1]
+                if last_trade.date != date:
+                    returns = ((option_price - last_trade.price) / last_trade.price) * 100
+                    self.trades[-1] = last_trade._replace(
+                        return_=returns if last_trade.action == "BUY" else -returns
+                    )
                 
         return portfolio_value
         
+    def trades_frame(self) -> pd.DataFrame:
+        """Trade log as a DataFrame, built directly from the fixed-schema rows"""
+        return pd.DataFrame(self.trades, columns=TradeRow._fields).rename(
+            columns={"return_": "return"}
+        )
+        
     def plot_strategy_specific(self):
         """Plot option-specific analysis"""
         self._plot_greeks_analysis()
@@ -211,7 +352,7 @@ class OptionBacktest(BaseBacktest):
         
     def _plot_greeks_analysis(self):
         """Plot Greeks analysis"""
-        trades_df = pd.DataFrame(self.trades)
+        trades_df = self.trades_frame()
         if len(trades_df) == 0:
             return
             
@@ -243,7 +384,7 @@ class OptionBacktest(BaseBacktest):
         
     def _plot_risk_analysis(self):
         """Plot risk analysis"""
-        trades_df = pd.DataFrame(self.trades)
+        trades_df = self.trades_frame()
         if len(trades_df) == 0:
             return
             
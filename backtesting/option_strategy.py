@@ -3,10 +3,11 @@
 """
 from typing import Dict, List, Optional, Union, Tuple
 import backtrader as bt
-import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-from dataclasses import dataclass
+from datetime import date, datetime
+from dataclasses import dataclass, field
+from numpy.lib.stride_tricks import sliding_window_view
+from numba import njit, prange
 
 from ..pricing.stochastic_vol import (
     HestonModel, HestonParameters,
@@ -14,6 +15,90 @@ from ..pricing.stochastic_vol import (
     GARCHModel
 )
 
+@njit(cache=True, parallel=True)
+def _window_zscore(windows: np.ndarray) -> np.ndarray:
+    """对每个窗口计算末值相对窗口均值的Z分数(总体标准差)"""
+    n, w = windows.shape
+    out = np.empty(n)
+    for i in prange(n):
+        mean = 0.0
+        for j in range(w):
+            mean += windows[i, j]
+        mean /= w
+        var = 0.0
+        for j in range(w):
+            d = windows[i, j] - mean
+            var += d * d
+        var /= w
+        out[i] = (windows[i, w - 1] - mean) / np.sqrt(var) if var > 0 else np.nan
+    return out
+
+def rolling_zscore(values: np.ndarray, lookback: int) -> np.ndarray:
+    """滚动Z分数，与bt.indicators.ZScore口径一致，前lookback-1个值为NaN"""
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    z = np.full(values.size, np.nan)
+    if values.size >= lookback:
+        z[lookback - 1:] = _window_zscore(sliding_window_view(values, lookback))
+    return z
+
+@njit(cache=True)
+def volatility_signals(z: np.ndarray,
+                       entry_z: float,
+                       exit_z: float,
+                       min_hold: int,
+                       expiry_idx: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """一次扫描整段Z分数，生成波动率策略的开平仓信号
+    
+    入场和出场条件沿用VolatilityStrategy.strategy_logic：Z分数高于entry_z做空跨式(-1)，
+    低于-entry_z做多跨式(1)，两者都要求距上次平仓已满min_hold个bar；|Z|回落到
+    exit_z以内时平仓。持仓到达到期bar时先按到期平仓，再处理当bar信号。
+    
+    状态机同一时间只持有一组跨式：信号持续时不加仓，反向信号在同一bar先平后开。
+    VolatilityStrategy则在信号持续的每个bar都开一组新到期日的跨式并叠加持仓，
+    反向信号只追加反向腿而不平掉原持仓，因此两条路径的结果不可直接对比。
+    
+    Args:
+        expiry_idx: 在第i个bar开仓的持仓到期的bar位置，等于len(z)表示区间内不到期
+    
+    Returns:
+        (开仓位置, 开仓方向, 平仓位置)，第k次平仓对应第k次开仓，
+        最后一笔持仓未平时平仓位置比开仓少一个
+    """
+    n = z.size
+    entry_idx = np.empty(n, np.int64)
+    entry_side = np.empty(n, np.int8)
+    exit_idx = np.empty(n, np.int64)
+    ne = 0
+    nx = 0
+    pos = 0
+    hold = 0
+    expires_at = n
+    for i in range(n):
+        hold += 1
+        if pos != 0 and i >= expires_at:
+            exit_idx[nx] = i
+            nx += 1
+            pos = 0
+        side = pos
+        if z[i] > entry_z and hold >= min_hold:
+            side = -1
+        elif z[i] < -entry_z and hold >= min_hold:
+            side = 1
+        elif abs(z[i]) < exit_z:
+            side = 0
+            hold = 0
+        if side != pos:
+            if pos != 0:
+                exit_idx[nx] = i
+                nx += 1
+            if side != 0:
+                entry_idx[ne] = i
+                entry_side[ne] = side
+                ne += 1
+                expires_at = expiry_idx[i]
+            pos = side
+    return entry_idx[:ne], entry_side[:ne], exit_idx[:nx]
+
 @dataclass
 class OptionPosition:
     """期权持仓"""
@@ -23,18 +108,32 @@ class OptionPosition:
     quantity: int  # 正数为多头，负数为空头
     entry_price: float
     entry_date: datetime
+    expiry_ord: int = field(init=False)  # 到期日序数，避免逐bar构造timedelta
+    
+    def __post_init__(self):
+        self.expiry_ord = self.expiry.toordinal()
     
 class OptionData(bt.feeds.PandasData):
     """期权数据源"""
     
-    lines = ('strike', 'expiry', 'is_call', 'impl_vol',)
+    lines = ('strike', 'expiry', 'is_call', 'impl_vol', 'vol_z',)
     params = (
         ('strike', -1),
         ('expiry', -1),
         ('is_call', -1),
         ('impl_vol', -1),
+        ('vol_z', -1),
     )
 
+class UnderlyingData(bt.feeds.PandasData):
+    """标的数据源，附带隐含波动率及预计算的波动率Z分数"""
+    
+    lines = ('impl_vol', 'vol_z',)
+    params = (
+        ('impl_vol', -1),
+        ('vol_z', -1),
+    )
+    
 class BaseOptionStrategy(bt.Strategy):
     """期权策略基类"""
     
@@ -42,13 +141,24 @@ class BaseOptionStrategy(bt.Strategy):
         ('risk_free_rate', 0.03),  # 无风险利率
         ('max_positions', 10),      # 最大持仓数量
         ('max_risk_pct', 0.02),     # 单个持仓最大风险
+        ('garch_refit_every', 20),  # GARCH重新拟合间隔(bar)
     )
     
     def __init__(self):
         self.options = {}  # 期权持仓字典
+        self._sync_arrays()
         self.heston_model = None  # Heston模型
         self.garch_model = None   # GARCH模型
         self.vol_forecast = None  # 波动率预测
+        self._garch_params = None  # 上次拟合的(omega, alpha, beta)，用于热启动
+        self._garch_var = None     # GARCH递推的当前方差预测
+        self._bars_since_fit = 0
+        
+        # 对数价格环形缓冲，每个值写两份使最近窗口始终是连续切片
+        self._window = 252
+        self._logprice_buf = np.empty(2 * self._window)
+        self._buf_head = 0
+        self._buf_fill = 0
         
         # 记录Greeks
         self.total_delta = 0
@@ -58,6 +168,9 @@ class BaseOptionStrategy(bt.Strategy):
         
     def next(self):
         """每个bar调用一次"""
+        self._today_ord = self.datetime.date().toordinal()
+        self._push_close()
+        
         # 更新模型
         self.update_models()
         
@@ -70,24 +183,51 @@ class BaseOptionStrategy(bt.Strategy):
         # 执行策略逻辑
         self.strategy_logic()
         
+    def _push_close(self):
+        """将当前收盘价的对数写入环形缓冲"""
+        x = np.log(self.data.close[0])
+        i = self._buf_head
+        self._logprice_buf[i] = x
+        self._logprice_buf[i + self._window] = x
+        self._buf_head = (i + 1) % self._window
+        self._buf_fill = min(self._buf_fill + 1, self._window)
+        
     def update_models(self):
         """更新定价模型"""
-        # 获取历史数据
-        hist_data = pd.Series([d for d in self.data.close.get(size=252)])
-        returns = np.log(hist_data / hist_data.shift(1)).dropna()
+        # 最近252个对数价格的差分即对数收益率
+        end = self._buf_head + self._window
+        returns = np.diff(self._logprice_buf[end - self._buf_fill:end])
         
         # 更新GARCH模型
         if len(returns) >= 30:  # 至少需要30个数据点
             if self.garch_model is None:
                 self.garch_model = GARCHModel(0.1, 0.1, 0.8)
-            try:
-                self.garch_model.fit(returns.values)
-                self.vol_forecast = np.sqrt(self.garch_model.forecast_variance(
-                    current_var=returns.var(),
-                    last_return=returns.iloc[-1]
-                ) * 252)  # 年化
-            except:
-                self.vol_forecast = returns.std() * np.sqrt(252)
+            if self._bars_since_fit == 0 or self._garch_var is None:
+                try:
+                    # 按固定间隔重新拟合，并用上次的参数热启动
+                    self.garch_model.fit(returns, init_guess=self._garch_params)
+                    self._garch_params = (
+                        self.garch_model.omega,
+                        self.garch_model.alpha,
+                        self.garch_model.beta
+                    )
+                    self._garch_var = self.garch_model.forecast_variance(
+                        current_var=returns.var(ddof=1),
+                        last_return=returns[-1]
+                    )
+                except:
+                    self._garch_var = None
+                    self.vol_forecast = returns.std(ddof=1) * np.sqrt(252)
+            else:
+                # 两次拟合之间沿GARCH递推更新方差
+                self._garch_var = self.garch_model.forecast_variance(
+                    current_var=self._garch_var,
+                    last_return=returns[-1]
+                )
+                
+            if self._garch_var is not None:
+                self.vol_forecast = np.sqrt(self._garch_var * 252)  # 年化
+            self._bars_since_fit = (self._bars_since_fit + 1) % self.p.garch_refit_every
                 
         # 更新Heston模型
         if self.heston_model is None:
@@ -100,6 +240,16 @@ class BaseOptionStrategy(bt.Strategy):
                 v0=self.vol_forecast**2 if self.vol_forecast else 0.04
             ))
             
+    def _sync_arrays(self):
+        """按self.options重建持仓字段数组(SoA)，持仓变动后调用"""
+        positions = list(self.options.values())
+        self._keys = list(self.options.keys())
+        self._strikes = np.array([p.strike for p in positions], dtype=np.float64)
+        self._expiry_ords = np.array([p.expiry_ord for p in positions], dtype=np.int32)
+        self._is_call = np.array([p.is_call for p in positions], dtype=bool)
+        self._qty = np.array([p.quantity for p in positions], dtype=np.float64)
+        self._entry_price = np.array([p.entry_price for p in positions], dtype=np.float64)
+        
     def update_greeks(self):
         """更新组合Greeks"""
         self.total_delta = 0
@@ -107,96 +257,55 @@ class BaseOptionStrategy(bt.Strategy):
         self.total_theta = 0
         self.total_vega = 0
         
-        for opt_key, position in self.options.items():
-            # 计算期权剩余期限
-            tau = (position.expiry - self.datetime.date()).days / 365.0
-            if tau <= 0:
-                continue
-                
-            # 使用Heston模型计算Greeks
-            if self.heston_model:
-                try:
-                    # 计算价格和Greeks
-                    price = self.heston_model.price_european(
-                        S0=self.data.close[0],
-                        K=position.strike,
-                        T=tau,
-                        r=self.p.risk_free_rate,
-                        is_call=position.is_call
-                    )
-                    
-                    # 计算数值Greeks
-                    h = self.data.close[0] * 0.001  # 价格变动步长
-                    t_step = 1/252  # 时间步长
-                    
-                    # Delta
-                    price_up = self.heston_model.price_european(
-                        S0=self.data.close[0] + h,
-                        K=position.strike,
-                        T=tau,
-                        r=self.p.risk_free_rate,
-                        is_call=position.is_call
-                    )
-                    delta = (price_up - price) / h
-                    
-                    # Gamma
-                    price_down = self.heston_model.price_european(
-                        S0=self.data.close[0] - h,
-                        K=position.strike,
-                        T=tau,
-                        r=self.p.risk_free_rate,
-                        is_call=position.is_call
-                    )
-                    gamma = (price_up - 2*price + price_down) / (h**2)
-                    
-                    # Theta
-                    price_next = self.heston_model.price_european(
-                        S0=self.data.close[0],
-                        K=position.strike,
-                        T=tau - t_step,
-                        r=self.p.risk_free_rate,
-                        is_call=position.is_call
-                    )
-                    theta = (price_next - price) / t_step
-                    
-                    # Vega (波动率变动1%)
-                    orig_v0 = self.heston_model.params.v0
-                    self.heston_model.params.v0 *= 1.01
-                    price_vol_up = self.heston_model.price_european(
-                        S0=self.data.close[0],
-                        K=position.strike,
-                        T=tau,
-                        r=self.p.risk_free_rate,
-                        is_call=position.is_call
-                    )
-                    vega = (price_vol_up - price) / (0.01)
-                    self.heston_model.params.v0 = orig_v0
-                    
-                    # 更新总Greeks
-                    qty = position.quantity
-                    self.total_delta += delta * qty
-                    self.total_gamma += gamma * qty
-                    self.total_theta += theta * qty
-                    self.total_vega += vega * qty
-                    
-                except:
-                    pass
+        if not self.heston_model or not self._keys:
+            return
+            
+        # 计算期权剩余期限，只处理未到期持仓
+        tau = (self._expiry_ords - self._today_ord) / 365.0
+        live = np.flatnonzero(tau > 0)
+        if live.size == 0:
+            return
+            
+        # 使用Heston模型一次批量积分得到全部持仓的价格和解析Greeks
+        S = float(self.data.close[0])
+        _, delta, gamma, theta, vega = self.heston_model.price_european_batch(
+            S0=S,
+            K=self._strikes[live],
+            T=tau[live],
+            r=self.p.risk_free_rate,
+            is_call=self._is_call[live]
+        )
+        
+        # 更新总Greeks
+        qty = self._qty[live]
+        self.total_delta = float(qty @ delta)
+        self.total_gamma = float(qty @ gamma)
+        self.total_theta = float(qty @ theta)
+        self.total_vega = float(qty @ vega)
                     
     def check_expirations(self):
         """检查并处理到期期权"""
-        for opt_key in list(self.options.keys()):
-            position = self.options[opt_key]
-            if position.expiry <= self.datetime.date():
-                # 计算到期收益
-                if position.is_call:
-                    payoff = max(0, self.data.close[0] - position.strike)
-                else:
-                    payoff = max(0, position.strike - self.data.close[0])
-                    
-                # 平仓并记录收益
-                pnl = (payoff - position.entry_price) * position.quantity
-                self.log(f'Option expired: {opt_key}, PnL: {pnl:.2f}')
-                del self.options[opt_key]
+        expiring = np.flatnonzero(self._expiry_ords <= self._today_ord)
+        if expiring.size == 0:
+            return
+            
+        # 整批计算到期收益
+        S = float(self.data.close[0])
+        strikes = self._strikes[expiring]
+        payoff = np.where(
+            self._is_call[expiring],
+            np.maximum(S - strikes, 0.0),
+            np.maximum(strikes - S, 0.0)
+        )
+        pnl = (payoff - self._entry_price[expiring]) * self._qty[expiring]
+        
+        # 平仓并记录收益
+        for i, opt_pnl in zip(expiring, pnl):
+            opt_key = self._keys[i]
+            self.log(f'Option expired: {opt_key}, PnL: {opt_pnl:.2f}')
+            del self.options[opt_key]
+            
+        self._sync_arrays()
                 
     def can_trade(self, cost: float) -> bool:
         """检查是否可以交易
@@ -235,10 +344,14 @@ class VolatilityStrategy(BaseOptionStrategy):
     
     def __init__(self):
         super().__init__()
-        self.vol_z = bt.indicators.ZScore(
-            self.data.impl_vol,
-            period=self.p.lookback
-        )
+        # 优先使用数据源上预计算的Z分数，逐bar只需O(1)读取
+        if 'vol_z' in self.data.lines.getlinealiases():
+            self.vol_z = self.data.vol_z
+        else:
+            self.vol_z = bt.indicators.ZScore(
+                self.data.impl_vol,
+                period=self.p.lookback
+            )
         self.hold_days = 0
         
     def strategy_logic(self):
@@ -250,79 +363,60 @@ class VolatilityStrategy(BaseOptionStrategy):
             return
             
         # 寻找适合的期权
-        if self.vol_z > self.p.vol_entry_z and self.hold_days >= self.p.min_hold_days:
+        vol_z = self.vol_z[0]
+        if vol_z > self.p.vol_entry_z and self.hold_days >= self.p.min_hold_days:
             # 波动率高，做空跨式策略
             self.short_straddle()
-        elif self.vol_z < -self.p.vol_entry_z and self.hold_days >= self.p.min_hold_days:
+        elif vol_z < -self.p.vol_entry_z and self.hold_days >= self.p.min_hold_days:
             # 波动率低，做多跨式策略
             self.long_straddle()
-        elif abs(self.vol_z) < self.p.vol_exit_z:
+        elif abs(vol_z) < self.p.vol_exit_z:
             # 平仓所有持仓
             self.close_all()
             
     def short_straddle(self):
         """做空跨式策略"""
-        # 找到平值期权
-        atm_strike = round(self.data.close[0] / 5) * 5  # 四舍五入到最近的5
-        
-        # 构建期权组合
-        expiry = self.datetime.date() + timedelta(days=30)  # 30天后到期
-        
         # 做空看涨和看跌期权
-        opt_key = f'C_{atm_strike}_{expiry}'
-        if opt_key not in self.options:
-            self.options[opt_key] = OptionPosition(
-                strike=atm_strike,
-                expiry=expiry,
-                is_call=True,
-                quantity=-1,
-                entry_price=self.data.close[0],
-                entry_date=self.datetime.date()
-            )
-            
-        opt_key = f'P_{atm_strike}_{expiry}'
-        if opt_key not in self.options:
-            self.options[opt_key] = OptionPosition(
-                strike=atm_strike,
-                expiry=expiry,
-                is_call=False,
-                quantity=-1,
-                entry_price=self.data.close[0],
-                entry_date=self.datetime.date()
-            )
+        self._open_straddle(quantity=-1)
             
     def long_straddle(self):
         """做多跨式策略"""
+        # 做多看涨和看跌期权
+        self._open_straddle(quantity=1)
+        
+    def _open_straddle(self, quantity: int):
+        """按平值行权价开跨式组合，只有新增合约时才重建持仓数组
+        
+        Args:
+            quantity: 每条腿的数量，正数为多头，负数为空头
+        """
         # 找到平值期权
-        atm_strike = round(self.data.close[0] / 5) * 5
+        S = float(self.data.close[0])
+        today = self.datetime.date()
+        atm_strike = round(S / 5) * 5  # 四舍五入到最近的5
         
         # 构建期权组合
-        expiry = self.datetime.date() + timedelta(days=30)
+        expiry = date.fromordinal(today.toordinal() + 30)
         
-        # 做多看涨和看跌期权
-        opt_key = f'C_{atm_strike}_{expiry}'
-        if opt_key not in self.options:
-            self.options[opt_key] = OptionPosition(
-                strike=atm_strike,
-                expiry=expiry,
-                is_call=True,
-                quantity=1,
-                entry_price=self.data.close[0],
-                entry_date=self.datetime.date()
-            )
-            
-        opt_key = f'P_{atm_strike}_{expiry}'
-        if opt_key not in self.options:
-            self.options[opt_key] = OptionPosition(
-                strike=atm_strike,
-                expiry=expiry,
-                is_call=False,
-                quantity=1,
-                entry_price=self.data.close[0],
-                entry_date=self.datetime.date()
-            )
+        added = False
+        for prefix, is_call in (('C', True), ('P', False)):
+            opt_key = f'{prefix}_{atm_strike}_{expiry}'
+            if opt_key not in self.options:
+                self.options[opt_key] = OptionPosition(
+                    strike=atm_strike,
+                    expiry=expiry,
+                    is_call=is_call,
+                    quantity=quantity,
+                    entry_price=S,
+                    entry_date=today
+                )
+                added = True
+                
+        if added:
+            self._sync_arrays()
             
     def close_all(self):
         """平仓所有持仓"""
         self.options.clear()
+        self._sync_arrays()
         self.hold_days = 0
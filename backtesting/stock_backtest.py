@@ -3,23 +3,30 @@ Stock Backtesting Module
 Implements stock-specific backtesting functionality
 """
 
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Any
 from datetime import datetime
 import yfinance as yf
-from .base_backtest import BaseBacktest
+from .base_backtest import BaseBacktest, SymbolPanel
 
 class StockBacktest(BaseBacktest):
-    def fetch_data(self) -> pd.DataFrame:
+    def fetch_data(self) -> SymbolPanel:
         """Fetch stock historical data"""
-        data = {}
-        for symbol in self.strategy.symbols:
-            ticker = yf.Ticker(symbol)
-            hist = ticker.history(start=self.start_date, end=self.end_date)
-            data[symbol] = hist
+        symbols = list(self.strategy.symbols)
+        
+        # Downloads are network bound: overlap them in a small thread pool
+        with ThreadPoolExecutor(max_workers=max(1, min(10, len(symbols)))) as executor:
+            futures = {
+                symbol: executor.submit(yf.Ticker(symbol).history, start=self.start_date,
+                                        end=self.end_date, timeout=10)
+                for symbol in symbols
+            }
+            data = {symbol: future.result() for symbol, future in futures.items()}
             
-        return pd.concat(data, axis=1)
+        self._build_close_matrix(data)
+        return SymbolPanel(data, self.dates)
         
     def execute_trades(self, date: datetime, signals: Dict[str, Any]) -> None:
         """Execute stock trades"""
@@ -60,11 +67,12 @@ class StockBacktest(BaseBacktest):
     def calculate_portfolio_value(self, date: datetime, data: pd.DataFrame) -> float:
         """Calculate current portfolio value"""
         portfolio_value = self.current_capital
+        row = self._date_pos[date]
         
         # Add value of all positions
         for symbol, shares in self.positions.items():
             if shares != 0:
-                price = data.loc[symbol, "Close"]
+                price = self.close[row, self._sym_pos[symbol]]
                 position_value = shares * price
                 portfolio_value += position_value
                 
@@ -3,6 +3,9 @@ Strategy Backtesting Module
 This module provides backtesting and visualization capabilities for trading strategies
 """
 
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
@@ -11,6 +14,36 @@ from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta
 import yfinance as yf
 from ..strategies.base_strategy import BaseStrategy
+from ..utils.metrics_utils import compute_metrics
+
+_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "tradetools", "yf")
+
+@lru_cache(maxsize=256)
+def _fetch_one(symbol: str, start: str, end: str, interval: str = "1d") -> pd.DataFrame:
+    """
+    Download one symbol's history, memoized in memory and on disk
+    
+    Ranges that end before today are immutable, so they are also written to a
+    parquet file under ~/.cache/tradetools/yf and read back on later runs.
+    The disk cache is skipped silently when no parquet engine is installed.
+    Callers must treat the returned frame as read-only since it is shared.
+    """
+    path = os.path.join(_CACHE_DIR, f"{symbol}_{start}_{end}_{interval}.parquet")
+    if os.path.exists(path):
+        try:
+            return pd.read_parquet(path)
+        except (ImportError, ValueError, OSError):
+            pass
+            
+    hist = yf.Ticker(symbol).history(start=start, end=end, interval=interval, timeout=10)
+    
+    if not hist.empty and pd.Timestamp(end) < pd.Timestamp.today().normalize():
+        try:
+            os.makedirs(_CACHE_DIR, exist_ok=True)
+            hist.to_parquet(path)
+        except (ImportError, ValueError, OSError):
+            pass
+    return hist
 
 class StrategyBacktest:
     def __init__(self,
@@ -35,29 +68,123 @@ class StrategyBacktest:
         self.initial_capital = initial_capital
         self.commission = commission
         
-        self.portfolio_value = []
+        # Equity curve: preallocated values aligned with value_dates
+        self.portfolio_value = np.empty(0, dtype=np.float64)
+        self.value_dates = pd.DatetimeIndex([])
         self.positions = {}
-        self.trades = []
         self.current_capital = initial_capital
+        self.data: Optional[pd.DataFrame] = None
+        self._results_cache: Optional[Dict[str, Any]] = None
+        
+        # Trade log as struct-of-arrays; dates and symbols are stored as row/column ids
+        self._trade_symbols: List[str] = []
+        self._reset_trades(1024)
         
     def fetch_data(self) -> pd.DataFrame:
         """Fetch historical data for all symbols"""
-        data = {}
-        for symbol in self.strategy.symbols:
-            ticker = yf.Ticker(symbol)
-            hist = ticker.history(start=self.start_date, end=self.end_date)
-            data[symbol] = hist
+        symbols = list(self.strategy.symbols)
+        
+        # Downloads are network bound: overlap them in a thread pool
+        with ThreadPoolExecutor(max_workers=max(1, min(32, len(symbols)))) as executor:
+            histories = executor.map(
+                lambda symbol: _fetch_one(symbol, self.start_date, self.end_date), symbols
+            )
+            data = dict(zip(symbols, histories))
             
         return pd.concat(data, axis=1)
         
     def run_backtest(self) -> Dict[str, Any]:
         """Run backtest simulation"""
         data = self.fetch_data()
+        self.data = data
+        self._results_cache = None
+        
+        # Strategies that support it produce every signal in one call
+        signals = self.strategy.on_data_batch(data)
+        if signals is None:
+            return self._run_event_loop(data)
+            
+        self._run_vectorized(data, signals)
+        return self.get_results()
+        
+    def _run_vectorized(self, data: pd.DataFrame, signals: pd.DataFrame) -> None:
+        """
+        Replay a precomputed signals matrix without a per-date Python loop
+        
+        Reproduces the event loop exactly: each non-zero signal trades
+        current_capital * |signal| worth of shares, and its commission is taken
+        from current_capital before the next symbol (in column order) is sized.
+        That makes the capital seen by every trade a running product over the
+        flattened (date, symbol) grid, so it is a single cumprod.
+        """
+        close = data.xs("Close", axis=1, level=1)
+        signals = signals.reindex(index=close.index, columns=close.columns).fillna(0.0)
+        S = signals.to_numpy(dtype=np.float64)
+        P = close.to_numpy(dtype=np.float64)
+        
+        # Capital after each trade, then shifted by one to get capital before it
+        factor = 1.0 - np.abs(S) * self.commission
+        capital_after = self.initial_capital * np.cumprod(factor.ravel()).reshape(S.shape)
+        capital_before = np.empty_like(capital_after)
+        capital_before.ravel()[0] = self.initial_capital
+        capital_before.ravel()[1:] = capital_after.ravel()[:-1]
+        
+        traded = S != 0
+        value = np.where(traded, capital_before * np.abs(S), 0.0)
+        commission = value * self.commission
+        with np.errstate(divide="ignore", invalid="ignore"):
+            shares = np.where(traded, value / P, 0.0)
+        signed_shares = np.where(S > 0, shares, -shares)
+        
+        # Holdings and mark-to-market value per date
+        holdings = np.cumsum(signed_shares, axis=0)
+        held = np.logical_or.accumulate(traded, axis=0)
+        cash = capital_after[:, -1] if S.size else np.full(len(S), self.initial_capital)
+        nav = cash + np.where(held, holdings * P, 0.0).sum(axis=1)
+        
+        self.current_capital = float(cash[-1]) if len(cash) else self.initial_capital
+        self.positions = {
+            symbol: float(holdings[-1, j])
+            for j, symbol in enumerate(close.columns)
+            if traded[:, j].any()
+        }
+        self.value_dates = close.index
+        self.portfolio_value = nav
+        
+        # Trade log in date-major, symbol-minor order, as the loop would append it
+        rows, cols = np.nonzero(traded)
+        self._trade_symbols = list(close.columns)
+        self._reset_trades(len(rows))
+        n = len(rows)
+        self._trade_row[:n] = rows
+        self._trade_sym[:n] = cols
+        self._trade_side[:n] = np.sign(S[rows, cols])
+        self._trade_price[:n] = P[rows, cols]
+        self._trade_shares[:n] = shares[rows, cols]
+        self._trade_value[:n] = value[rows, cols]
+        self._trade_commission[:n] = commission[rows, cols]
+        self._n_trades = n
+        
+    def _run_event_loop(self, data: pd.DataFrame) -> Dict[str, Any]:
+        """Per-date simulation for strategies without on_data_batch"""
         dates = data.index.unique()
+        self.value_dates = dates
+        self.portfolio_value = np.empty(len(dates), dtype=np.float64)
+        
+        # Close prices as a dates x symbols matrix, indexed by position in the loop
+        close = data.xs("Close", axis=1, level=1).reindex(dates)
+        closes_arr = close.to_numpy(dtype=np.float64)
+        sym_idx = {symbol: j for j, symbol in enumerate(close.columns)}
+        pos_vector = np.zeros(len(sym_idx), dtype=np.float64)
+        held = np.zeros(len(sym_idx), dtype=bool)
+        unique_rows = data.index.is_unique
+        self._trade_symbols = list(close.columns)
+        self._reset_trades(1024)
         
-        for date in dates:
+        for i, date in enumerate(dates):
             # Get current data slice
-            current_data = data.loc[date]
+            current_data = data.iloc[i] if unique_rows else data.loc[date]
+            prices = closes_arr[i]
             
             # Get strategy signals
             signals = self.strategy.on_data(current_data)["signals"]
@@ -65,7 +192,8 @@ class StrategyBacktest:
             # Execute trades
             for symbol, signal in signals.items():
                 if signal != 0:
-                    price = current_data[symbol]["Close"]
+                    j = sym_idx[symbol]
+                    price = prices[j]
                     position_value = self.current_capital * abs(signal)
                     shares = position_value / price
                     
@@ -74,57 +202,91 @@ class StrategyBacktest:
                     self.current_capital -= commission_cost
                     
                     # Record trade
-                    self.trades.append({
-                        "date": date,
-                        "symbol": symbol,
-                        "action": "BUY" if signal > 0 else "SELL",
-                        "price": price,
-                        "shares": shares,
-                        "value": position_value,
-                        "commission": commission_cost
-                    })
+                    self._record_trade(i, j, 1 if signal > 0 else -1, price,
+                                       shares, position_value, commission_cost)
                     
                     # Update positions
-                    if symbol in self.positions:
-                        self.positions[symbol] += shares if signal > 0 else -shares
-                    else:
-                        self.positions[symbol] = shares if signal > 0 else -shares
-                        
-            # Calculate portfolio value
-            portfolio_value = self.current_capital
-            for symbol, shares in self.positions.items():
-                portfolio_value += shares * current_data[symbol]["Close"]
-                
-            self.portfolio_value.append({
-                "date": date,
-                "value": portfolio_value
-            })
+                    pos_vector[j] += shares if signal > 0 else -shares
+                    held[j] = True
+                    
+            # Calculate portfolio value over symbols ever traded
+            self.portfolio_value[i] = self.current_capital + np.dot(pos_vector[held], prices[held])
             
+        self.positions = {symbol: float(pos_vector[j]) for symbol, j in sym_idx.items() if held[j]}
         return self.get_results()
         
-    def get_results(self) -> Dict[str, Any]:
-        """Calculate backtest results and metrics"""
-        portfolio_df = pd.DataFrame(self.portfolio_value)
-        portfolio_df.set_index("date", inplace=True)
+    def _reset_trades(self, capacity: int) -> None:
+        """Allocate empty trade buffers with room for capacity trades"""
+        capacity = max(capacity, 1)
+        self._n_trades = 0
+        self._trade_row = np.empty(capacity, dtype=np.int32)
+        self._trade_sym = np.empty(capacity, dtype=np.int32)
+        self._trade_side = np.empty(capacity, dtype=np.int8)
+        self._trade_price = np.empty(capacity, dtype=np.float64)
+        self._trade_shares = np.empty(capacity, dtype=np.float64)
+        self._trade_value = np.empty(capacity, dtype=np.float64)
+        self._trade_commission = np.empty(capacity, dtype=np.float64)
+        
+    def _record_trade(self, row: int, sym: int, side: int, price: float,
+                      shares: float, value: float, commission: float) -> None:
+        """Append one trade, doubling the buffers when they are full"""
+        n = self._n_trades
+        if n == len(self._trade_row):
+            for name in ("_trade_row", "_trade_sym", "_trade_side", "_trade_price",
+                         "_trade_shares", "_trade_value", "_trade_commission"):
+                buf = getattr(self, name)
+                grown = np.empty(2 * len(buf), dtype=buf.dtype)
+                grown[:n] = buf
+                setattr(self, name, grown)
+        self._trade_row[n] = row
+        self._trade_sym[n] = sym
+        self._trade_side[n] = side
+        self._trade_price[n] = price
+        self._trade_shares[n] = shares
+        self._trade_value[n] = value
+        self._trade_commission[n] = commission
+        self._n_trades = n + 1
         
-        # Calculate returns
-        returns = portfolio_df["value"].pct_change()
+    @property
+    def trades(self) -> pd.DataFrame:
+        """Trade log as a DataFrame, rehydrated from the trade buffers"""
+        n = self._n_trades
+        return pd.DataFrame({
+            "date": self.value_dates[self._trade_row[:n]],
+            "symbol": np.asarray(self._trade_symbols, dtype=object)[self._trade_sym[:n]],
+            "action": np.where(self._trade_side[:n] > 0, "BUY", "SELL"),
+            "price": self._trade_price[:n],
+            "shares": self._trade_shares[:n],
+            "value": self._trade_value[:n],
+            "commission": self._trade_commission[:n]
+        })
+        
+    def get_results(self) -> Dict[str, Any]:
+        """Calculate backtest results and metrics, cached until the next run_backtest"""
+        if self._results_cache is not None:
+            return self._results_cache
+            
+        values = self.portfolio_value
+        portfolio_df = pd.DataFrame(
+            {"value": values}, index=pd.Index(self.value_dates, name="date")
+        )
         
-        # Calculate metrics
-        total_return = (portfolio_df["value"].iloc[-1] / self.initial_capital - 1) * 100
-        annual_return = (1 + total_return/100) ** (252/len(returns)) - 1
-        sharpe_ratio = np.sqrt(252) * returns.mean() / returns.std()
-        max_drawdown = (portfolio_df["value"] / portfolio_df["value"].cummax() - 1).min() * 100
+        # Returns, running peak and drawdown in one pass over the equity curve
+        total_return, sharpe_ratio, mdd = compute_metrics(values, self.initial_capital)
+        total_return *= 100
+        annual_return = (1 + total_return/100) ** (252/len(values)) - 1
+        max_drawdown = -mdd * 100
         
-        return {
+        self._results_cache = {
             "portfolio_value": portfolio_df,
-            "trades": pd.DataFrame(self.trades),
+            "trades": self.trades,
             "total_return": total_return,
             "annual_return": annual_return * 100,
             "sharpe_ratio": sharpe_ratio,
             "max_drawdown": max_drawdown,
-            "number_of_trades": len(self.trades)
+            "number_of_trades": self._n_trades
         }
+        return self._results_cache
         
     def plot_results(self, benchmark_symbol: Optional[str] = None):
         """Plot backtest results with optional benchmark comparison"""
@@ -140,7 +302,7 @@ class StrategyBacktest:
         
         # Add benchmark if specified
         if benchmark_symbol:
-            benchmark = yf.download(benchmark_symbol, self.start_date, self.end_date)
+            benchmark = _fetch_one(benchmark_symbol, self.start_date, self.end_date)
             benchmark_returns = benchmark["Close"] / benchmark["Close"].iloc[0] * self.initial_capital
             plt.plot(benchmark_returns.index, benchmark_returns, label=f"Benchmark ({benchmark_symbol})")
             
@@ -164,7 +326,8 @@ class StrategyBacktest:
         
     def plot_factor_analysis(self):
         """Plot factor analysis for multi-factor strategy"""
-        if not hasattr(self.strategy, "factors"):
+        factors = getattr(self.strategy, "factors", None)
+        if factors is None:
             print("Factor analysis only available for multi-factor strategy")
             return
             
@@ -180,7 +343,7 @@ class StrategyBacktest:
         
         # Get factor returns
         factor_returns = {}
-        for factor in self.strategy.factors:
+        for factor in factors:
             factor_trades = trades_df[trades_df["factor"] == factor]
             factor_returns[factor] = factor_trades["return"].mean()
             
@@ -195,12 +358,13 @@ class StrategyBacktest:
         
     def plot_ml_feature_importance(self):
         """Plot feature importance for machine learning strategy"""
-        if not hasattr(self.strategy, "model"):
+        model = getattr(self.strategy, "model", None)
+        if model is None:
             print("Feature importance only available for machine learning strategy")
             return
             
-        if hasattr(self.strategy.model, "feature_importances_"):
-            importance = self.strategy.model.feature_importances_
+        importance = getattr(model, "feature_importances_", None)
+        if importance is not None:
             features = self.strategy.feature_names
             
             plt.figure(figsize=(12, 6))
@@ -214,12 +378,16 @@ class StrategyBacktest:
             
     def plot_rsi_signals(self, symbol: str):
         """Plot RSI signals for RSI strategy"""
-        if not isinstance(self.strategy, "USRSIDivergenceStrategy"):
+        calculate_rsi = getattr(self.strategy, "calculate_rsi", None)
+        if calculate_rsi is None:
             print("RSI signals only available for RSI strategy")
             return
             
-        data = yf.download(symbol, self.start_date, self.end_date)
-        rsi = self.strategy.calculate_rsi(data["Close"])
+        if self.data is not None and symbol in self.data.columns.get_level_values(0):
+            data = self.data[symbol]
+        else:
+            data = _fetch_one(symbol, self.start_date, self.end_date)
+        rsi = calculate_rsi(data["Close"])
         
         plt.figure(figsize=(15, 10))
         
@@ -1,4 +1,5 @@
 from datetime import datetime
+from operator import attrgetter
 from typing import List, Optional, Dict
 from dataclasses import dataclass
 from enum import Enum
@@ -48,7 +49,10 @@ class NewsEngine:
         end_time: datetime,
         sources: Optional[List[NewsSource]] = None
     ) -> List[NewsData]:
-        """查询历史新闻"""
+        """查询历史新闻
+        
+        各数据源的结果拼接后整体按timestamp排序；数据源已有序时Timsort线性归并各段
+        """
         all_news = []
         sources = sources or list(self.sources.keys())
         
@@ -56,12 +60,11 @@ class NewsEngine:
             if source in self.sources:
                 handler = self.sources[source]
                 if hasattr(handler, "query_historical_news"):
-                    news = handler.query_historical_news(
+                    all_news.extend(handler.query_historical_news(
                         symbols, start_time, end_time
-                    )
-                    all_news.extend(news)
+                    ))
         
-        return sorted(all_news, key=lambda x: x.timestamp)
+        return sorted(all_news, key=attrgetter("timestamp"))
     
     def subscribe_news(
         self,
@@ -1,11 +1,10 @@
 """
 事件引擎模块
 """
-from collections import defaultdict
 from queue import Empty, Queue
 from threading import Thread
 from time import sleep
-from typing import Any, Callable, List
+from typing import Any, Callable, Dict, List, Tuple
 
 class Event:
     """事件对象"""
@@ -23,21 +22,32 @@ class EventEngine:
         self._queue: Queue = Queue()  # 事件队列
         self._active: bool = False    # 事件引擎开关
         self._thread: Thread = Thread(target=self._run)  # 事件处理线程
-        self._handlers: defaultdict = defaultdict(list)  # 事件处理函数字典
+        self._handlers: Dict[str, Tuple[Callable[[Event], None], ...]] = {}  # 事件处理函数字典，值为不可变元组
 
     def _run(self) -> None:
         """引擎运行"""
+        get_nowait = self._queue.get_nowait
+        process = self._process
         while self._active:
             try:
                 event = self._queue.get(block=True, timeout=1)
-                self._process(event)
             except Empty:
-                pass
+                continue
+            process(event)
+
+            # 阻塞取到一个事件后，非阻塞地清空积压事件，摊薄锁和条件变量开销
+            while True:
+                try:
+                    event = get_nowait()
+                except Empty:
+                    break
+                process(event)
 
     def _process(self, event: Event) -> None:
         """处理事件"""
-        if event.type in self._handlers:
-            [handler(event) for handler in self._handlers[event.type]]
+        # 注册/注销时整体替换元组，这里直接迭代快照，不分配临时列表
+        for handler in self._handlers.get(event.type, ()):
+            handler(event)
 
     def start(self) -> None:
         """启动引擎"""
@@ -51,18 +61,17 @@ class EventEngine:
 
     def register(self, type: str, handler: Callable[[Event], None]) -> None:
         """注册事件处理函数"""
-        handler_list = self._handlers[type]
-        if handler not in handler_list:
-            handler_list.append(handler)
+        handlers = self._handlers.get(type, ())
+        if handler not in handlers:
+            self._handlers[type] = handlers + (handler,)
 
     def unregister(self, type: str, handler: Callable[[Event], None]) -> None:
         """注销事件处理函数"""
-        handler_list = self._handlers[type]
-        if handler in handler_list:
-            handler_list.remove(handler)
-
-        if not handler_list:
-            self._handlers.pop(type)
+        handlers = tuple(h for h in self._handlers.get(type, ()) if h != handler)
+        if handlers:
+            self._handlers[type] = handlers
+        else:
+            self._handlers.pop(type, None)
 
     def put(self, event: Event) -> None:
         """推送事件"""
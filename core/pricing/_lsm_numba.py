@@ -0,0 +1,113 @@
+"""
+LSM后向递推的numba内核
+整个回溯在一个编译函数中完成，避免每个时间步反复创建掩码、花式索引和回归矩阵等临时数组
+"""
+import numpy as np
+from numba import njit
+
+@njit(cache=True, fastmath=True)
+def _fill_basis(x, center, half, basis):
+    """在[-1, 1]上按Chebyshev递推填充基函数，张成的多项式空间与同阶单项式相同"""
+    z = (x - center) / half
+    basis[0] = 1.0
+    if basis.size > 1:
+        basis[1] = z
+    for k in range(2, basis.size):
+        basis[k] = 2.0 * z * basis[k - 1] - basis[k - 2]
+
+@njit(cache=True, fastmath=True)
+def lsm_backward(S, K, r, dt, is_call, num_basis):
+    """最小二乘蒙特卡洛后向递推
+
+    每个时间步只对价内路径累加(num_basis+1)阶法方程，求解后逐路径比较行权价值和
+    继续持有价值。自变量先线性映射到价内区间[-1, 1]，再用Chebyshev多项式作基，
+    法方程的条件数远好于高次单项式
+
+    Args:
+        S: 价格路径，形状为(num_steps+1, num_paths)，行连续
+        K: 行权价
+        r: 无风险利率
+        dt: 时间步长
+        is_call: 是否为看涨期权
+        num_basis: 多项式阶数
+
+    Returns:
+        t=0时刻的期权价值
+    """
+    num_steps = S.shape[0] - 1
+    num_paths = S.shape[1]
+    nb = num_basis + 1
+    df = np.exp(-r * dt)
+
+    # 各路径的现金流价值，自到期日起逐步折现
+    V = np.empty(num_paths)
+    for p in range(num_paths):
+        s = S[num_steps, p]
+        V[p] = max(s - K, 0.0) if is_call else max(K - s, 0.0)
+
+    idx = np.empty(num_paths, dtype=np.int64)
+    gram = np.empty((nb, nb))
+    rhs = np.empty(nb)
+    basis = np.empty(nb)
+
+    for t in range(num_steps - 1, 0, -1):
+        # 折现并收集价内路径及其价格区间
+        n_itm = 0
+        lo = 0.0
+        hi = 0.0
+        for p in range(num_paths):
+            V[p] *= df
+            s = S[t, p]
+            if (s > K) if is_call else (s < K):
+                if n_itm == 0:
+                    lo = s
+                    hi = s
+                elif s < lo:
+                    lo = s
+                elif s > hi:
+                    hi = s
+                idx[n_itm] = p
+                n_itm += 1
+
+        if n_itm == 0:
+            continue
+
+        center = 0.5 * (hi + lo)
+        half = 0.5 * (hi - lo)
+        if half <= 0.0:
+            half = 1.0
+
+        # 累加法方程(只填下三角)
+        gram[:, :] = 0.0
+        rhs[:] = 0.0
+        for m in range(n_itm):
+            p = idx[m]
+            _fill_basis(S[t, p], center, half, basis)
+            v = V[p]
+            for i in range(nb):
+                bi = basis[i]
+                rhs[i] += bi * v
+                for j in range(i + 1):
+                    gram[i, j] += bi * basis[j]
+        for i in range(nb):
+            for j in range(i + 1, nb):
+                gram[i, j] = gram[j, i]
+
+        # 价内路径少于基函数个数时法方程奇异，lstsq给出最小范数解
+        coef = np.linalg.lstsq(gram, rhs)[0]
+
+        # 行权价值高于回归得到的继续持有价值时提前行权
+        for m in range(n_itm):
+            p = idx[m]
+            s = S[t, p]
+            _fill_basis(s, center, half, basis)
+            continuation = 0.0
+            for i in range(nb):
+                continuation += coef[i] * basis[i]
+            exercise = s - K if is_call else K - s
+            if exercise > continuation:
+                V[p] = exercise
+
+    s0 = S[0, 0]
+    intrinsic = max(s0 - K, 0.0) if is_call else max(K - s0, 0.0)
+    return max(np.mean(V) * df, intrinsic)
@@ -3,9 +3,15 @@
 使用最小二乘蒙特卡洛(LSM)方法
 参考：Derivatives Analytics with Python (Yves Hilpisch)
 """
+import os
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-from typing import List, Dict, Optional
-from dataclasses import dataclass
+from scipy.special import ndtri
+from scipy.stats import qmc
+from typing import Any, List, Dict, Optional
+from dataclasses import dataclass, replace
+
+from ._lsm_numba import lsm_backward
 
 @dataclass
 class AmericanOptionParams:
@@ -25,7 +31,11 @@ class AmericanOptionPricer:
         self,
         num_steps: int = 50,
         num_paths: int = 50000,
-        num_basis: int = 10
+        num_basis: int = 10,
+        antithetic: bool = True,
+        dtype: type = np.float32,
+        quasi: bool = False,
+        seed: Optional[int] = None
     ):
         """
         初始化定价器
@@ -34,158 +44,223 @@ class AmericanOptionPricer:
             num_steps: int, 时间步数
             num_paths: int, 模拟路径数
             num_basis: int, 基函数数量
+            antithetic: bool, 是否使用对偶变量(rn与-rn成对)
+            dtype: type, 路径矩阵的浮点类型，回归和现金流始终在float64下计算
+            quasi: bool, 是否使用加扰Sobol序列(拟蒙特卡洛)，要求独立样本数为2的幂，否则退回伪随机数
+            seed: int, 可选，Sobol加扰的随机种子
         """
         self.num_steps = num_steps
         self.num_paths = num_paths
         self.num_basis = num_basis
+        self.antithetic = antithetic
+        self.dtype = dtype
+        self.quasi = quasi
+        self.seed = seed
         
-    def simulate_paths(self, params: AmericanOptionParams) -> Dict[str, np.ndarray]:
+    def simulate_paths(self, params: AmericanOptionParams,
+                       rn: Optional[np.ndarray] = None) -> Dict[str, Any]:
         """
         模拟路径
         
         参数:
             params: AmericanOptionParams, 期权参数
+            rn: np.ndarray, 可选，预先生成的标准正态随机数，形状为(num_steps+1, num_paths)
             
         返回:
-            Dict[str, np.ndarray], 包含价格、利率和波动率路径
+            Dict[str, Any], 包含价格路径以及利率、波动率(标量)
         """
         dt = params.T / self.num_steps
         
         # 生成随机数
-        rn = np.random.standard_normal((self.num_steps + 1, self.num_paths))
-        
-        # 模拟价格路径
-        S = np.zeros((self.num_steps + 1, self.num_paths))
-        S[0] = params.S0
+        if rn is None:
+            rn = self.draw_normals()
         
-        # 使用对数正态过程模拟价格
-        for t in range(1, self.num_steps + 1):
-            S[t] = S[t-1] * np.exp((params.r - params.div - 0.5 * params.sigma ** 2) * dt + 
-                                 params.sigma * np.sqrt(dt) * rn[t])
+        # 使用对数正态过程模拟价格：漂移和波动率为常数，对数价格是增量的累加
+        log_S = np.empty((self.num_steps + 1, self.num_paths), dtype=self.dtype)
+        log_S[0] = np.log(params.S0)
+        log_S[1:] = ((params.r - params.div - 0.5 * params.sigma ** 2) * dt +
+                     params.sigma * np.sqrt(dt) * rn[1:])
+        np.cumsum(log_S, axis=0, out=log_S)
+        S = np.exp(log_S, out=log_S)
             
+        # 利率和波动率为常数，直接返回标量而不广播成与价格同形的矩阵
         return {
             'price': S,
-            'rate': np.full_like(S, params.r),
-            'vol': np.full_like(S, params.sigma)
+            'rate': params.r,
+            'vol': params.sigma
         }
         
-    def price(self, params: AmericanOptionParams) -> Dict[str, float]:
+    def draw_normals(self) -> np.ndarray:
+        """
+        生成一组标准正态随机数，可在多次定价间共享(公共随机数)
+        
+        返回:
+            np.ndarray, 形状为(num_steps+1, num_paths)
+        """
+        n = (self.num_paths + 1) // 2 if self.antithetic else self.num_paths
+        
+        # 加扰Sobol点列仅在点数为2的幂时保持平衡性
+        if self.quasi and n > 0 and n & (n - 1) == 0:
+            draws = self._sobol_normals(n)
+        else:
+            draws = np.random.standard_normal((self.num_steps + 1, n)).astype(self.dtype)
+            
+        if not self.antithetic:
+            return draws
+            
+        # 对偶变量：只生成一半独立随机数，与其相反数配对
+        return np.concatenate([draws, -draws], axis=1)[:, :self.num_paths]
+        
+    def _sobol_normals(self, n: int) -> np.ndarray:
+        """
+        用加扰Sobol序列生成n条路径的标准正态增量，每个时间步占一维
+        
+        返回:
+            np.ndarray, 形状为(num_steps+1, n)，第0行为零(t=0无增量)
+        """
+        sampler = qmc.Sobol(d=self.num_steps, scramble=True, seed=self.seed)
+        u = sampler.random_base2(int(n).bit_length() - 1)
+        
+        # 避免端点处ppf为无穷
+        eps = np.finfo(np.float64).eps
+        np.clip(u, eps, 1 - eps, out=u)
+        
+        draws = np.zeros((self.num_steps + 1, n), dtype=self.dtype)
+        draws[1:] = ndtri(u).T
+        return draws
+        
+    def price(self, params: AmericanOptionParams,
+              rn: Optional[np.ndarray] = None) -> Dict[str, float]:
         """
         定价美式期权
         
         参数:
             params: AmericanOptionParams, 期权参数
+            rn: np.ndarray, 可选，预先生成的标准正态随机数
             
         返回:
             Dict[str, float], 包含期权价格和希腊字母
         """
-        paths = self.simulate_paths(params)
-        S = paths['price']
-        r = paths['rate']
-        v = paths['vol']
+        if rn is None:
+            rn = self.draw_normals()
+            
+        option_value = self.price_value(params, rn)
+        greeks = self.compute_greeks(params, rn, base_price=option_value)
         
-        dt = params.T / self.num_steps
+        return {'price': option_value, **greeks}
         
-        # 计算内在价值
-        if params.is_call:
-            h = np.maximum(S - params.K, 0)
-        else:
-            h = np.maximum(params.K - S, 0)
+    def price_value(self, params: AmericanOptionParams,
+                    rn: Optional[np.ndarray] = None) -> float:
+        """
+        用LSM计算美式期权价值(不含希腊字母)
+        
+        参数:
+            params: AmericanOptionParams, 期权参数
+            rn: np.ndarray, 可选，预先生成的标准正态随机数
             
-        # 价值矩阵
-        V = h.copy()
+        返回:
+            float, 期权价值
+        """
+        paths = self.simulate_paths(params, rn)
+        dt = params.T / self.num_steps
         
-        # 从到期日向前回溯
-        for t in range(self.num_steps - 1, 0, -1):
-            df = np.exp(-r[t] * dt)  # 折现因子
+        # 后向递推整体在numba内核中完成
+        return float(lsm_backward(
+            np.ascontiguousarray(paths['price']), float(params.K), float(params.r),
+            dt, bool(params.is_call), self.num_basis
+        ))
+        
+    def compute_greeks(self, params: AmericanOptionParams,
+                       rn: Optional[np.ndarray] = None,
+                       base_price: Optional[float] = None,
+                       eps_S: float = 0.01,
+                       eps_sigma: float = 0.001,
+                       eps_T: float = 1/365) -> Dict[str, float]:
+        """
+        并行计算有限差分希腊字母
+        
+        所有扰动定价共享同一组随机数(公共随机数)，差分中的蒙特卡洛噪声大部分相互抵消；
+        各扰动定价相互独立，提交到进程池并行执行
+        
+        参数:
+            params: AmericanOptionParams, 期权参数
+            rn: np.ndarray, 可选，预先生成的标准正态随机数
+            base_price: float, 可选，用同一组随机数算出的基准价格
+            eps_S: float, 标的价格相对扰动
+            eps_sigma: float, 波动率绝对扰动
+            eps_T: float, 到期时间扰动(年)
+            
+        返回:
+            Dict[str, float], 包含delta、gamma、theta、vega
+        """
+        if rn is None:
+            rn = self.draw_normals()
+            
+        bumps = {
+            'up_S': replace(params, S0=params.S0 * (1 + eps_S)),
+            'down_S': replace(params, S0=params.S0 * (1 - eps_S)),
+            'up_sigma': replace(params, sigma=params.sigma + eps_sigma),
+            'down_sigma': replace(params, sigma=params.sigma - eps_sigma),
+            'down_T': replace(params, T=params.T - eps_T)
+        }
+        if base_price is None:
+            bumps['base'] = params
             
-            # 选择价内期权
-            if params.is_call:
-                itm = S[t] > params.K
-            else:
-                itm = S[t] < params.K
-                
-            itm_indices = np.nonzero(itm)[0]
+        with ProcessPoolExecutor(max_workers=min(len(bumps), os.cpu_count() or 1)) as executor:
+            futures = {
+                name: executor.submit(self.price_value, bumped, rn)
+                for name, bumped in bumps.items()
+            }
+            prices = {name: future.result() for name, future in futures.items()}
             
-            if len(itm_indices) > 0:
-                # 提取价内路径
-                rel_S = S[t, itm]
-                rel_V = V[t + 1, itm] * df[itm]
-                
-                # 构建回归矩阵
-                matrix = np.zeros((self.num_basis + 1, len(itm_indices)))
-                for i in range(self.num_basis + 1):
-                    matrix[i] = rel_S ** i
-                    
-                # 最小二乘回归
-                reg = np.linalg.lstsq(matrix.T, rel_V, rcond=None)[0]
-                continuation_value = np.dot(reg, matrix)
-                
-                # 更新价值矩阵
-                exercise = h[t, itm]
-                V[t, itm] = np.where(exercise > continuation_value,
-                                   exercise,
-                                   V[t + 1, itm] * df[itm])
-                
-        # 计算t=0时刻的期权价值
-        option_value = max(np.mean(V[1] * np.exp(-r[0, 0] * dt)), h[0, 0])
-        
-        # 计算希腊字母
-        delta = self.compute_delta(params)
-        gamma = self.compute_gamma(params)
-        theta = self.compute_theta(params)
-        vega = self.compute_vega(params)
+        if base_price is None:
+            base_price = prices['base']
+        h = eps_S * params.S0
         
         return {
-            'price': option_value,
-            'delta': delta,
-            'gamma': gamma,
-            'theta': theta,
-            'vega': vega
+            'delta': (prices['up_S'] - prices['down_S']) / (2 * h),
+            'gamma': (prices['up_S'] - 2 * base_price + prices['down_S']) / h ** 2,
+            'theta': -(base_price - prices['down_T']) / eps_T,
+            'vega': (prices['up_sigma'] - prices['down_sigma']) / (2 * eps_sigma)
         }
         
-    def compute_delta(self, params: AmericanOptionParams, eps: float = 0.01) -> float:
+    def compute_delta(self, params: AmericanOptionParams, eps: float = 0.01,
+                      rn: Optional[np.ndarray] = None) -> float:
         """计算Delta"""
-        params_up = AmericanOptionParams(**params.__dict__)
-        params_up.S0 *= (1 + eps)
-        params_down = AmericanOptionParams(**params.__dict__)
-        params_down.S0 *= (1 - eps)
-        
-        price_up = self.price(params_up)['price']
-        price_down = self.price(params_down)['price']
+        if rn is None:
+            rn = self.draw_normals()
+        price_up = self.price_value(replace(params, S0=params.S0 * (1 + eps)), rn)
+        price_down = self.price_value(replace(params, S0=params.S0 * (1 - eps)), rn)
         
         return (price_up - price_down) / (2 * eps * params.S0)
         
-    def compute_gamma(self, params: AmericanOptionParams, eps: float = 0.01) -> float:
+    def compute_gamma(self, params: AmericanOptionParams, eps: float = 0.01,
+                      rn: Optional[np.ndarray] = None) -> float:
         """计算Gamma"""
-        params_up = AmericanOptionParams(**params.__dict__)
-        params_up.S0 *= (1 + eps)
-        params_down = AmericanOptionParams(**params.__dict__)
-        params_down.S0 *= (1 - eps)
-        
-        delta_up = self.compute_delta(params_up)
-        delta_down = self.compute_delta(params_down)
+        if rn is None:
+            rn = self.draw_normals()
+        price = self.price_value(params, rn)
+        price_up = self.price_value(replace(params, S0=params.S0 * (1 + eps)), rn)
+        price_down = self.price_value(replace(params, S0=params.S0 * (1 - eps)), rn)
         
-        return (delta_up - delta_down) / (2 * eps * params.S0)
+        return (price_up - 2 * price + price_down) / (eps * params.S0) ** 2
         
-    def compute_theta(self, params: AmericanOptionParams, eps: float = 1/365) -> float:
+    def compute_theta(self, params: AmericanOptionParams, eps: float = 1/365,
+                      rn: Optional[np.ndarray] = None) -> float:
         """计算Theta"""
-        params_down = AmericanOptionParams(**params.__dict__)
-        params_down.T -= eps
-        
-        price = self.price(params)['price']
-        price_down = self.price(params_down)['price']
+        if rn is None:
+            rn = self.draw_normals()
+        price = self.price_value(params, rn)
+        price_down = self.price_value(replace(params, T=params.T - eps), rn)
         
         return -(price - price_down) / eps
         
-    def compute_vega(self, params: AmericanOptionParams, eps: float = 0.001) -> float:
+    def compute_vega(self, params: AmericanOptionParams, eps: float = 0.001,
+                     rn: Optional[np.ndarray] = None) -> float:
         """计算Vega"""
-        params_up = AmericanOptionParams(**params.__dict__)
-        params_up.sigma += eps
-        params_down = AmericanOptionParams(**params.__dict__)
-        params_down.sigma -= eps
-        
-        price_up = self.price(params_up)['price']
-        price_down = self.price(params_down)['price']
+        if rn is None:
+            rn = self.draw_normals()
+        price_up = self.price_value(replace(params, sigma=params.sigma + eps), rn)
+        price_down = self.price_value(replace(params, sigma=params.sigma - eps), rn)
         
         return (price_up - price_down) / (2 * eps)
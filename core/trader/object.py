@@ -1,25 +1,37 @@
 """
 基础对象模块
 """
-from dataclasses import dataclass
-from datetime import datetime
+import struct
+from dataclasses import dataclass, fields
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 from .constant import Direction, Exchange, Product, Status, OrderType, Interval
 
-@dataclass
+def _parse_datetime(s: str) -> datetime:
+    """解析"%Y-%m-%d %H:%M:%S"格式的时间字符串，按固定偏移切片，避免strptime逐次解析格式串"""
+    if (len(s) == 19 and s[4] == "-" and s[7] == "-" and s[10] == " "
+            and s[13] == ":" and s[16] == ":"):
+        return datetime(int(s[0:4]), int(s[5:7]), int(s[8:10]),
+                        int(s[11:13]), int(s[14:16]), int(s[17:19]))
+    return datetime.strptime(s, "%Y-%m-%d %H:%M:%S")
+
+@dataclass(slots=True)
 class BaseData:
     """基础数据对象"""
     gateway_name: str             # 接口名称
     symbol: str                   # 代码
     exchange: Exchange            # 交易所
-    datetime: datetime           # 时间
+    datetime: datetime           # 时间，构造时须传入datetime对象
 
-    def __post_init__(self):
-        """转换时间格式"""
-        if self.datetime and isinstance(self.datetime, str):
-            self.datetime = datetime.strptime(self.datetime, "%Y-%m-%d %H:%M:%S")
+    @classmethod
+    def from_row(cls, **kwargs):
+        """由原始记录构造，datetime可为"%Y-%m-%d %H:%M:%S"格式字符串"""
+        dt = kwargs.get("datetime")
+        if dt and isinstance(dt, str):
+            kwargs["datetime"] = _parse_datetime(dt)
+        return cls(**kwargs)
 
-@dataclass
+@dataclass(slots=True)
 class TickData(BaseData):
     """TICK数据"""
     name: str = ""               # 名称
@@ -56,7 +68,59 @@ class TickData(BaseData):
     ask_volume_4: float = 0      # 卖四量
     ask_volume_5: float = 0      # 卖五量
 
-@dataclass
+    def pack(self) -> bytes:
+        """把时间戳和全部数值字段打包为定长二进制块，便于批量传输和存储
+        
+        时间存为UTC纪元秒加UTC偏移秒数，与本机时区无关；不带时区的时间按UTC换算，
+        偏移记为NaN，还原后仍不带时区
+        """
+        dt = self.datetime
+        offset = dt.utcoffset()
+        if offset is None:
+            ts = dt.replace(tzinfo=timezone.utc).timestamp()
+            offset_seconds = _NAIVE_OFFSET
+        else:
+            ts = dt.timestamp()
+            offset_seconds = offset.total_seconds()
+        return _TICK_STRUCT.pack(
+            ts,
+            offset_seconds,
+            *[getattr(self, name) for name in _TICK_NUMERIC_FIELDS]
+        )
+
+    @classmethod
+    def unpack(
+        cls,
+        buf: bytes,
+        gateway_name: str,
+        symbol: str,
+        exchange: Exchange,
+        name: str = "",
+        offset: int = 0
+    ) -> "TickData":
+        """从pack生成的二进制块(或其中offset处)还原TICK数据，带时区的时间还原为相同偏移的固定时区"""
+        ts, offset_seconds, *values = _TICK_STRUCT.unpack_from(buf, offset)
+        if offset_seconds != offset_seconds:  # NaN，打包时不带时区
+            dt = datetime.fromtimestamp(ts, tz=timezone.utc).replace(tzinfo=None)
+        else:
+            dt = datetime.fromtimestamp(ts, tz=timezone(timedelta(seconds=offset_seconds)))
+        return cls(
+            gateway_name=gateway_name,
+            symbol=symbol,
+            exchange=exchange,
+            datetime=dt,
+            name=name,
+            **dict(zip(_TICK_NUMERIC_FIELDS, values))
+        )
+
+# TickData的数值字段顺序及对应的打包格式：时间戳、UTC偏移加各数值字段，均为小端double
+_TICK_NUMERIC_FIELDS = tuple(
+    f.name for f in fields(TickData) if f.type is float
+)
+_TICK_STRUCT = struct.Struct(f"<{len(_TICK_NUMERIC_FIELDS) + 2}d")
+_NAIVE_OFFSET = float("nan")  # 不带时区的时间的偏移标记
+
+@dataclass(slots=True)
 class OrderData(BaseData):
     """委托数据"""
     orderid: str                # 委托号
@@ -69,7 +133,7 @@ class OrderData(BaseData):
     time: str = ""             # 委托时间
     reference: str = ""        # 引用
 
-@dataclass
+@dataclass(slots=True)
 class TradeData(BaseData):
     """成交数据"""
     orderid: str               # 委托号
@@ -79,7 +143,7 @@ class TradeData(BaseData):
     volume: float             # 成交数量
     time: str = ""            # 成交时间
 
-@dataclass
+@dataclass(slots=True)
 class PositionData(BaseData):
     """持仓数据"""
     direction: Direction       # 持仓方向
@@ -89,7 +153,7 @@ class PositionData(BaseData):
     pnl: float = 0           # 持仓盈亏
     yd_volume: float = 0      # 昨持仓
 
-@dataclass
+@dataclass(slots=True)
 class AccountData(BaseData):
     """账户数据"""
     accountid: str            # 账户代码
@@ -97,7 +161,7 @@ class AccountData(BaseData):
     frozen: float = 0         # 冻结金额
     available: float = 0      # 可用资金
 
-@dataclass
+@dataclass(slots=True)
 class ContractData(BaseData):
     """合约数据"""
     name: str                 # 合约名称
@@ -109,7 +173,7 @@ class ContractData(BaseData):
     net_position: bool = False   # 是否净持仓
     history_data: bool = False   # 是否有历史数据
 
-@dataclass
+@dataclass(slots=True)
 class LogData(BaseData):
     """日志数据"""
     msg: str                     # 日志信息
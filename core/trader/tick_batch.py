@@ -0,0 +1,137 @@
+"""
+TICK批量数据模块 - 列式(SoA)存储
+"""
+from datetime import datetime
+from operator import attrgetter
+from typing import List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .constant import Exchange
+from .object import TickData
+
+DEPTH = 5  # 盘口档位数
+
+# 逐笔标量字段，累计量与价格用float64，单笔量用float32
+PRICE_FIELDS = (
+    "last_price", "open_price", "high_price", "low_price", "pre_close",
+    "limit_up", "limit_down", "volume", "turnover", "open_interest"
+)
+VOLUME_FIELDS = ("last_volume",)
+
+_DEPTH_GETTERS = {
+    "bid_prices": attrgetter(*[f"bid_price_{i}" for i in range(1, DEPTH + 1)]),
+    "ask_prices": attrgetter(*[f"ask_price_{i}" for i in range(1, DEPTH + 1)]),
+    "bid_volumes": attrgetter(*[f"bid_volume_{i}" for i in range(1, DEPTH + 1)]),
+    "ask_volumes": attrgetter(*[f"ask_volume_{i}" for i in range(1, DEPTH + 1)]),
+}
+_DEPTH_DTYPES = {
+    "bid_prices": np.float64,
+    "ask_prices": np.float64,
+    "bid_volumes": np.float32,
+    "ask_volumes": np.float32,
+}
+
+class TickBatch:
+    """
+    单一合约的一批TICK数据，每个数值字段一列连续数组
+
+    批量指标(均值、波动率、VWAP等)可直接在数组上向量化计算，
+    无需逐个访问TickData对象
+    """
+
+    def __init__(
+        self,
+        gateway_name: str,
+        symbol: str,
+        exchange: Exchange,
+        datetime: np.ndarray,
+        name: str = "",
+        **columns: np.ndarray
+    ) -> None:
+        """构造函数，columns为PRICE_FIELDS/VOLUME_FIELDS及盘口二维数组，缺省为0"""
+        self.gateway_name: str = gateway_name    # 接口名称
+        self.symbol: str = symbol                # 代码
+        self.exchange: Exchange = exchange       # 交易所
+        self.name: str = name                    # 名称
+        self.datetime: np.ndarray = np.asarray(datetime, dtype="datetime64[ns]")  # 时间
+
+        n = len(self.datetime)
+        for field in PRICE_FIELDS:
+            setattr(self, field, np.asarray(columns.pop(field, np.zeros(n)), dtype=np.float64))
+        for field in VOLUME_FIELDS:
+            setattr(self, field, np.asarray(columns.pop(field, np.zeros(n)), dtype=np.float32))
+        for field, dtype in _DEPTH_DTYPES.items():
+            value = columns.pop(field, None)
+            value = np.zeros((n, DEPTH)) if value is None else value
+            setattr(self, field, np.asarray(value, dtype=dtype).reshape(n, DEPTH))   # (N, 5)盘口
+
+        if columns:
+            raise ValueError(f"未知的TICK字段: {sorted(columns)}")
+
+    def __len__(self) -> int:
+        return len(self.datetime)
+
+    @classmethod
+    def from_ticks(cls, ticks: Sequence[TickData]) -> "TickBatch":
+        """由同一合约的TickData序列构建"""
+        if not ticks:
+            raise ValueError("ticks不能为空")
+        first = ticks[0]
+        if any(tick.symbol != first.symbol for tick in ticks):
+            raise ValueError("TickBatch只能包含同一合约的TICK")
+
+        n = len(ticks)
+        columns = {}
+        for field in PRICE_FIELDS:
+            columns[field] = np.fromiter(map(attrgetter(field), ticks), dtype=np.float64, count=n)
+        for field in VOLUME_FIELDS:
+            columns[field] = np.fromiter(map(attrgetter(field), ticks), dtype=np.float32, count=n)
+        for field, getter in _DEPTH_GETTERS.items():
+            columns[field] = np.fromiter(
+                map(getter, ticks), dtype=np.dtype((_DEPTH_DTYPES[field], DEPTH)), count=n
+            )
+
+        return cls(
+            gateway_name=first.gateway_name,
+            symbol=first.symbol,
+            exchange=first.exchange,
+            datetime=np.array([tick.datetime for tick in ticks], dtype="datetime64[ns]"),
+            name=first.name,
+            **columns
+        )
+
+    def to_ticks(self) -> List[TickData]:
+        """还原为TickData列表，供仍按对象处理的旧代码使用"""
+        times: List[datetime] = self.datetime.astype("datetime64[us]").tolist()
+        scalars = {field: getattr(self, field).tolist() for field in PRICE_FIELDS + VOLUME_FIELDS}
+        depth = {
+            side: getattr(self, f"{side}s").tolist()
+            for side in ("bid_price", "ask_price", "bid_volume", "ask_volume")
+        }
+
+        ticks = []
+        for k, dt in enumerate(times):
+            kwargs = {field: values[k] for field, values in scalars.items()}
+            for side, levels in depth.items():
+                for i, value in enumerate(levels[k], start=1):
+                    kwargs[f"{side}_{i}"] = value
+            ticks.append(TickData(
+                gateway_name=self.gateway_name,
+                symbol=self.symbol,
+                exchange=self.exchange,
+                datetime=dt,
+                name=self.name,
+                **kwargs
+            ))
+        return ticks
+
+    def to_frame(self) -> pd.DataFrame:
+        """转为以时间为索引的DataFrame，列直接引用底层数组"""
+        data = {field: getattr(self, field) for field in PRICE_FIELDS + VOLUME_FIELDS}
+        for side in ("bid_price", "ask_price", "bid_volume", "ask_volume"):
+            levels = getattr(self, f"{side}s")
+            for i in range(DEPTH):
+                data[f"{side}_{i + 1}"] = levels[:, i]
+        return pd.DataFrame(data, index=pd.DatetimeIndex(self.datetime, name="datetime"), copy=False)
@@ -0,0 +1,112 @@
+"""
+BCC97/Black-Scholes希腊字母的numba内核
+一次遍历逐个期权算出价格和全部希腊字母，中间量都留在寄存器中，不为每步运算生成临时数组
+"""
+import math
+from typing import Dict
+
+import numpy as np
+from numba import njit, prange
+
+_INV_SQRT_2 = 0.7071067811865476  # 1/sqrt(2)
+_INV_SQRT_2PI = 0.3989422804014327  # 1/sqrt(2π)
+
+# 不含nnan/ninf，NaN输入仍按IEEE规则传播，有效性判断不会被优化掉
+_FASTMATH = {'nsz', 'arcp', 'contract', 'afn', 'reassoc'}
+
+@njit(cache=True, fastmath=_FASTMATH)
+def _norm_cdf(x):
+    """标准正态分布函数，erfc形式在左尾不会因1+erf(x)相消而丢失精度"""
+    return 0.5 * math.erfc(-x * _INV_SQRT_2)
+
+@njit(parallel=True, cache=True, fastmath=_FASTMATH, error_model='numpy')
+def bcc97_greeks(S, K, T, r, q, sigma, is_call,
+                 out_price, out_delta, out_gamma, out_theta, out_vega, out_rho):
+    """
+    批量计算BCC97(带连续股息率的Black-Scholes)价格与希腊字母，q全为0时即Black-Scholes
+
+    theta为年化，vega对应波动率变动1.0，结果写入预先分配的输出数组
+
+    Args:
+        S: 标的价格
+        K: 行权价
+        T: 到期时间（年）
+        r: 无风险利率
+        q: 股息率
+        sigma: 波动率
+        is_call: 是否为看涨期权
+        out_price, out_delta, out_gamma, out_theta, out_vega, out_rho: 长度与K相同的输出数组
+    """
+    for i in prange(len(K)):
+        s = S[i]
+        k = K[i]
+        t = T[i]
+        vol = sigma[i]
+
+        # 任一输入缺失或非正时结果为NaN
+        if not (s > 0.0 and k > 0.0 and t > 0.0 and vol > 0.0):
+            out_price[i] = np.nan
+            out_delta[i] = np.nan
+            out_gamma[i] = np.nan
+            out_theta[i] = np.nan
+            out_vega[i] = np.nan
+            out_rho[i] = np.nan
+            continue
+
+        sqrt_t = math.sqrt(t)
+        vol_sqrt_t = vol * sqrt_t
+        d1 = (math.log(s / k) + (r[i] - q[i] + 0.5 * vol * vol) * t) / vol_sqrt_t
+        d2 = d1 - vol_sqrt_t
+
+        nd1 = math.exp(-0.5 * d1 * d1) * _INV_SQRT_2PI
+        e_qt = math.exp(-q[i] * t)
+        s_qt = s * e_qt
+        k_rt = k * math.exp(-r[i] * t)
+        decay = -s_qt * vol * nd1 / (2.0 * sqrt_t)
+
+        if is_call[i]:
+            Nd1 = _norm_cdf(d1)
+            Nd2 = _norm_cdf(d2)
+            out_price[i] = s_qt * Nd1 - k_rt * Nd2
+            out_delta[i] = e_qt * Nd1
+            out_theta[i] = decay - r[i] * k_rt * Nd2 + q[i] * s_qt * Nd1
+            out_rho[i] = t * k_rt * Nd2
+        else:
+            # 看跌期权直接用N(-d1)、N(-d2)，避免1-N(d)的抵消误差
+            Nmd1 = _norm_cdf(-d1)
+            Nmd2 = _norm_cdf(-d2)
+            out_price[i] = k_rt * Nmd2 - s_qt * Nmd1
+            out_delta[i] = -e_qt * Nmd1
+            out_theta[i] = decay + r[i] * k_rt * Nmd2 - q[i] * s_qt * Nmd1
+            out_rho[i] = -t * k_rt * Nmd2
+
+        out_gamma[i] = e_qt * nd1 / (s * vol_sqrt_t)
+        out_vega[i] = s_qt * nd1 * sqrt_t
+
+GREEK_OUTPUTS = ('price', 'delta', 'gamma', 'theta', 'vega', 'rho')
+
+def compute_greeks(S, K, T, r, sigma, is_call, q=0.0) -> Dict[str, np.ndarray]:
+    """
+    bcc97_greeks的数组接口，参数可为标量或可广播的数组
+
+    Args:
+        S: 标的价格
+        K: 行权价
+        T: 到期时间（年）
+        r: 无风险利率
+        sigma: 波动率
+        is_call: 是否为看涨期权
+        q: 股息率（默认为0，即Black-Scholes）
+
+    Returns:
+        以GREEK_OUTPUTS为键的数组字典，S、K、T或sigma缺失或非正的位置为NaN
+    """
+    S, K, T, r, sigma, q = np.broadcast_arrays(
+        *(np.asarray(x, dtype=np.float64) for x in (S, K, T, r, sigma, q))
+    )
+    is_call = np.broadcast_to(np.asarray(is_call, dtype=np.bool_), S.shape)
+    S, K, T, r, sigma, q, is_call = (np.ascontiguousarray(x).ravel() for x in (S, K, T, r, sigma, q, is_call))
+
+    out = {name: np.empty(S.size) for name in GREEK_OUTPUTS}
+    bcc97_greeks(S, K, T, r, q, sigma, is_call, *(out[name] for name in GREEK_OUTPUTS))
+    return out
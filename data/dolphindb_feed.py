@@ -1,33 +1,65 @@
 """
 Backtrader数据源模块 - DolphinDB数据接入
 """
+import os
 import backtrader as bt
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from typing import Optional, Dict, Any
 from .option_data import OptionDataHandler
+from ._greeks_numba import compute_greeks
 
-class DolphinDBData(bt.feeds.PandasData):
+GREEK_COLUMNS = ('delta', 'gamma', 'vega', 'theta', 'rho')
+DEFAULT_RISK_FREE_RATE = 0.03  # 数据中没有risk_free_rate列时使用
+
+# 只需4位左右有效数字的列以float32存储，价格列保持float64
+FLOAT32_COLUMNS = ('implied_volatility', 'open_interest') + GREEK_COLUMNS
+
+_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "tradetools", "dolphindb")
+
+def _cache_path(symbol: str, start_date: Any, end_date: Any) -> str:
+    """按(合约, 开始, 结束)生成parquet缓存路径"""
+    key = "_".join(str(x) for x in (symbol, start_date, end_date))
+    key = "".join(c if c.isalnum() or c in "-." else "_" for c in key)
+    return os.path.join(_CACHE_DIR, f"{key}.parquet")
+
+def _cacheable(end_date: Any) -> bool:
+    """只有显式给出且早于今天的结束日期对应的数据不会再变化，可以写入磁盘缓存"""
+    return end_date is not None and pd.Timestamp(end_date) < pd.Timestamp.today().normalize()
+
+def _read_cache(path: str) -> Optional[pd.DataFrame]:
+    """以内存映射方式读取parquet缓存，不存在或无法读取时返回None"""
+    if not os.path.exists(path):
+        return None
+    try:
+        return pd.read_parquet(path, memory_map=True)
+    except (ImportError, ValueError, OSError):
+        return None
+
+def _write_cache(df: pd.DataFrame, path: str) -> None:
+    """写入无压缩parquet缓存，未安装parquet引擎或写入失败时跳过"""
+    try:
+        os.makedirs(_CACHE_DIR, exist_ok=True)
+        df.to_parquet(path, compression=None, use_dictionary=False)
+    except (ImportError, ValueError, OSError):
+        pass
+
+class DolphinDBDataOHLCV(bt.feeds.PandasData):
     """
     DolphinDB数据源适配器，用于Backtrader回测
-    继承自bt.feeds.PandasData，实现与DolphinDB的数据接口
+    继承自bt.feeds.PandasData，实现与DolphinDB的数据接口，只映射OHLCV和持仓量列，
+    适用于不使用希腊字母的回测
     """
-    # 定义列映射
+    # 定义列映射，时间戳在_prepare_frame中设为索引，datetime为None表示取索引
     params = (
-        ('datetime', 'timestamp'),  # 时间戳列
+        ('datetime', None),        # 时间戳索引
         ('open', 'open'),          # 开盘价
         ('high', 'high'),          # 最高价
         ('low', 'low'),            # 最低价
         ('close', 'close'),        # 收盘价
         ('volume', 'volume'),      # 成交量
         ('openinterest', 'open_interest'),  # 持仓量
-        ('strike', 'strike'),      # 行权价
-        ('impliedVolatility', 'implied_volatility'),  # 隐含波动率
-        ('delta', 'delta'),        # Delta值
-        ('gamma', 'gamma'),        # Gamma值
-        ('vega', 'vega'),          # Vega值
-        ('theta', 'theta'),        # Theta值
-        ('rho', 'rho'),           # Rho值
     )
 
     def __init__(self, 
@@ -35,70 +67,176 @@ class DolphinDBData(bt.feeds.PandasData):
                  symbol: str = None,
                  start_date: datetime = None,
                  end_date: datetime = None,
-                 **kwargs):
+                 use_cache: bool = True):
         """
         初始化数据源
         
+        未通过dataname参数提供数据时，按合约和日期范围从DolphinDB查询
+        
         Args:
             db_handler: DolphinDB数据处理器实例
             symbol: 期权代码
             start_date: 开始日期
             end_date: 结束日期
+            use_cache: 为False时不读写磁盘缓存，总是查询DolphinDB
         """
-        if db_handler is None:
-            db_handler = OptionDataHandler()
-        
-        self.db_handler = db_handler
         self.symbol = symbol
         self.start_date = start_date
         self.end_date = end_date
+        self.db_handler = db_handler
         
-        # 从DolphinDB获取数据
-        df = self._fetch_data()
+        if self.p.dataname is None:
+            if self.db_handler is None:
+                self.db_handler = OptionDataHandler()
+            # 从DolphinDB获取数据，须在父类初始化读取列名之前放入params
+            self.p.dataname = self.load_frame(self.db_handler, symbol, start_date, end_date, use_cache)
         
         # 调用父类初始化
-        super().__init__(dataname=df, **kwargs)
+        super().__init__()
+        
+    @classmethod
+    def from_frame(cls, dataframe: pd.DataFrame, symbol: str = None, **kwargs) -> "DolphinDBDataOHLCV":
+        """
+        由已查询好的数据构建数据源
+        
+        Args:
+            dataframe: 以时间戳为索引、已排序的数据
+            symbol: 期权代码
+        """
+        return cls(dataname=dataframe, symbol=symbol, **kwargs)
+        
+    @staticmethod
+    def _prepare_frame(df: pd.DataFrame) -> pd.DataFrame:
+        """解析时间戳列并设为排序后的索引"""
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        df.set_index('timestamp', inplace=True)
+        df.sort_index(inplace=True, kind='stable')
+        df = DolphinDBDataOHLCV._fill_greeks(df)
+        
+        for col in FLOAT32_COLUMNS:
+            if col in df.columns:
+                df[col] = df[col].astype(np.float32)
+        return df
+        
+    @staticmethod
+    def _fill_greeks(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        缺失希腊字母列时，对整列数据做一次向量化Black-Scholes计算补齐
+        
+        需要underlying_price、strike、implied_volatility、option_type以及
+        expiry或time_to_expiry列，不具备时原样返回
+        """
+        missing = [greek for greek in GREEK_COLUMNS if greek not in df.columns]
+        required = ('underlying_price', 'strike', 'implied_volatility', 'option_type')
+        if not missing or not all(col in df.columns for col in required):
+            return df
+            
+        if 'time_to_expiry' in df.columns:
+            T = df['time_to_expiry'].to_numpy(dtype=np.float64)
+        elif 'expiry' in df.columns:
+            T = (pd.to_datetime(df['expiry']).to_numpy() - df.index.to_numpy()) / np.timedelta64(1, 'D')
+            T = np.floor(T) / 365.0
+        else:
+            return df
+            
+        r = (df['risk_free_rate'].to_numpy(dtype=np.float64)
+             if 'risk_free_rate' in df.columns else DEFAULT_RISK_FREE_RATE)
+        greeks = compute_greeks(
+            df['underlying_price'].to_numpy(dtype=np.float64),
+            df['strike'].to_numpy(dtype=np.float64),
+            T,
+            r,
+            df['implied_volatility'].to_numpy(dtype=np.float64),
+            (df['option_type'].astype(str).str.lower() == 'call').to_numpy()
+        )
+        for greek in missing:
+            df[greek] = greeks[greek]
+        return df
     
-    def _fetch_data(self) -> pd.DataFrame:
+    @staticmethod
+    def load_frame(db_handler: OptionDataHandler,
+                   symbol: str,
+                   start_date: Any,
+                   end_date: Any,
+                   use_cache: bool = True) -> pd.DataFrame:
         """
         从DolphinDB获取数据并转换为Backtrader所需格式
         
+        结束日期早于今天的(合约, 开始, 结束)结果缓存为无压缩parquet，之后的回测以
+        内存映射方式读取，不再查询DolphinDB。未给出结束日期或范围包含今天时数据仍可能
+        变化，不读写缓存。未安装parquet引擎时不使用缓存
+        
+        Args:
+            db_handler: DolphinDB数据处理器实例
+            symbol: 期权代码
+            start_date: 开始日期
+            end_date: 结束日期
+            use_cache: 为False时不读写磁盘缓存，总是查询DolphinDB
+            
         Returns:
             pd.DataFrame: 处理后的数据框
         """
-        # 使用OptionDataHandler查询数据
-        df = self.db_handler.query_option_data(
-            symbol=self.symbol,
-            start_date=self.start_date,
-            end_date=self.end_date
-        )
-        
-        # 确保时间戳列格式正确
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df.set_index('timestamp', inplace=True)
-        df.sort_index(inplace=True)
+        use_cache = use_cache and _cacheable(end_date)
+        path = _cache_path(symbol, start_date, end_date)
+        if use_cache:
+            df = _read_cache(path)
+            if df is not None:
+                return df
+                
+        # 使用OptionDataHandler查询数据，并确保时间戳列格式正确
+        df = DolphinDBDataOHLCV._prepare_frame(db_handler.get_option_data(
+            symbols=[symbol],
+            start_date=start_date,
+            end_date=end_date
+        ))
         
+        if use_cache:
+            _write_cache(df, path)
         return df
 
+class DolphinDBData(DolphinDBDataOHLCV):
+    """
+    带行权价、隐含波动率和希腊字母列映射的DolphinDB数据源
+    数据须包含下列各列(希腊字母可由_fill_greeks补齐)，否则应使用DolphinDBDataOHLCV
+    """
+    lines = ('strike', 'impliedVolatility', 'delta', 'gamma', 'vega', 'theta', 'rho')
+    
+    # 在OHLCV列映射的基础上追加
+    params = (
+        ('strike', 'strike'),      # 行权价
+        ('impliedVolatility', 'implied_volatility'),  # 隐含波动率
+        ('delta', 'delta'),        # Delta值
+        ('gamma', 'gamma'),        # Gamma值
+        ('vega', 'vega'),          # Vega值
+        ('theta', 'theta'),        # Theta值
+        ('rho', 'rho'),           # Rho值
+    )
+
 class DolphinDBOptionFeed:
     """
     DolphinDB期权数据源管理器
     用于管理多个期权合约的数据源
     """
-    def __init__(self, db_handler: Optional[OptionDataHandler] = None):
+    def __init__(self, db_handler: Optional[OptionDataHandler] = None, use_cache: bool = True):
         """
         初始化数据源管理器
         
         Args:
             db_handler: DolphinDB数据处理器实例
+            use_cache: 为False时不读写磁盘parquet缓存，内存中的缓存仍然生效
         """
         self.db_handler = db_handler or OptionDataHandler()
+        self.use_cache = use_cache
+        
+        # (合约, 开始, 结束) -> 已整理的数据框，多次回测共享同一份只读数据
+        self._df_cache: Dict[tuple, pd.DataFrame] = {}
         
     def get_option_data(self, 
                        symbol: str,
                        start_date: datetime,
                        end_date: datetime,
-                       **kwargs) -> DolphinDBData:
+                       include_greeks: bool = True,
+                       **kwargs) -> DolphinDBDataOHLCV:
         """
         获取指定期权合约的数据源
         
@@ -106,23 +244,38 @@ class DolphinDBOptionFeed:
             symbol: 期权代码
             start_date: 开始日期
             end_date: 结束日期
+            include_greeks: 为False时返回只含OHLCV的DolphinDBDataOHLCV
             
         Returns:
-            DolphinDBData: 期权数据源实例
+            DolphinDBDataOHLCV: 期权数据源实例，include_greeks为True时是DolphinDBData
         """
-        return DolphinDBData(
-            db_handler=self.db_handler,
+        feed_cls = DolphinDBData if include_greeks else DolphinDBDataOHLCV
+        return feed_cls.from_frame(
+            self._get_frame(symbol, start_date, end_date),
             symbol=symbol,
+            db_handler=self.db_handler,
             start_date=start_date,
             end_date=end_date,
             **kwargs
         )
+        
+    def _get_frame(self, symbol: str, start_date: datetime, end_date: datetime) -> pd.DataFrame:
+        """取已整理的数据框，未缓存时查询一次并缓存"""
+        key = (symbol, start_date, end_date)
+        df = self._df_cache.get(key)
+        if df is None:
+            df = DolphinDBDataOHLCV.load_frame(
+                self.db_handler, symbol, start_date, end_date, self.use_cache
+            )
+            self._df_cache[key] = df
+        return df
     
     def get_multiple_options(self,
                            symbols: list,
                            start_date: datetime,
                            end_date: datetime,
-                           **kwargs) -> Dict[str, DolphinDBData]:
+                           include_greeks: bool = True,
+                           **kwargs) -> Dict[str, DolphinDBDataOHLCV]:
         """
         获取多个期权合约的数据源
         
@@ -130,13 +283,43 @@ class DolphinDBOptionFeed:
             symbols: 期权代码列表
             start_date: 开始日期
             end_date: 结束日期
+            include_greeks: 为False时返回只含OHLCV的DolphinDBDataOHLCV
             
         Returns:
-            Dict[str, DolphinDBData]: 期权代码到数据源的映射
+            Dict[str, DolphinDBDataOHLCV]: 期权代码到数据源的映射
         """
+        feed_cls = DolphinDBData if include_greeks else DolphinDBDataOHLCV
+        missing = [s for s in symbols if (s, start_date, end_date) not in self._df_cache]
+        
+        # 与load_frame相同，结束日期早于今天时先逐个合约读取磁盘缓存
+        use_cache = self.use_cache and _cacheable(end_date)
+        if use_cache:
+            for symbol in missing:
+                df = _read_cache(_cache_path(symbol, start_date, end_date))
+                if df is not None:
+                    self._df_cache[(symbol, start_date, end_date)] = df
+            missing = [s for s in missing if (s, start_date, end_date) not in self._df_cache]
+            
+        # 其余合约一次查询取回，只解析和排序一次时间戳，再按合约拆分
+        if missing:
+            df = self.db_handler.get_option_data(
+                symbols=missing,
+                start_date=start_date,
+                end_date=end_date
+            )
+            df = DolphinDBDataOHLCV._prepare_frame(df)
+            groups = dict(tuple(df.groupby('symbol', sort=False)))
+            for symbol in missing:
+                group = groups.get(symbol, df.iloc[:0])
+                self._df_cache[(symbol, start_date, end_date)] = group
+                if use_cache:
+                    _write_cache(group, _cache_path(symbol, start_date, end_date))
+        
         return {
-            symbol: self.get_option_data(
+            symbol: feed_cls.from_frame(
+                self._df_cache[(symbol, start_date, end_date)],
                 symbol=symbol,
+                db_handler=self.db_handler,
                 start_date=start_date,
                 end_date=end_date,
                 **kwargs
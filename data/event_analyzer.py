@@ -2,13 +2,15 @@
 事件分析和评估模块
 用于分析和评估新闻、财报等事件对期权市场的影响
 """
-from typing import List, Dict, Optional, Union, Tuple
+from typing import List, Dict, NamedTuple, Optional, Union, Tuple
 from datetime import datetime, timedelta
 import pandas as pd
 import numpy as np
 from pymongo import MongoClient
 from enum import Enum
 
+from .event_kernels import analyze_all, compute_event_metrics, normalize_score, normalize_scores
+
 class EventType(Enum):
     """事件类型枚举"""
     EARNINGS = "earnings"           # 财报
@@ -19,6 +21,16 @@ class EventType(Enum):
     ANALYST_RATING = "rating"      # 分析师评级
     INSIDER_TRADING = "insider"    # 内部交易
     REGULATORY = "regulatory"      # 监管事件
+    
+    @classmethod
+    def to_code(cls, event_type: "EventType") -> int:
+        """事件类型转为按定义顺序编号的整数代码"""
+        return _EVENT_TYPE_CODES[event_type]
+    
+    @classmethod
+    def from_code(cls, code: int) -> "EventType":
+        """整数代码还原为事件类型"""
+        return _EVENT_TYPES[code]
 
 class EventImpact(Enum):
     """事件影响力评级"""
@@ -27,6 +39,33 @@ class EventImpact(Enum):
     LOW = 1
     NEUTRAL = 0
 
+# 事件类型与整数代码的双向映射，代码即定义顺序
+_EVENT_TYPES = tuple(EventType)
+_EVENT_TYPE_CODES = {event_type: code for code, event_type in enumerate(_EVENT_TYPES)}
+
+class EventMetrics(NamedTuple):
+    """事件前后各项指标，依次为IV、成交量、波动率偏斜和期限结构的事件前值、事件后值、变化和分数"""
+    iv_pre: float
+    iv_post: float
+    iv_change: float
+    iv_score: float
+    volume_pre: float
+    volume_post: float
+    volume_change: float
+    volume_score: float
+    skew_pre: float
+    skew_post: float
+    skew_change: float
+    skew_score: float
+    term_pre: float
+    term_post: float
+    term_change: float
+    term_score: float
+
+# 影响力分级阈值及对应级别，score落在[阈值i, 阈值i+1)时取_IMPACT_LEVELS[i+1]
+_IMPACT_THRESHOLDS = np.array([0.2, 0.4, 0.7])
+_IMPACT_LEVELS = (EventImpact.NEUTRAL, EventImpact.LOW, EventImpact.MEDIUM, EventImpact.HIGH)
+
 class EventAnalyzer:
     """事件分析器"""
     
@@ -64,14 +103,155 @@ class EventAnalyzer:
         # 获取期权数据（需要实现）
         options_data = self._get_options_data(symbol, start_date, end_date)
         
-        # 计算各项指标
-        metrics = {
-            "iv_change": self._analyze_iv_change(options_data, event_date),
-            "volume_change": self._analyze_volume_change(options_data, event_date),
-            "skew_change": self._analyze_skew_change(options_data, event_date),
-            "term_structure_change": self._analyze_term_structure(options_data, event_date)
-        }
+        return self._impact_from_data(symbol, event_type, event_date, options_data)
+    
+    def analyze_events_batch(self,
+                             events: List[Tuple[str, EventType, datetime]],
+                             window_size: int = 5) -> List[Dict]:
+        """
+        批量分析一组事件的影响
+        
+        每个标的只查询一次覆盖其全部事件窗口的期权数据，再在内存中按事件窗口切片，
+        避免逐事件访问数据库
+        
+        Args:
+            events: (股票代码, 事件类型, 事件日期)列表
+            window_size: 分析窗口大小（天）
+            
+        Returns:
+            List[Dict]: 与events顺序一致的影响分析结果
+        """
+        window = timedelta(days=window_size)
+        frames = self._load_event_frames(events, window)
+            
+        results = []
+        for symbol, event_type, event_date in events:
+            data = frames[symbol]
+            if data is not None:
+                data = data.loc[event_date - window:event_date + window]
+            results.append(self._impact_from_data(symbol, event_type, event_date, data))
+        return results
+    
+    def analyze_events_parallel(self,
+                                events: List[Tuple[str, EventType, datetime]],
+                                window_size: int = 5) -> List[Dict]:
+        """
+        并行批量分析一组事件的影响
+        
+        各标的数据按时间排序后首尾拼接成连续数组，每个事件对应其中一段
+        [start, end)，由numba prange内核在所有核上同时计算全部事件的指标
+        
+        Args:
+            events: (股票代码, 事件类型, 事件日期)列表
+            window_size: 分析窗口大小（天）
+            
+        Returns:
+            List[Dict]: 与events顺序一致的影响分析结果
+        """
+        window = timedelta(days=window_size)
+        frames = self._load_event_frames(events, window)
         
+        event_ts = np.array([pd.Timestamp(e[2]).value for e in events], dtype=np.int64)
+        starts = np.zeros(len(events), dtype=np.int64)
+        ends = np.zeros(len(events), dtype=np.int64)
+        win = pd.Timedelta(window).value
+        
+        # 拼接各标的数据，并在各自的时间段内定位每个事件窗口
+        columns = []
+        offset = 0
+        for symbol, data in frames.items():
+            if data is None or len(data) == 0:
+                continue
+            arrays = self._metric_arrays(data)
+            idx = np.array([i for i, e in enumerate(events) if e[0] == symbol], dtype=np.int64)
+            ts = arrays[0]
+            starts[idx] = offset + np.searchsorted(ts, event_ts[idx] - win, side='left')
+            ends[idx] = offset + np.searchsorted(ts, event_ts[idx] + win, side='right')
+            columns.append(arrays)
+            offset += len(ts)
+            
+        if columns:
+            stacked = [np.concatenate(parts) for parts in zip(*columns)]
+        else:
+            stacked = [np.empty(0, dtype=np.int64)] + [np.empty(0)] * 4 + [np.empty(0, dtype=np.int64)]
+        values = analyze_all(event_ts, starts, ends, *stacked)
+        
+        return [
+            self._impact_from_metrics(symbol, event_type, event_date, metrics)
+            for (symbol, event_type, event_date), metrics in zip(events, self._metrics_from_table(values))
+        ]
+    
+    def analyze_to_frame(self,
+                         events: List[Tuple[str, EventType, datetime]],
+                         window_size: int = 5) -> pd.DataFrame:
+        """
+        批量分析一组事件并整理为DataFrame
+        
+        event_type_code和impact_level为int8代码的Categorical列，积累大量事件时
+        不必为每行保存一个Python字符串或枚举对象
+        
+        Args:
+            events: (股票代码, 事件类型, 事件日期)列表
+            window_size: 分析窗口大小（天）
+            
+        Returns:
+            pd.DataFrame: 每个事件一行，顺序与events一致
+        """
+        results = self.analyze_events_parallel(events, window_size)
+        
+        type_codes = np.fromiter((EventType.to_code(e[1]) for e in events),
+                                 dtype=np.int8, count=len(events))
+        level_codes = np.fromiter((r["impact_level"].value for r in results),
+                                  dtype=np.int8, count=len(results))
+        
+        return pd.DataFrame({
+            "symbol": [e[0] for e in events],
+            "event_type_code": pd.Categorical.from_codes(
+                type_codes, categories=[t.value for t in _EVENT_TYPES]
+            ),
+            "event_ts": pd.to_datetime([e[2] for e in events]),
+            "iv_change": [r["metrics"].iv_change for r in results],
+            "vol_change": [r["metrics"].volume_change for r in results],
+            "skew_change": [r["metrics"].skew_change for r in results],
+            "term_change": [r["metrics"].term_change for r in results],
+            "impact_score": np.array([r["impact_score"] for r in results], dtype=np.float64),
+            "impact_level": pd.Categorical.from_codes(
+                level_codes, categories=[level.name for level in _IMPACT_LEVELS], ordered=True
+            ),
+        })
+    
+    def _load_event_frames(self,
+                           events: List[Tuple[str, EventType, datetime]],
+                           window: timedelta) -> Dict[str, Optional[pd.DataFrame]]:
+        """每个标的查询一次覆盖其全部事件窗口的期权数据，并按时间排序"""
+        # 每个标的所有事件窗口的并集范围
+        ranges: Dict[str, Tuple[datetime, datetime]] = {}
+        for symbol, _, event_date in events:
+            lo, hi = ranges.get(symbol, (event_date - window, event_date + window))
+            ranges[symbol] = (min(lo, event_date - window), max(hi, event_date + window))
+            
+        frames = {}
+        for symbol, (start_date, end_date) in ranges.items():
+            data = self._get_options_data(symbol, start_date, end_date)
+            frames[symbol] = data.sort_index() if data is not None else data
+        return frames
+    
+    def _impact_from_data(self,
+                          symbol: str,
+                          event_type: EventType,
+                          event_date: datetime,
+                          options_data: pd.DataFrame) -> Dict:
+        """由事件窗口内的期权数据计算影响分析结果"""
+        # 计算各项指标
+        metrics = self._analyze_metrics(options_data, event_date)
+        return self._impact_from_metrics(symbol, event_type, event_date, metrics)
+    
+    def _impact_from_metrics(self,
+                             symbol: str,
+                             event_type: EventType,
+                             event_date: datetime,
+                             metrics: EventMetrics) -> Dict:
+        """由各项指标汇总影响分析结果"""
         # 评估整体影响
         impact_score = self._calculate_impact_score(metrics)
         
@@ -84,129 +264,90 @@ class EventAnalyzer:
             "impact_level": self._score_to_impact_level(impact_score)
         }
     
-    def _analyze_iv_change(self, 
-                          options_data: pd.DataFrame, 
-                          event_date: datetime) -> Dict:
-        """分析隐含波动率变化"""
-        # 计算事件前后的ATM期权IV变化
-        pre_event = options_data[options_data.index < event_date]
-        post_event = options_data[options_data.index >= event_date]
-        
-        pre_iv = pre_event['implied_volatility'].mean()
-        post_iv = post_event['implied_volatility'].mean()
-        iv_change = (post_iv - pre_iv) / pre_iv
-        
-        return {
-            "pre_iv": pre_iv,
-            "post_iv": post_iv,
-            "change": iv_change,
-            "score": self._normalize_score(abs(iv_change), 0.1, 0.3)
-        }
+    def _analyze_metrics(self,
+                         options_data: pd.DataFrame,
+                         event_date: datetime) -> EventMetrics:
+        """一次遍历计算IV、成交量、波动率偏斜和期限结构在事件前后的变化"""
+        values = compute_event_metrics(
+            *self._metric_arrays(options_data), pd.Timestamp(event_date).value
+        )
+        return self._metrics_from_values(values)
     
-    def _analyze_volume_change(self, 
-                             options_data: pd.DataFrame, 
-                             event_date: datetime) -> Dict:
-        """分析成交量变化"""
-        pre_event = options_data[options_data.index < event_date]
-        post_event = options_data[options_data.index >= event_date]
-        
-        pre_volume = pre_event['volume'].mean()
-        post_volume = post_event['volume'].mean()
-        volume_change = (post_volume - pre_volume) / pre_volume
-        
-        return {
-            "pre_volume": pre_volume,
-            "post_volume": post_volume,
-            "change": volume_change,
-            "score": self._normalize_score(abs(volume_change), 0.5, 2.0)
-        }
+    @staticmethod
+    def _metric_arrays(options_data: pd.DataFrame) -> Tuple[np.ndarray, ...]:
+        """取出指标内核所需的列：(ts, iv, volume, strike, underlying, dte)"""
+        return (
+            options_data.index.values.astype('datetime64[ns]').view(np.int64),
+            options_data['implied_volatility'].to_numpy(dtype=np.float64),
+            options_data['volume'].to_numpy(dtype=np.float64),
+            options_data['strike'].to_numpy(dtype=np.float64),
+            options_data['underlying_price'].to_numpy(dtype=np.float64),
+            options_data['days_to_expiry'].fillna(-1).to_numpy(dtype=np.int64)
+        )
     
-    def _analyze_skew_change(self, 
-                            options_data: pd.DataFrame, 
-                            event_date: datetime) -> Dict:
-        """分析波动率偏斜变化"""
-        def calculate_skew(data):
-            # 简化的skew计算，实际应考虑更多因素
-            otm_puts = data[data['strike'] < data['underlying_price']]['implied_volatility'].mean()
-            otm_calls = data[data['strike'] > data['underlying_price']]['implied_volatility'].mean()
-            return otm_puts - otm_calls
+    def _metrics_from_values(self, values) -> EventMetrics:
+        """由内核返回的8个事件前后统计量构建各项指标"""
+        (pre_iv, post_iv, pre_volume, post_volume,
+         pre_skew, post_skew, pre_term, post_term) = map(np.float64, values)
         
-        pre_event = options_data[options_data.index < event_date]
-        post_event = options_data[options_data.index >= event_date]
-        
-        pre_skew = calculate_skew(pre_event)
-        post_skew = calculate_skew(post_event)
+        # 以numpy标量相除，前值为0时与pandas一致得到inf/nan而不是抛异常
+        iv_change = (post_iv - pre_iv) / pre_iv
+        volume_change = (post_volume - pre_volume) / pre_volume
         skew_change = post_skew - pre_skew
+        term_change = post_term - pre_term
         
-        return {
-            "pre_skew": pre_skew,
-            "post_skew": post_skew,
-            "change": skew_change,
-            "score": self._normalize_score(abs(skew_change), 0.02, 0.05)
-        }
+        return EventMetrics(
+            pre_iv, post_iv, iv_change,
+            self._normalize_score(abs(iv_change), 0.1, 0.3),
+            pre_volume, post_volume, volume_change,
+            self._normalize_score(abs(volume_change), 0.5, 2.0),
+            pre_skew, post_skew, skew_change,
+            self._normalize_score(abs(skew_change), 0.02, 0.05),
+            pre_term, post_term, term_change,
+            self._normalize_score(abs(term_change), 0.02, 0.05)
+        )
     
-    def _analyze_term_structure(self, 
-                              options_data: pd.DataFrame, 
-                              event_date: datetime) -> Dict:
-        """分析期限结构变化"""
-        def calculate_term_structure(data):
-            # 按到期时间分组计算平均IV
-            grouped = data.groupby('days_to_expiry')['implied_volatility'].mean()
-            # 计算短期和长期IV之差
-            short_term = grouped[grouped.index <= 30].mean()
-            long_term = grouped[grouped.index > 30].mean()
-            return long_term - short_term
+    def _metrics_from_table(self, values: np.ndarray) -> List[EventMetrics]:
+        """由analyze_all返回的(事件数, 8)数组整列计算变化与分数，再逐行构建各项指标"""
+        pre_iv, post_iv, pre_volume, post_volume, pre_skew, post_skew, pre_term, post_term = values.T
         
-        pre_event = options_data[options_data.index < event_date]
-        post_event = options_data[options_data.index >= event_date]
-        
-        pre_term = calculate_term_structure(pre_event)
-        post_term = calculate_term_structure(post_event)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            iv_change = (post_iv - pre_iv) / pre_iv
+            volume_change = (post_volume - pre_volume) / pre_volume
+        skew_change = post_skew - pre_skew
         term_change = post_term - pre_term
         
-        return {
-            "pre_term": pre_term,
-            "post_term": post_term,
-            "change": term_change,
-            "score": self._normalize_score(abs(term_change), 0.02, 0.05)
-        }
+        columns = (
+            pre_iv, post_iv, iv_change,
+            normalize_scores(np.abs(iv_change), 0.1, 0.3),
+            pre_volume, post_volume, volume_change,
+            normalize_scores(np.abs(volume_change), 0.5, 2.0),
+            pre_skew, post_skew, skew_change,
+            normalize_scores(np.abs(skew_change), 0.02, 0.05),
+            pre_term, post_term, term_change,
+            normalize_scores(np.abs(term_change), 0.02, 0.05)
+        )
+        return [EventMetrics._make(row) for row in zip(*(c.tolist() for c in columns))]
     
-    def _calculate_impact_score(self, metrics: Dict) -> float:
+    def _calculate_impact_score(self, metrics: EventMetrics) -> float:
         """计算整体影响分数"""
-        weights = {
-            "iv_change": 0.4,
-            "volume_change": 0.3,
-            "skew_change": 0.2,
-            "term_structure_change": 0.1
-        }
-        
-        score = sum(metrics[key]["score"] * weights[key] for key in weights)
-        return score
+        return (metrics.iv_score * 0.4 +
+                metrics.volume_score * 0.3 +
+                metrics.skew_score * 0.2 +
+                metrics.term_score * 0.1)
     
     def _score_to_impact_level(self, score: float) -> EventImpact:
         """将分数转换为影响力级别"""
-        if score >= 0.7:
-            return EventImpact.HIGH
-        elif score >= 0.4:
-            return EventImpact.MEDIUM
-        elif score >= 0.2:
-            return EventImpact.LOW
-        else:
+        if np.isnan(score):
             return EventImpact.NEUTRAL
+        return _IMPACT_LEVELS[int(np.searchsorted(_IMPACT_THRESHOLDS, score, side='right'))]
     
     def _normalize_score(self, 
                         value: float, 
                         medium_threshold: float, 
                         high_threshold: float) -> float:
         """标准化分数到0-1之间"""
-        if value >= high_threshold:
-            return 1.0
-        elif value <= 0:
-            return 0.0
-        elif value >= medium_threshold:
-            return 0.5 + 0.5 * (value - medium_threshold) / (high_threshold - medium_threshold)
-        else:
-            return 0.5 * value / medium_threshold
+        return normalize_score(float(value), float(medium_threshold), float(high_threshold))
     
     def _get_options_data(self,
                          symbol: str,
@@ -261,7 +402,7 @@ class EventStrategy:
         metrics = impact["metrics"]
         
         # 根据IV变化和偏斜决定策略
-        if metrics["skew_change"]["change"] > 0:
+        if metrics.skew_change > 0:
             # 看跌偏斜增加，考虑买入保护性看跌
             return {
                 "action": "buy_puts",
@@ -282,7 +423,7 @@ class EventStrategy:
         """生成中等影响力事件的策略"""
         metrics = impact["metrics"]
         
-        if metrics["iv_change"]["change"] > 0:
+        if metrics.iv_change > 0:
             # IV上升，考虑卖出期权
             return {
                 "action": "sell_options",
@@ -0,0 +1,143 @@
+"""
+事件分析数值内核
+一次遍历期权数据，同时累计事件前后的IV、成交量、偏斜和期限结构统计量
+"""
+import numpy as np
+from numba import float64, njit, prange, vectorize
+
+@njit(cache=True)
+def _mean(total, count):
+    return total / count if count > 0 else np.nan
+
+@njit(cache=True)
+def compute_event_metrics(ts, iv, volume, strike, underlying, dte, event_ts):
+    """
+    单次遍历计算事件前后的四组指标
+
+    以ts < event_ts划分事件前后，与pandas的mean一样忽略NaN。期限结构沿用
+    groupby(days_to_expiry)的口径：先按到期天数求组内平均IV，再对<=30天和>30天
+    的组均值分别等权平均
+
+    Args:
+        ts: 时间戳(int64纳秒)
+        iv: 隐含波动率
+        volume: 成交量
+        strike: 行权价
+        underlying: 标的价格
+        dte: 到期天数(整数天)
+        event_ts: 事件时间戳(int64纳秒)
+
+    Returns:
+        (pre_iv, post_iv, pre_volume, post_volume, pre_skew, post_skew, pre_term, post_term)
+    """
+    n = ts.size
+
+    # 按到期天数分桶，行0为事件前、行1为事件后
+    max_dte = 0
+    for i in range(n):
+        if dte[i] > max_dte:
+            max_dte = dte[i]
+    term_sum = np.zeros((2, max_dte + 1))
+    term_cnt = np.zeros((2, max_dte + 1), dtype=np.int64)
+
+    iv_sum = np.zeros(2)
+    iv_cnt = np.zeros(2, dtype=np.int64)
+    vol_sum = np.zeros(2)
+    vol_cnt = np.zeros(2, dtype=np.int64)
+    put_sum = np.zeros(2)
+    put_cnt = np.zeros(2, dtype=np.int64)
+    call_sum = np.zeros(2)
+    call_cnt = np.zeros(2, dtype=np.int64)
+
+    for i in range(n):
+        side = 0 if ts[i] < event_ts else 1
+
+        v = volume[i]
+        if not np.isnan(v):
+            vol_sum[side] += v
+            vol_cnt[side] += 1
+
+        x = iv[i]
+        if np.isnan(x):
+            continue
+        iv_sum[side] += x
+        iv_cnt[side] += 1
+
+        # 虚值看跌/看涨以行权价相对标的价格划分
+        if strike[i] < underlying[i]:
+            put_sum[side] += x
+            put_cnt[side] += 1
+        elif strike[i] > underlying[i]:
+            call_sum[side] += x
+            call_cnt[side] += 1
+
+        if dte[i] >= 0:
+            term_sum[side, dte[i]] += x
+            term_cnt[side, dte[i]] += 1
+
+    term = np.empty(2)
+    for side in range(2):
+        short_sum = 0.0
+        short_n = 0
+        long_sum = 0.0
+        long_n = 0
+        for d in range(max_dte + 1):
+            if term_cnt[side, d] == 0:
+                continue
+            group_mean = term_sum[side, d] / term_cnt[side, d]
+            if d <= 30:
+                short_sum += group_mean
+                short_n += 1
+            else:
+                long_sum += group_mean
+                long_n += 1
+        term[side] = _mean(long_sum, long_n) - _mean(short_sum, short_n)
+
+    return (
+        _mean(iv_sum[0], iv_cnt[0]), _mean(iv_sum[1], iv_cnt[1]),
+        _mean(vol_sum[0], vol_cnt[0]), _mean(vol_sum[1], vol_cnt[1]),
+        _mean(put_sum[0], put_cnt[0]) - _mean(call_sum[0], call_cnt[0]),
+        _mean(put_sum[1], put_cnt[1]) - _mean(call_sum[1], call_cnt[1]),
+        term[0], term[1]
+    )
+
+@njit(parallel=True, cache=True)
+def analyze_all(event_ts, starts, ends, ts, iv, volume, strike, underlying, dte):
+    """
+    并行计算多个事件的指标，第i个事件使用拼接数组中的[starts[i], ends[i])段
+
+    Returns:
+        形状为(事件数, 8)的数组，每行与compute_event_metrics的返回值顺序相同
+    """
+    n_events = event_ts.size
+    out = np.empty((n_events, 8))
+    for i in prange(n_events):
+        lo = starts[i]
+        hi = ends[i]
+        res = compute_event_metrics(
+            ts[lo:hi], iv[lo:hi], volume[lo:hi], strike[lo:hi],
+            underlying[lo:hi], dte[lo:hi], event_ts[i]
+        )
+        for k in range(8):
+            out[i, k] = res[k]
+    return out
+
+@njit(inline='always', cache=True)
+def normalize_score(value, medium_threshold, high_threshold):
+    """把指标变化幅度映射到0-1分数：中等阈值处为0.5，高阈值及以上为1
+
+    inline='always'使调用它的编译函数(如normalize_scores)直接内联分段公式
+    """
+    if value >= high_threshold:
+        return 1.0
+    elif value <= 0:
+        return 0.0
+    elif value >= medium_threshold:
+        return 0.5 + 0.5 * (value - medium_threshold) / (high_threshold - medium_threshold)
+    else:
+        return 0.5 * value / medium_threshold
+
+@vectorize([float64(float64, float64, float64)], cache=True)
+def normalize_scores(value, medium_threshold, high_threshold):
+    """normalize_score的ufunc版本，可对整列事件批量打分"""
+    return normalize_score(value, medium_threshold, high_threshold)
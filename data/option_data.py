@@ -5,14 +5,19 @@ import dolphindb as ddb
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Union, Tuple
+from typing import List, Optional, Union, Tuple
 import glob
 import os
 import logging
 import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from datetime import datetime
 import ta
 
+from ._greeks_numba import compute_greeks
+
 # 设置日志
 log_filename = f"option_upload_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
 logging.basicConfig(
@@ -21,6 +26,12 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+# option_60min表的列，顺序与表结构一致
+UPLOAD_COLUMNS = ['symbol', 'date', 'timestamp', 'open', 'high', 'low', 'close', 'volume', 'openinterest']
+
+# 行情CSV中数值列的读取类型；这些列写入option_60min的DOUBLE列，必须保持float64
+CSV_DTYPES = {col: 'float64' for col in ('open', 'high', 'low', 'close', 'volume', 'openinterest')}
+
 class OptionDataHandler:
     def __init__(self, host: str = "localhost", port: int = 8848, username: str = "admin", password: str = "123456"):
         """初始化DolphinDB连接
@@ -67,13 +78,23 @@ class OptionDataHandler:
             """)
             logging.info("Table created successfully")
             
+            # 会话内定义一次写入函数，之后每批数据只作为参数传入，服务端不必再解析脚本
+            self.conn.run("""
+                def insertOpt(t){
+                    loadTable("dfs://options", "option_60min").append!(t)
+                }
+            """)
+            
         except Exception as e:
             logging.error(f"Error initializing database: {str(e)}")
             raise
 
-    def clean_option_data(self, df: pd.DataFrame) -> pd.DataFrame:
+    @staticmethod
+    def clean_option_data(df: pd.DataFrame) -> pd.DataFrame:
         """清洗和处理期权数据，考虑期权市场的特殊性
         
+        不依赖数据库连接，可在子进程中直接调用
+        
         Args:
             df: 原始期权数据DataFrame
             
@@ -94,55 +115,52 @@ class OptionDataHandler:
         if missing_before.any():
             logging.info(f"Missing values before filling: {missing_before.to_dict()}")
         
+        # 同一合约（相同到期日和行权价）的分组编号只计算一次，供填充和异常值检测共用
+        has_contract = 'expiry' in df.columns and 'strike' in df.columns
+        contract_key = ['expiry', 'strike'] if has_contract else ['symbol']
+        contract_ids = df.groupby(contract_key, sort=False).ngroup()
+        
         # 对于期权数据，我们需要更谨慎地处理缺失值
+        null_mask = df[price_cols].isnull()
+        # 对于连续的缺失值，我们不进行填充，而是标记为无效数据
+        # 因为期权价格波动大，用前值填充可能产生误导
+        null_counts = null_mask.astype(int).groupby(df['symbol']).cumsum()
+        if has_contract and null_mask.values.any():
+            # 四个价格列的同组中位数一次算出
+            medians = df[price_cols].groupby(contract_ids).transform('median')
+            
         for col in price_cols:
             # 创建填充标记列
-            fill_col = f"{col}_filled"
-            df[fill_col] = df[col].isnull()
-            
-            # 对于连续的缺失值，我们不进行填充，而是标记为无效数据
-            # 因为期权价格波动大，用前值填充可能产生误导
-            null_groups = df[col].isnull().astype(int).groupby(df['symbol']).cumsum()
-            long_null_periods = null_groups > 3  # 连续3个以上的缺失值视为无效数据段
+            df[f"{col}_filled"] = null_mask[col]
+            long_null_periods = null_counts[col] > 3  # 连续3个以上的缺失值视为无效数据段
             
             # 只对短期缺失进行填充
-            short_null = df[col].isnull() & ~long_null_periods
+            short_null = null_mask[col] & ~long_null_periods
             if short_null.any():
-                # 使用同组期权（相同到期日和行权价）的中位数填充
-                if 'expiry' in df.columns and 'strike' in df.columns:
-                    df.loc[short_null, col] = df[short_null].groupby(['expiry', 'strike'])[col].transform(
-                        lambda x: x.fillna(x.median()))
+                if has_contract:
+                    # 使用同组期权（相同到期日和行权价）的中位数填充
+                    df.loc[short_null, col] = medians.loc[short_null, col]
                 else:
                     # 如果没有期权具体信息，使用简单的前值填充
-                    df.loc[short_null, col] = df.loc[short_null, col].fillna(method='ffill')
+                    df.loc[short_null, col] = df[col].ffill()[short_null]
             
             # 标记长期缺失的数据
             df.loc[long_null_periods, f"{col}_valid"] = False
             
         # 3. 处理异常值
         # 期权价格波动较大，我们使用更宽松的异常值检测标准
-        def detect_option_outliers(group):
-            """基于期权特性的异常值检测"""
-            if len(group) < 5:  # 样本太少不做检测
-                return pd.Series(False, index=group.index)
-                
+        # 按期权合约分组检测异常值，各步均为内置的分组归约；样本太少(不足5条)的合约不做检测
+        enough_samples = contract_ids.groupby(contract_ids).transform('size') >= 5
+        for col in price_cols:
             # 使用价格变化率而不是绝对价格来检测异常
-            returns = group.pct_change()
+            returns = df[col].groupby(contract_ids).pct_change()
+            returns_by_contract = returns.groupby(contract_ids)
+            mean_ret = returns_by_contract.transform('mean')
+            std_ret = returns_by_contract.transform('std')
+            
             # 期权允许更大的价格波动，使用10个标准差
-            mean_ret = returns.mean()
-            std_ret = returns.std()
-            if std_ret == 0:
-                return pd.Series(False, index=group.index)
-                
-            z_scores = abs((returns - mean_ret) / std_ret)
-            return z_scores > 10
-        
-        # 按期权合约分组检测异常值
-        for col in price_cols:
-            if 'expiry' in df.columns and 'strike' in df.columns:
-                outliers = df.groupby(['expiry', 'strike'])[col].apply(detect_option_outliers)
-            else:
-                outliers = df.groupby('symbol')[col].apply(detect_option_outliers)
+            z_scores = ((returns - mean_ret) / std_ret.where(std_ret != 0)).abs()
+            outliers = enough_samples & (z_scores > 10)
                 
             if outliers.any():
                 logging.warning(f"Found {outliers.sum()} potential outliers in {col}")
@@ -150,18 +168,20 @@ class OptionDataHandler:
                 df.loc[outliers, f"{col}_outlier"] = True
         
         # 4. 添加流动性指标
-        df['liquidity_score'] = 0
+        # 组内百分位排名映射到0-4五档，代替逐组调用pd.qcut
+        def to_quintile(pct_rank: pd.Series) -> pd.Series:
+            return np.floor(pct_rank * 5).clip(upper=4)
+        
         # 基于volume的流动性评分
-        volume_quantiles = df.groupby(['symbol'])['volume'].transform(
-            lambda x: pd.qcut(x, q=5, labels=False, duplicates='drop'))
-        df['liquidity_score'] += volume_quantiles.fillna(0)
+        volume_quantiles = to_quintile(df.groupby('symbol', sort=False)['volume'].rank(pct=True))
+        liquidity_score = volume_quantiles.fillna(0)
         
         # 基于价差的流动性评分（如果有bid/ask数据）
         if 'bid' in df.columns and 'ask' in df.columns:
             spread = (df['ask'] - df['bid']) / ((df['ask'] + df['bid'])/2)
-            spread_quantiles = df.groupby(['symbol'])['spread'].transform(
-                lambda x: pd.qcut(x, q=5, labels=False, duplicates='drop'))
-            df['liquidity_score'] += (4 - spread_quantiles.fillna(4))  # 价差越小流动性越好
+            spread_quantiles = to_quintile(spread.groupby(df['symbol'], sort=False).rank(pct=True))
+            liquidity_score += (4 - spread_quantiles.fillna(4))  # 价差越小流动性越好
+        df['liquidity_score'] = liquidity_score.astype('int8')
         
         # 标记低流动性期间
         df['low_liquidity'] = df['liquidity_score'] <= 2
@@ -169,136 +189,12 @@ class OptionDataHandler:
         logging.info("Data cleaning completed")
         return df
 
-    def _calculate_greeks(self, S: float, K: float, T: float, r: float, sigma: float, 
-                         option_type: str) -> Dict[str, float]:
-        """计算期权的Greeks
-        
-        Args:
-            S: 标的价格
-            K: 行权价
-            T: 到期时间（年）
-            r: 无风险利率
-            sigma: 波动率
-            option_type: 期权类型 ('call' or 'put')
-            
-        Returns:
-            包含Greeks的字典
-        """
-        try:
-            from scipy.stats import norm
-            
-            # d1, d2计算
-            d1 = (np.log(S/K) + (r + sigma**2/2)*T) / (sigma*np.sqrt(T))
-            d2 = d1 - sigma*np.sqrt(T)
-            
-            # 计算N(d1)和N(d2)
-            Nd1 = norm.cdf(d1)
-            Nd2 = norm.cdf(d2)
-            
-            if option_type == 'call':
-                # Call期权的Greeks
-                delta = Nd1
-                theta = (-S*sigma*np.exp(-d1**2/2)/(2*np.sqrt(2*np.pi*T)) - 
-                        r*K*np.exp(-r*T)*Nd2)
-            else:
-                # Put期权的Greeks
-                delta = Nd1 - 1
-                theta = (-S*sigma*np.exp(-d1**2/2)/(2*np.sqrt(2*np.pi*T)) + 
-                        r*K*np.exp(-r*T)*(1 - Nd2))
-            
-            # 通用Greeks
-            gamma = np.exp(-d1**2/2)/(S*sigma*np.sqrt(2*np.pi*T))
-            vega = S*np.sqrt(T)*np.exp(-d1**2/2)/np.sqrt(2*np.pi)
-            
-            return {
-                'delta': delta,
-                'gamma': gamma,
-                'theta': theta,
-                'vega': vega
-            }
-            
-        except Exception as e:
-            logging.error(f"Error calculating Greeks: {str(e)}")
-            return {
-                'delta': np.nan,
-                'gamma': np.nan,
-                'theta': np.nan,
-                'vega': np.nan
-            }
-
-    def _calculate_greeks_bcc97(self, S: float, K: float, T: float, r: float, sigma: float,
-                               option_type: str, q: float = 0.0) -> Dict[str, float]:
-        """使用BCC97模型计算期权Greeks
-        
-        Args:
-            S: 标的价格
-            K: 行权价
-            T: 到期时间（年）
-            r: 无风险利率
-            sigma: 波动率
-            option_type: 期权类型 ('call' or 'put')
-            q: 股息率（默认为0）
-            
-        Returns:
-            包含Greeks的字典
-        """
-        try:
-            from scipy.stats import norm
-            
-            # BCC97模型的d1和d2计算
-            d1 = (np.log(S/K) + (r - q + sigma**2/2)*T) / (sigma*np.sqrt(T))
-            d2 = d1 - sigma*np.sqrt(T)
-            
-            # 计算N(d1)和N(d2)
-            Nd1 = norm.cdf(d1)
-            Nd2 = norm.cdf(d2)
-            nd1 = norm.pdf(d1)  # n(d1)用于计算gamma和vega
-            
-            # e^(-qT)和e^(-rT)
-            e_qt = np.exp(-q*T)
-            e_rt = np.exp(-r*T)
-            
-            if option_type == 'call':
-                # Call期权的Greeks
-                delta = e_qt * Nd1
-                price = S * e_qt * Nd1 - K * e_rt * Nd2
-                theta = (-S * sigma * e_qt * nd1 / (2 * np.sqrt(T)) -
-                        r * K * e_rt * Nd2 + q * S * e_qt * Nd1)
-            else:
-                # Put期权的Greeks
-                delta = -e_qt * (1 - Nd1)
-                price = K * e_rt * (1 - Nd2) - S * e_qt * (1 - Nd1)
-                theta = (-S * sigma * e_qt * nd1 / (2 * np.sqrt(T)) +
-                        r * K * e_rt * (1 - Nd2) - q * S * e_qt * (1 - Nd1))
-            
-            # 通用Greeks
-            gamma = e_qt * nd1 / (S * sigma * np.sqrt(T))
-            vega = S * e_qt * nd1 * np.sqrt(T)
-            rho = K * T * e_rt * (Nd2 if option_type == 'call' else -norm.cdf(-d2))
-            
-            return {
-                'price': price,
-                'delta': delta,
-                'gamma': gamma,
-                'theta': theta,
-                'vega': vega,
-                'rho': rho
-            }
-            
-        except Exception as e:
-            logging.error(f"Error calculating BCC97 Greeks: {str(e)}")
-            return {
-                'price': np.nan,
-                'delta': np.nan,
-                'gamma': np.nan,
-                'theta': np.nan,
-                'vega': np.nan,
-                'rho': np.nan
-            }
-
-    def calculate_option_features(self, df: pd.DataFrame, model: str = 'bs') -> pd.DataFrame:
+    @staticmethod
+    def calculate_option_features(df: pd.DataFrame, model: str = 'bs') -> pd.DataFrame:
         """计算期权特定的特征
         
+        不依赖数据库连接，可在子进程中直接调用
+        
         Args:
             df: 期权数据DataFrame
             model: 使用的期权定价模型，'bs'为Black-Scholes模型，'bcc97'为BCC97模型
@@ -313,18 +209,16 @@ class OptionDataHandler:
         
         # 2. 价格特征
         if 'underlying_price' in df.columns:
-            # 期权虚实度
-            df['moneyness'] = df.apply(
-                lambda x: x['underlying_price'] / x['strike'] if x['option_type'] == 'call'
-                else x['strike'] / x['underlying_price'],
-                axis=1
-            )
+            S = df['underlying_price'].to_numpy(dtype=np.float64)
+            K = df['strike'].to_numpy(dtype=np.float64)
+            is_call = df['option_type'].to_numpy() == 'call'
             
-            # 期权溢价率
-            df['premium_ratio'] = df.apply(
-                lambda x: x['close'] / x['underlying_price'],
-                axis=1
-            )
+            with np.errstate(divide='ignore', invalid='ignore'):
+                # 期权虚实度
+                df['moneyness'] = np.where(is_call, S / K, K / S)
+                
+                # 期权溢价率
+                df['premium_ratio'] = df['close'].to_numpy(dtype=np.float64) / S
         
         # 3. 波动率特征
         # 日内波动率
@@ -333,9 +227,10 @@ class OptionDataHandler:
         # 如果有隐含波动率数据
         if 'implied_vol' in df.columns:
             # 计算IV的移动平均和变化
-            df['iv_ma5'] = df.groupby('symbol')['implied_vol'].transform(lambda x: x.rolling(5).mean())
-            df['iv_ma20'] = df.groupby('symbol')['implied_vol'].transform(lambda x: x.rolling(20).mean())
-            df['iv_change'] = df.groupby('symbol')['implied_vol'].transform(lambda x: x.pct_change())
+            iv_groups = df.groupby('symbol', sort=False)['implied_vol']
+            df['iv_ma5'] = OptionDataHandler._group_rolling_mean(iv_groups, 5)
+            df['iv_ma20'] = OptionDataHandler._group_rolling_mean(iv_groups, 20)
+            df['iv_change'] = iv_groups.pct_change()
         
         # 4. 期权链特征（同一标的、到期日的所有期权）
         if 'underlying' in df.columns and 'expiry' in df.columns:
@@ -359,14 +254,15 @@ class OptionDataHandler:
         
         # 5. 流动性特征
         # 计算日内成交量分布
-        df['volume_ma5'] = df.groupby('symbol')['volume'].transform(lambda x: x.rolling(5).mean())
-        df['volume_ma20'] = df.groupby('symbol')['volume'].transform(lambda x: x.rolling(20).mean())
+        volume_groups = df.groupby('symbol', sort=False)['volume']
+        df['volume_ma5'] = OptionDataHandler._group_rolling_mean(volume_groups, 5)
+        df['volume_ma20'] = OptionDataHandler._group_rolling_mean(volume_groups, 20)
         df['volume_ratio'] = df['volume'] / df['volume_ma5']
         
         # 如果有bid/ask数据
         if 'bid' in df.columns and 'ask' in df.columns:
             df['spread'] = (df['ask'] - df['bid']) / ((df['ask'] + df['bid'])/2)
-            df['spread_ma5'] = df.groupby('symbol')['spread'].transform(lambda x: x.rolling(5).mean())
+            df['spread_ma5'] = OptionDataHandler._group_rolling_mean(df.groupby('symbol', sort=False)['spread'], 5)
         
         # 6. 技术指标
         # RSI
@@ -388,46 +284,58 @@ class OptionDataHandler:
             required_cols.append('dividend_yield')  # BCC97模型需要股息率
             
         if all(col in df.columns for col in required_cols):
-            for idx, row in df.iterrows():
-                try:
-                    if model == 'bcc97':
-                        greeks = self._calculate_greeks_bcc97(
-                            S=row['underlying_price'],
-                            K=row['strike'],
-                            T=row['time_to_expiry'],
-                            r=row['risk_free_rate'],
-                            sigma=row['implied_vol'],
-                            option_type=row['option_type'],
-                            q=row['dividend_yield']
-                        )
-                    else:  # 默认使用BS模型
-                        greeks = self._calculate_greeks(
-                            S=row['underlying_price'],
-                            K=row['strike'],
-                            T=row['time_to_expiry'],
-                            r=row['risk_free_rate'],
-                            sigma=row['implied_vol'],
-                            option_type=row['option_type']
-                        )
-                        
-                    # 添加模型前缀以区分不同模型的结果
-                    prefix = 'bcc_' if model == 'bcc97' else 'bs_'
-                    for greek, value in greeks.items():
-                        df.at[idx, f'{prefix}{greek}'] = value
-                        
-                except Exception as e:
-                    logging.warning(f"Failed to calculate Greeks for row {idx}: {str(e)}")
+            if model == 'bcc97':
+                q = df['dividend_yield'].to_numpy(dtype=np.float64)
+                names = ('price', 'delta', 'gamma', 'theta', 'vega', 'rho')
+            else:  # 默认使用BS模型，即股息率为0的BCC97
+                q = 0.0
+                names = ('delta', 'gamma', 'theta', 'vega')
+                
+            greeks = compute_greeks(
+                S=df['underlying_price'].to_numpy(dtype=np.float64),
+                K=df['strike'].to_numpy(dtype=np.float64),
+                T=df['time_to_expiry'].to_numpy(dtype=np.float64),
+                r=df['risk_free_rate'].to_numpy(dtype=np.float64),
+                sigma=df['implied_vol'].to_numpy(dtype=np.float64),
+                is_call=df['option_type'].to_numpy() == 'call',
+                q=q
+            )
+                
+            # 添加模型前缀以区分不同模型的结果
+            prefix = 'bcc_' if model == 'bcc97' else 'bs_'
+            for greek in names:
+                df[f'{prefix}{greek}'] = greeks[greek]
                     
         logging.info("Feature calculation completed")
         return df
         
-    def process_csv_files(self, csv_dir: str, batch_size: int = 1000, test_mode: bool = False):
+    @staticmethod
+    def _group_rolling_mean(groups, window: int) -> pd.Series:
+        """按组计算滚动均值，走groupby.rolling的内置实现而不是逐组回调lambda
+        
+        Args:
+            groups: 按合约分组后的单列SeriesGroupBy
+            window: 窗口长度
+            
+        Returns:
+            与原数据索引对齐的滚动均值
+        """
+        return groups.rolling(window).mean().droplevel(0)
+        
+    def process_csv_files(self, csv_dir: str, batch_size: int = 1000, test_mode: bool = False,
+                          flush_rows: int = 100_000, max_workers: Optional[int] = None):
         """处理CSV文件并批量上传到DolphinDB
         
+        处理好的数据在内存中累积，达到flush_rows行或batch_size个文件时上传一次，
+        每次RPC摊薄到约10万行。子进程中同时最多有2*max_workers个文件在处理，
+        上传慢于处理时子进程随之等待，已处理未上传的数据量有上限
+        
         Args:
             csv_dir: CSV文件目录
-            batch_size: 批量处理的文件数
+            batch_size: 每次上传最多包含的文件数
             test_mode: 是否测试模式（只处理前3个文件）
+            flush_rows: 累积到该行数即上传
+            max_workers: 处理CSV的进程数，默认为CPU核数
         """
         logging.info(f"Searching for CSV files in {csv_dir}...")
         csv_files = glob.glob(os.path.join(csv_dir, "*.csv"))
@@ -438,104 +346,79 @@ class OptionDataHandler:
             csv_files = csv_files[:3]
             logging.info("Running in test mode with first 3 files")
 
-        # 批量处理文件
-        for i in range(0, len(csv_files), batch_size):
-            batch_files = csv_files[i:i+batch_size]
-            batch_data = []
-            
-            for j, csv_file in enumerate(batch_files, 1):
-                try:
-                    logging.info(f"Processing [{j}/{len(batch_files)}] {os.path.basename(csv_file)}")
-                    
-                    # 读取CSV文件
-                    logging.info("Reading CSV file...")
-                    df = pd.read_csv(csv_file)
-                    logging.info(f"Read {len(df)} rows")
-
-                    # 数据清洗和处理
-                    df = self.clean_option_data(df)
-                    logging.info(f"Cleaned data: {len(df)} rows remaining")
-
-                    # 计算期权特征
-                    df = self.calculate_option_features(df)
-
-                    # 提取期权代码
-                    symbol = os.path.basename(csv_file).replace('.csv', '')
-                    
-                    # 转换时间戳
-                    logging.info("Converting timestamps...")
-                    df['timestamp'] = pd.to_datetime(df['timestamp'])
-                    df['date'] = df['timestamp'].dt.date
-                    
-                    # 准备数据
-                    for _, row in df.iterrows():
-                        batch_data.append({
-                            'symbol': symbol,
-                            'date': row['date'],
-                            'timestamp': row['timestamp'],
-                            'open': row['open'],
-                            'high': row['high'],
-                            'low': row['low'],
-                            'close': row['close'],
-                            'volume': row['volume'],
-                            'openinterest': row['openinterest']
-                        })
-
-                    logging.info(f"Successfully processed {os.path.basename(csv_file)}")
-
-                except Exception as e:
-                    logging.error(f"Error processing {csv_file}: {str(e)}")
+        pending_frames = []
+        pending_rows = 0
+        
+        # 读取、清洗和特征计算在子进程中并行，上传只在主进程进行
+        workers = max_workers or os.cpu_count() or 1
+        remaining = iter(csv_files)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # 按文件顺序取结果，每取回一个再提交一个，挂起的任务数保持在窗口以内
+            in_flight = deque(
+                (csv_file, pool.submit(_process_one, csv_file))
+                for csv_file in islice(remaining, 2 * workers)
+            )
+            j = 0
+            while in_flight:
+                csv_file, future = in_flight.popleft()
+                df = future.result()
+                for next_file in islice(remaining, 1):
+                    in_flight.append((next_file, pool.submit(_process_one, next_file)))
+                j += 1
+                if df is None:
                     continue
+                logging.info(f"Processed [{j}/{len(csv_files)}] {os.path.basename(csv_file)}: {len(df)} rows")
+                pending_frames.append(df)
+                pending_rows += len(df)
 
-            # 批量上传数据
-            if batch_data:
-                retry_count = 3
-                while retry_count > 0:
-                    try:
-                        logging.info(f"Uploading batch of {len(batch_data)} records to DolphinDB...")
-                        
-                        # 准备批量数据
-                        symbols = [d['symbol'] for d in batch_data]
-                        dates = [d['date'] for d in batch_data]
-                        timestamps = [int(d['timestamp'].timestamp() * 1000) for d in batch_data]
-                        opens = [d['open'] for d in batch_data]
-                        highs = [d['high'] for d in batch_data]
-                        lows = [d['low'] for d in batch_data]
-                        closes = [d['close'] for d in batch_data]
-                        volumes = [d['volume'] for d in batch_data]
-                        openinterests = [d['openinterest'] for d in batch_data]
+                # 达到行数或文件数阈值时上传
+                if pending_rows >= flush_rows or len(pending_frames) >= batch_size:
+                    self._upload_batch(pd.concat(pending_frames, ignore_index=True, copy=False))
+                    pending_frames = []
+                    pending_rows = 0
 
-                        # 执行批量插入
-                        script = f"""
-                        symbols = {symbols};
-                        dates = {dates};
-                        timestamps = timestamp({timestamps});
-                        opens = {opens};
-                        highs = {highs};
-                        lows = {lows};
-                        closes = {closes};
-                        volumes = {volumes};
-                        openinterests = {openinterests};
-                        
-                        t = table(symbols as symbol, dates as date, timestamps as timestamp, 
-                                opens as open, highs as high, lows as low, closes as close,
-                                volumes as volume, openinterests as openinterest)
-                        loadTable("dfs://options", "option_60min").append!(t)
-                        """
-                        self.conn.run(script)
-                        logging.info("Batch upload successful")
-                        break
-                    
-                    except Exception as e:
-                        retry_count -= 1
-                        if retry_count > 0:
-                            logging.warning(f"Upload failed, retrying... ({retry_count} attempts left)")
-                            time.sleep(2)  # 等待2秒后重试
-                        else:
-                            logging.error(f"Failed to upload batch after all retries: {str(e)}")
+        # 上传剩余数据
+        if pending_frames:
+            self._upload_batch(pd.concat(pending_frames, ignore_index=True, copy=False))
 
         logging.info("Data import completed successfully!")
 
+    @staticmethod
+    def _read_csv(csv_file: str) -> pd.DataFrame:
+        """按固定类型读取单个CSV，优先使用pyarrow引擎，未安装时退回默认C解析器
+        
+        数值列类型固定，不再逐文件推断
+        """
+        kwargs = dict(dtype=CSV_DTYPES, parse_dates=['timestamp'])
+        try:
+            return pd.read_csv(csv_file, engine='pyarrow', **kwargs)
+        except ImportError:
+            return pd.read_csv(csv_file, **kwargs)
+
+    def _upload_batch(self, batch_df: pd.DataFrame):
+        """把一批数据以列式二进制写入option_60min表，失败时重试
+        
+        调用initialize_database中定义的insertOpt函数，DataFrame作为RPC参数以列式二进制传输
+        
+        Args:
+            batch_df: 列为UPLOAD_COLUMNS的数据
+        """
+        retry_count = 3
+        while retry_count > 0:
+            try:
+                logging.info(f"Uploading batch of {len(batch_df)} records to DolphinDB...")
+                self.conn.run('insertOpt', batch_df)
+                logging.info("Batch upload successful")
+                break
+            
+            except Exception as e:
+                retry_count -= 1
+                if retry_count > 0:
+                    logging.warning(f"Upload failed, retrying... ({retry_count} attempts left)")
+                    time.sleep(2)  # 等待2秒后重试
+                else:
+                    logging.error(f"Failed to upload batch after all retries: {str(e)}")
+
     def close(self):
         """关闭数据库连接"""
         if hasattr(self, 'conn'):
@@ -586,14 +469,20 @@ class OptionDataHandler:
         Returns:
             pd.DataFrame: 期权数据
         """
+        # 查询参数以变量上传，查询文本与合约数量无关，服务端不必解析内联的长列表
         conditions = []
+        params = {}
         if symbols:
-            symbols_str = ",".join([f"'{s}'" for s in symbols])
-            conditions.append(f"symbol in [{symbols_str}]")
+            params['syms'] = np.array(symbols, dtype=object)
+            conditions.append("symbol in syms")
         if start_date:
-            conditions.append(f"date >= '{start_date}'")
+            params['d1'] = np.datetime64(pd.Timestamp(start_date), 'D')
+            conditions.append("date >= d1")
         if end_date:
-            conditions.append(f"date <= '{end_date}'")
+            params['d2'] = np.datetime64(pd.Timestamp(end_date), 'D')
+            conditions.append("date <= d2")
+        if params:
+            self.conn.upload(params)
             
         where_clause = " and ".join(conditions) if conditions else "1=1"
         
@@ -606,6 +495,39 @@ class OptionDataHandler:
         data = self.conn.run(query)
         return data
 
+def _process_one(csv_file: str) -> Optional[pd.DataFrame]:
+    """在子进程中读取、清洗单个CSV并计算特征，返回待上传的列；出错时返回None
+    
+    读取、清洗和特征计算都是静态方法，子进程不创建处理器实例，也不连接DolphinDB
+    """
+    try:
+        logging.info(f"Processing {os.path.basename(csv_file)}")
+        # 读取CSV文件
+        df = OptionDataHandler._read_csv(csv_file)
+        logging.info(f"Read {len(df)} rows")
+
+        # 数据清洗和处理
+        df = OptionDataHandler.clean_option_data(df)
+        logging.info(f"Cleaned data: {len(df)} rows remaining")
+
+        # 计算期权特征
+        df = OptionDataHandler.calculate_option_features(df)
+
+        # 提取期权代码
+        symbol = os.path.basename(csv_file).replace('.csv', '')
+        
+        # 转换时间戳
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        df['date'] = df['timestamp'].dt.normalize()  # 保持datetime64，写入DATE列时由DolphinDB转换
+        
+        # 准备数据，保持列式存储
+        df['symbol'] = symbol
+        return df[UPLOAD_COLUMNS]
+
+    except Exception as e:
+        logging.error(f"Error processing {csv_file}: {str(e)}")
+        return None
+
 if __name__ == "__main__":
     handler = None
     try:
@@ -31,35 +31,40 @@ class HestonCalibrator:
         self.r = r
         self.options = options
         
+        # 期权字段在校准过程中不变，预先整理成数组
+        now = datetime.now()
+        self._strikes = np.array([opt.strike for opt in options], dtype=np.float64)
+        self._T = np.array([(opt.expiry - now).days / 365.0 for opt in options])
+        self._is_call = np.array([opt.is_call for opt in options], dtype=bool)
+        self._prices = np.array([opt.price for opt in options], dtype=np.float64)
+        self._model = None
+        
     def objective(self, params: np.ndarray) -> float:
         """目标函数：最小化模型价格和市场价格的差异"""
         kappa, theta, sigma, rho, v0 = params
-        
-        # 创建Heston模型
-        model = HestonModel(HestonParameters(
+        params = HestonParameters(
             kappa=kappa,
             theta=theta,
             sigma=sigma,
             rho=rho,
             v0=v0
-        ))
+        )
         
-        # 计算所有期权的价格差异
-        total_error = 0
-        for opt in self.options:
-            T = (opt.expiry - datetime.now()).days / 365.0
-            model_price = model.price_european(
-                S0=self.spot,
-                K=opt.strike,
-                T=T,
-                r=self.r,
-                is_call=opt.is_call
-            )
-            # 使用相对误差
-            error = ((model_price - opt.price) / opt.price) ** 2
-            total_error += error
+        # 复用同一个Heston模型，每次迭代只替换参数
+        if self._model is None:
+            self._model = HestonModel(params)
+        else:
+            self._model.params = params
             
-        return total_error
+        # 整条期权链一次批量积分定价，使用相对误差
+        model_prices = self._model.price_european_batch(
+            S0=self.spot,
+            K=self._strikes,
+            T=self._T,
+            r=self.r,
+            is_call=self._is_call
+        )[0]
+        return float(np.sum(((model_prices - self._prices) / self._prices) ** 2))
         
     def calibrate(self, 
                  init_guess: Optional[Tuple[float, float, float, float, float]] = None
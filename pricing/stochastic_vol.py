@@ -3,7 +3,7 @@
 """
 from typing import Dict, List, Optional, Tuple, Callable
 import numpy as np
-from scipy.integrate import quad
+from scipy.integrate import quad, quad_vec
 from scipy.optimize import minimize
 from dataclasses import dataclass
 import warnings
@@ -39,29 +39,42 @@ class HestonModel:
             S0: 当前价格
             r: 无风险利率
         """
+        return self._characteristic_terms(u, tau, S0, r)[0]
+    
+    def _characteristic_terms(self, u: complex, tau: float,
+                              S0: float, r: float) -> Tuple[complex, complex, complex, complex]:
+        """特征函数及其解析偏导所需的各项
+        
+        Returns:
+            (phi, dC/dtau, D, dD/dtau)，其中 phi = exp(C + D*v0 + iu*ln(S0))
+        """
         kappa = self.params.kappa
         theta = self.params.theta
         sigma = self.params.sigma
         rho = self.params.rho
         v0 = self.params.v0
         
+        b = kappa - 1j*rho*sigma*u
+        
         # 计算d
-        d = np.sqrt((kappa - 1j*rho*sigma*u)**2 + 
-                    sigma**2*(1j*u + u**2))
+        d = np.sqrt(b**2 + sigma**2*(1j*u + u**2))
         
         # 计算g
-        g = (kappa - 1j*rho*sigma*u - d)/(kappa - 1j*rho*sigma*u + d)
+        g = (b - d)/(b + d)
+        e = np.exp(-d*tau)
         
         # 计算特征函数的各项
         C = (r*u*1j*tau + 
-             kappa*theta/(sigma**2)*((kappa - 1j*rho*sigma*u - d)*tau - 
-                                    2*np.log((1-g*np.exp(-d*tau))/(1-g))))
+             kappa*theta/(sigma**2)*((b - d)*tau - 2*np.log((1-g*e)/(1-g))))
         
-        D = ((kappa - 1j*rho*sigma*u - d)/sigma**2*
-             ((1-np.exp(-d*tau))/(1-g*np.exp(-d*tau))))
+        D = (b - d)/sigma**2*((1-e)/(1-g*e))
         
-        # 返回特征函数值
-        return np.exp(C + D*v0 + 1j*u*np.log(S0))
+        # C、D对到期时间的导数
+        dC_dtau = r*u*1j + kappa*theta/(sigma**2)*((b - d) - 2*g*d*e/(1-g*e))
+        dD_dtau = (b - d)/sigma**2*(d*e*(1-g)/(1-g*e)**2)
+        
+        phi = np.exp(C + D*v0 + 1j*u*np.log(S0))
+        return phi, dC_dtau, D, dD_dtau
     
     def price_european(self, S0: float, K: float, T: float, r: float, 
                       is_call: bool = True, N: int = 100) -> float:
@@ -97,6 +110,82 @@ class HestonModel:
             
         return max(0, price)
         
+    def price_european_with_greeks(self, S0: float, K: float, T: float, r: float,
+                                   is_call: bool = True,
+                                   N: int = 100) -> Tuple[float, float, float, float, float]:
+        """一次积分同时得到欧式期权价格和Greeks
+        
+        Args:
+            S0: 当前价格
+            K: 行权价
+            T: 到期时间
+            r: 无风险利率
+            is_call: 是否为看涨期权
+            N: 积分区间细分上限
+            
+        Returns:
+            (price, delta, gamma, theta, vega)，口径同price_european_batch
+        """
+        return tuple(float(x[0]) for x in self.price_european_batch(S0, K, T, r, is_call, N))
+        
+    def price_european_batch(self, S0: float, K: np.ndarray, T: np.ndarray, r: float,
+                             is_call: np.ndarray,
+                             N: int = 100) -> Tuple[np.ndarray, ...]:
+        """批量计算一组欧式期权的价格和Greeks
+        
+        定价被积函数对S0、T、v0的导数都可解析写出(分别乘以iw/S0、dlnphi/dT、D)。
+        整组合约的价格及各阶导数作为一个向量值被积函数，用quad_vec在同一组u节点上
+        一次自适应积分，特征函数在每个节点只对全部合约广播计算一次
+        
+        Args:
+            S0: 当前价格
+            K: 行权价数组
+            T: 到期时间数组
+            r: 无风险利率
+            is_call: 是否为看涨期权数组
+            N: 积分区间细分上限
+            
+        Returns:
+            (price, delta, gamma, theta, vega)数组，theta为年化时间价值变化，
+            vega为v0上浮1%的价格变化除以0.01，价格截断为0的合约Greeks也为0
+        """
+        K, T, is_call = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(K, dtype=np.float64)),
+            np.atleast_1d(np.asarray(T, dtype=np.float64)),
+            np.atleast_1d(np.asarray(is_call, dtype=bool))
+        )
+        v0 = self.params.v0
+        shift = np.where(is_call, -0.5j, 0.5j)
+        log_k = np.log(K)
+        
+        def integrand(u: float) -> np.ndarray:
+            w = u + shift
+            phi, dC_dtau, D, dD_dtau = self._characteristic_terms(w, T, S0, r)
+            base = np.exp(-1j * u * log_k) * phi / (1j * u)
+            iw = 1j * w
+            return np.real(base * np.stack([
+                np.ones_like(iw),           # 价格
+                iw / S0,                    # d/dS0
+                iw * (iw - 1) / S0**2,      # d2/dS0^2
+                dC_dtau + dD_dtau * v0,     # d/dT
+                D                           # d/dv0
+            ]))
+            
+        integral, _ = quad_vec(integrand, 0, np.inf, limit=N)
+        I, I_s, I_ss, I_t, I_v = integral
+        
+        # 看涨: S0 - disc*I，看跌: disc*I - S0
+        disc = np.exp(-r * T) * K / np.pi
+        sign = np.where(is_call, -1.0, 1.0)
+        price = sign * (disc * I - S0)
+        delta = sign * (disc * I_s - 1.0)
+        gamma = sign * disc * I_ss
+        theta = -sign * disc * (I_t - r * I)
+        vega = v0 * sign * disc * I_v
+        
+        positive = price > 0
+        return tuple(np.where(positive, x, 0.0) for x in (price, delta, gamma, theta, vega))
+        
 @dataclass
 class SABRParameters:
     """SABR模型参数"""
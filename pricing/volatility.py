@@ -5,6 +5,7 @@ from typing import Dict, List, Optional, Tuple
 import numpy as np
 import pandas as pd
 from scipy.interpolate import griddata
+from scipy.stats import norm
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 
@@ -135,3 +136,65 @@ class HistoricalVolatility:
         
         # 年化
         return np.sqrt(252 * rolling_var)
+
+class ImpliedVolatility:
+    """隐含波动率批量反推"""
+    
+    @staticmethod
+    def approximate(price: np.ndarray,
+                    spot: np.ndarray,
+                    strike: np.ndarray,
+                    tau: np.ndarray,
+                    r: float,
+                    is_call: np.ndarray,
+                    newton_steps: int = 2,
+                    tol: float = 1e-6) -> np.ndarray:
+        """向量化近似反推隐含波动率
+        
+        先用Corrado-Miller闭式近似给出整条期权链的初值，再按需做少量
+        向量化Newton修正，只更新误差仍大于tol的合约
+        
+        Args:
+            price: 期权价格
+            spot: 标的价格
+            strike: 行权价
+            tau: 剩余期限(年)
+            r: 无风险利率
+            is_call: 是否为看涨期权
+            newton_steps: Newton修正次数，0为只用闭式近似
+            tol: 价格误差容忍度
+            
+        Returns:
+            隐含波动率数组，无法求解的位置为NaN
+        """
+        price, spot, strike, tau = np.broadcast_arrays(
+            *(np.asarray(x, dtype=np.float64) for x in (price, spot, strike, tau))
+        )
+        valid = (price > 0) & (spot > 0) & (strike > 0) & (tau > 0)
+        t = np.where(valid, tau, 1.0)
+        disc_k = strike * np.exp(-r * t)
+        
+        # 看跌期权按平价关系转换为看涨价格
+        call = np.where(is_call, price, price + spot - disc_k)
+        
+        # Corrado-Miller近似，判别式为负时退化为Brenner-Subrahmanyam
+        half_gap = (spot - disc_k) / 2
+        adj = call - half_gap
+        disc = np.maximum(adj**2 - (spot - disc_k)**2 / np.pi, 0.0)
+        sigma = np.sqrt(2 * np.pi / t) / (spot + disc_k) * (adj + np.sqrt(disc))
+        sigma = np.clip(np.where(valid, sigma, 0.2), 1e-4, 5.0)
+        
+        sqrt_t = np.sqrt(t)
+        for _ in range(newton_steps):
+            d1 = (np.log(spot / strike) + (r + 0.5 * sigma**2) * t) / (sigma * sqrt_t)
+            d2 = d1 - sigma * sqrt_t
+            model = spot * norm.cdf(d1) - disc_k * norm.cdf(d2)
+            vega = spot * norm.pdf(d1) * sqrt_t
+            err = model - call
+            update = valid & (np.abs(err) > tol) & (vega > 1e-8)
+            if not update.any():
+                break
+            sigma = np.where(update, sigma - err / np.where(update, vega, 1.0), sigma)
+            sigma = np.clip(sigma, 1e-4, 5.0)
+            
+        return np.where(valid, sigma, np.nan)
@@ -39,6 +39,22 @@ class BaseStrategy(ABC):
         """
         pass
     
+    def on_data_batch(self, data: pd.DataFrame) -> Optional[pd.DataFrame]:
+        """Generate signals for the whole history in one call
+        
+        Optional vectorized counterpart of on_data. Strategies that can compute
+        their signals column-wise override this and return a DataFrame indexed
+        like data with one column per symbol; returning None makes the
+        backtester fall back to calling on_data once per date.
+        
+        Args:
+            data: Full market data with datetime index and (symbol, field) columns
+            
+        Returns:
+            Signals DataFrame (dates x symbols), or None if not supported
+        """
+        return None
+    
     def calculate_position_size(self, signals: Dict[str, float], 
                               total_capital: float,
                               max_position_size: float = 0.1,
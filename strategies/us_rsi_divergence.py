@@ -5,10 +5,60 @@ This strategy identifies and trades RSI divergences in US stocks
 
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Any, Tuple
+from numba import njit
+from typing import List, Dict, Any, Optional, Tuple
 from .base_strategy import BaseStrategy
 from data_sources.yahoo_finance import YahooFinanceDataSource
 
+@njit(cache=True)
+def _last_two_extrema(series, start, stop, k, highs):
+    """Positions of the last two strict k-bar peaks (or troughs) in series[start:stop]"""
+    prev = -1
+    last = -1
+    for i in range(start + k, stop - k):
+        v = series[i]
+        is_extremum = True
+        for j in range(1, k + 1):
+            if highs:
+                if not (v > series[i - j] and v > series[i + j]):
+                    is_extremum = False
+                    break
+            else:
+                if not (v < series[i - j] and v < series[i + j]):
+                    is_extremum = False
+                    break
+        if is_extremum:
+            prev = last
+            last = i
+    return prev, last
+
+@njit(cache=True)
+def _divergence_signals(prices, rsi, window, k, oversold, overbought):
+    """Bullish/bearish divergence signal for every bar over its trailing window"""
+    n = prices.size
+    out = np.zeros(n)
+    for t in range(n):
+        start = max(0, t - window + 1)
+        stop = t + 1
+        
+        # Bullish: price makes a lower low while RSI makes a higher low in oversold territory
+        p_prev, p_last = _last_two_extrema(prices, start, stop, k, False)
+        r_prev, r_last = _last_two_extrema(rsi, start, stop, k, False)
+        if p_prev >= 0 and r_prev >= 0:
+            if (prices[p_last] < prices[p_prev] and rsi[r_last] > rsi[r_prev]
+                    and rsi[r_last] < oversold):
+                out[t] = 1.0
+                continue
+                
+        # Bearish: price makes a higher high while RSI makes a lower high in overbought territory
+        p_prev, p_last = _last_two_extrema(prices, start, stop, k, True)
+        r_prev, r_last = _last_two_extrema(rsi, start, stop, k, True)
+        if p_prev >= 0 and r_prev >= 0:
+            if (prices[p_last] > prices[p_prev] and rsi[r_last] < rsi[r_prev]
+                    and rsi[r_last] > overbought):
+                out[t] = -1.0
+    return out
+
 class USRSIDivergenceStrategy(BaseStrategy):
     def __init__(self, 
                  symbols: List[str],
@@ -113,6 +163,29 @@ class USRSIDivergenceStrategy(BaseStrategy):
                     
         return signals
 
+    def on_data_batch(self, data: pd.DataFrame) -> Optional[pd.DataFrame]:
+        """Divergence signals for every date at once
+        
+        Computes RSI column-wise over the whole close panel, then scans each
+        date's trailing divergence window in a compiled kernel. Peaks and
+        troughs are located with the same 5-bar rule as find_peaks.
+        """
+        close = data.xs("Close", axis=1, level=1)
+        symbols = [symbol for symbol in self.symbols if symbol in close.columns]
+        close = close[symbols]
+        rsi = self.calculate_rsi(close)
+        
+        prices_arr = close.to_numpy(dtype=np.float64)
+        rsi_arr = rsi.to_numpy(dtype=np.float64)
+        signals = np.zeros_like(prices_arr)
+        for j in range(len(symbols)):
+            signals[:, j] = _divergence_signals(
+                np.ascontiguousarray(prices_arr[:, j]), np.ascontiguousarray(rsi_arr[:, j]),
+                self.divergence_window, 5,
+                float(self.oversold_threshold), float(self.overbought_threshold)
+            )
+        return pd.DataFrame(signals, index=close.index, columns=symbols)
+
     def on_data(self, data: pd.DataFrame) -> Dict[str, Any]:
         """Strategy execution on new data"""
         signals = self.generate_signals(data)
@@ -0,0 +1,137 @@
+"""
+DolphinDB数据源冒烟测试，使用内存中的数据，不连接数据库
+"""
+
+import tempfile
+import unittest
+from unittest import mock
+import backtrader as bt
+import numpy as np
+import pandas as pd
+from ..data import dolphindb_feed
+from ..data.dolphindb_feed import DolphinDBData, DolphinDBDataOHLCV, DolphinDBOptionFeed
+
+def _make_frame(n: int = 10) -> pd.DataFrame:
+    """构造DolphinDB查询结果格式的期权数据"""
+    close = np.linspace(5.0, 6.0, n)
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2024-01-02', periods=n, freq='D'),
+        'symbol': 'AAPL240119C00150000',
+        'open': close,
+        'high': close + 0.1,
+        'low': close - 0.1,
+        'close': close,
+        'volume': np.full(n, 100.0),
+        'open_interest': np.full(n, 1000.0),
+        'strike': 150.0,
+        'underlying_price': 152.0,
+        'implied_volatility': 0.25,
+        'option_type': 'call',
+        'time_to_expiry': 0.05,
+    })
+
+class _FakeHandler:
+    """只实现get_option_data的数据处理器，并记录查询次数和查询的合约"""
+    def __init__(self):
+        self.calls = 0
+        self.requested = []
+
+    def get_option_data(self, symbols=None, start_date=None, end_date=None):
+        self.calls += 1
+        self.requested.append(list(symbols))
+        return pd.concat([_make_frame().assign(symbol=s) for s in symbols], ignore_index=True)
+
+class _CloseRecorder(bt.Strategy):
+    def __init__(self):
+        self.closes = []
+
+    def next(self):
+        self.closes.append(self.data.close[0])
+
+class _DeltaRecorder(bt.Strategy):
+    def __init__(self):
+        self.deltas = []
+
+    def next(self):
+        self.deltas.append(self.data.delta[0])
+
+class TestDolphinDBFeed(unittest.TestCase):
+    def _run(self, feed) -> list:
+        cerebro = bt.Cerebro()
+        cerebro.adddata(feed)
+        cerebro.addstrategy(_CloseRecorder)
+        return cerebro.run()[0].closes
+
+    def test_from_frame_runs_in_cerebro(self):
+        """由整理好的数据构建的数据源可以在Cerebro中逐根回放"""
+        df = DolphinDBDataOHLCV._prepare_frame(_make_frame())
+        for cls in (DolphinDBDataOHLCV, DolphinDBData):
+            feed = cls.from_frame(df, symbol='AAPL240119C00150000')
+            self.assertIs(feed.p.dataname, df)
+            closes = self._run(feed)
+            np.testing.assert_allclose(closes, df['close'].to_numpy())
+
+    def test_greeks_lines_visible_to_strategy(self):
+        """DolphinDBData把补齐的希腊字母映射为数据线，策略可以逐bar读取"""
+        df = DolphinDBDataOHLCV._prepare_frame(_make_frame())
+        self.assertIn('delta', DolphinDBData.lines.getlinealiases())
+        self.assertNotIn('delta', DolphinDBDataOHLCV.lines.getlinealiases())
+        
+        cerebro = bt.Cerebro()
+        cerebro.adddata(DolphinDBData.from_frame(df, symbol='AAPL240119C00150000'))
+        cerebro.addstrategy(_DeltaRecorder)
+        deltas = cerebro.run()[0].deltas
+        np.testing.assert_allclose(deltas, df['delta'].to_numpy(), rtol=1e-6)
+
+    def test_option_feed_caches_frame(self):
+        """同一(合约, 开始, 结束)只查询一次，两种数据源共享同一份数据"""
+        handler = _FakeHandler()
+        manager = DolphinDBOptionFeed(db_handler=handler)
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(dolphindb_feed, '_CACHE_DIR', tmp):
+            first = manager.get_option_data('AAPL240119C00150000', '2024-01-01', '2024-01-31')
+            second = manager.get_option_data('AAPL240119C00150000', '2024-01-01', '2024-01-31',
+                                             include_greeks=False)
+        self.assertEqual(handler.calls, 1)
+        self.assertIs(first.p.dataname, second.p.dataname)
+        self.assertIsInstance(first, DolphinDBData)
+        self.assertNotIsInstance(second, DolphinDBData)
+        self.assertEqual(len(self._run(second)), len(first.p.dataname))
+
+    def test_disk_cache_only_for_closed_ranges(self):
+        """只缓存结束日期早于今天的范围，use_cache=False时总是查询"""
+        handler = _FakeHandler()
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(dolphindb_feed, '_CACHE_DIR', tmp):
+            for end_date in (None, pd.Timestamp.today(), '2024-01-31', '2024-01-31'):
+                DolphinDBDataOHLCV.load_frame(handler, 'AAPL240119C00150000', '2024-01-01', end_date)
+            self.assertEqual(handler.calls, 3)
+            
+            DolphinDBDataOHLCV.load_frame(handler, 'AAPL240119C00150000', '2024-01-01', '2024-01-31',
+                                          use_cache=False)
+            self.assertEqual(handler.calls, 4)
+
+    def test_multiple_options_use_disk_cache(self):
+        """多合约查询逐个合约读写磁盘缓存，新进程只查询磁盘上没有的合约"""
+        symbols = ['AAPL240119C00150000', 'AAPL240119P00150000']
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(dolphindb_feed, '_CACHE_DIR', tmp):
+            handler = _FakeHandler()
+            DolphinDBOptionFeed(db_handler=handler).get_multiple_options(
+                symbols[:1], '2024-01-01', '2024-01-31')
+            feeds = DolphinDBOptionFeed(db_handler=handler).get_multiple_options(
+                symbols, '2024-01-01', '2024-01-31')
+            self.assertEqual(handler.requested, [symbols[:1], symbols[1:]])
+            
+            DolphinDBOptionFeed(db_handler=handler).get_multiple_options(
+                symbols, '2024-01-01', '2024-01-31')
+            self.assertEqual(handler.calls, 2)
+            
+            DolphinDBOptionFeed(db_handler=handler, use_cache=False).get_multiple_options(
+                symbols, '2024-01-01', '2024-01-31')
+            self.assertEqual(handler.requested[-1], symbols)
+        for symbol in symbols:
+            self.assertTrue((feeds[symbol].p.dataname['symbol'] == symbol).all())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+"""
+交易对象测试，不依赖外部服务
+"""
+
+import os
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from ..core.trader.constant import Exchange
+from ..core.trader.object import TickData
+
+def _make_tick(dt: datetime) -> TickData:
+    return TickData(
+        gateway_name="IB",
+        symbol="AAPL",
+        exchange=Exchange.SMART,
+        datetime=dt,
+        last_price=189.5,
+        volume=1200,
+        bid_price_1=189.49,
+        ask_volume_5=300
+    )
+
+class TestTickPack(unittest.TestCase):
+    def setUp(self):
+        # 在非UTC时区下运行，确认结果与本机时区无关
+        self._tz = os.environ.get("TZ")
+        os.environ["TZ"] = "America/New_York"
+        time.tzset()
+
+    def tearDown(self):
+        if self._tz is None:
+            os.environ.pop("TZ", None)
+        else:
+            os.environ["TZ"] = self._tz
+        time.tzset()
+
+    def _round_trip(self, tick: TickData) -> TickData:
+        return TickData.unpack(tick.pack(), tick.gateway_name, tick.symbol, tick.exchange)
+
+    def test_aware_datetime_round_trip(self):
+        """带时区的时间还原为相同的时刻和UTC偏移"""
+        dt = datetime(2024, 3, 8, 9, 30, 0, 123456, tzinfo=timezone(timedelta(hours=8)))
+        tick = _make_tick(dt)
+        restored = self._round_trip(tick)
+        self.assertEqual(restored.datetime, dt)
+        self.assertEqual(restored.datetime.utcoffset(), timedelta(hours=8))
+        self.assertEqual(restored.datetime.hour, 9)
+        self.assertEqual(restored, tick)
+
+    def test_naive_datetime_round_trip(self):
+        """不带时区的时间原样还原，夏令时切换时刻也不受本机时区影响"""
+        for dt in (datetime(2024, 3, 8, 9, 30), datetime(2024, 3, 10, 2, 30),
+                   datetime(2024, 11, 3, 1, 30, 0, 500000)):
+            tick = _make_tick(dt)
+            restored = self._round_trip(tick)
+            self.assertIsNone(restored.datetime.tzinfo)
+            self.assertEqual(restored, tick)
+
+    def test_unpack_at_offset(self):
+        """多个TICK连续存放时按偏移逐个还原"""
+        ticks = [_make_tick(datetime(2024, 3, 8, 9, 30, i)) for i in range(3)]
+        buf = b"".join(tick.pack() for tick in ticks)
+        size = len(buf) // len(ticks)
+        restored = [
+            TickData.unpack(buf, "IB", "AAPL", Exchange.SMART, offset=i * size)
+            for i in range(len(ticks))
+        ]
+        self.assertEqual(restored, ticks)
+
+if __name__ == '__main__':
+    unittest.main()
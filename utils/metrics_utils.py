@@ -0,0 +1,98 @@
+"""
+回测指标计算工具
+"""
+import numpy as np
+from numba import njit
+
+@njit(cache=True)
+def max_drawdown(values: np.ndarray) -> float:
+    """单次遍历计算最大回撤
+    
+    Args:
+        values: 权益序列(float64)
+        
+    Returns:
+        最大回撤，以正数比例表示
+    """
+    if values.size == 0:
+        return 0.0
+    peak = values[0]
+    mdd = 0.0
+    for i in range(1, values.size):
+        v = values[i]
+        if v > peak:
+            peak = v
+        dd = (peak - v) / peak
+        if dd > mdd:
+            mdd = dd
+    return mdd
+
+@njit(cache=True)
+def drawdown_series(values: np.ndarray, dd_out: np.ndarray) -> float:
+    """单次遍历计算回撤序列并返回最大回撤
+    
+    Args:
+        values: 权益序列(float64)
+        dd_out: 预分配的回撤输出数组，长度与values相同
+        
+    Returns:
+        最大回撤，以正数比例表示
+    """
+    if values.size == 0:
+        return 0.0
+    peak = values[0]
+    mdd = 0.0
+    dd_out[0] = 0.0
+    for i in range(1, values.size):
+        v = values[i]
+        if v > peak:
+            peak = v
+        dd = (peak - v) / peak
+        dd_out[i] = dd
+        if dd > mdd:
+            mdd = dd
+    return mdd
+
+@njit(cache=True)
+def compute_metrics(values: np.ndarray, initial: float):
+    """单次遍历计算总收益、夏普比率和最大回撤
+    
+    同时维护滚动峰值、最大回撤以及日收益率的和与平方和，
+    夏普比率按日收益率的样本标准差(ddof=1)年化。与pandas的mean/std一样跳过NaN收益率，
+    因此不能用fastmath编译
+    
+    Args:
+        values: 权益序列(float64)
+        initial: 初始资金
+        
+    Returns:
+        (总收益率, 年化夏普比率, 最大回撤)，收益与回撤均为比例，回撤以正数表示
+    """
+    n = values.size
+    if n == 0:
+        return 0.0, np.nan, 0.0
+    peak = values[0]
+    mdd = 0.0
+    s = 0.0
+    s2 = 0.0
+    m = 0
+    for i in range(1, n):
+        v = values[i]
+        r = v / values[i - 1] - 1.0
+        if not np.isnan(r):
+            s += r
+            s2 += r * r
+            m += 1
+        if v > peak:
+            peak = v
+        dd = (peak - v) / peak
+        if dd > mdd:
+            mdd = dd
+    total_return = values[n - 1] / initial - 1.0
+    if m < 2:
+        return total_return, np.nan, mdd
+    mean = s / m
+    var = (s2 - s * mean) / (m - 1)
+    if var <= 0.0:
+        return total_return, np.nan, mdd
+    return total_return, np.sqrt(252.0) * mean / np.sqrt(var), mdd